@@ -0,0 +1,282 @@
+"""
+Microbenchmark: single-pass parse_id_data vs the previous field-by-field extraction
+
+Run from the backend directory:
+    python benchmarks/bench_id_extraction.py [iterations]
+
+Speedups vary with the machine and its load. Over five runs at the default
+2000 iterations (Python 3.11, one CPU core) the single-pass parser was 1.5-1.7x
+faster on ID card text and 1.7-1.9x on long text; a reviewer's run measured
+1.37x and 1.53x. Quote a fresh run, not these numbers.
+"""
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.ocr_extractor import parse_id_data, clean_name
+
+REPEATS = 5
+
+SAMPLES = {
+    "aadhaar": """GOVERNMENT OF INDIA
+आधार - आम आदमी का अधिकार
+Name: Ramesh Kumar Sharma
+Date of Birth: 15/08/1985
+Gender: MALE
+Address: S/O Suresh Sharma, House No 12
+Gandhi Nagar, Near Bus Stand
+Jaipur, Rajasthan
+PIN: 302001
+Mobile: 9876543210
+AADHAAR 2341 2341 2346
+""",
+    "pan": """INCOME TAX DEPARTMENT GOVT. OF INDIA
+Permanent Account Number Card
+ABCDE1234F
+Name
+PRIYA SINGH
+Father's Name
+RAJESH SINGH
+Date of Birth
+01/01/1990
+Signature
+""",
+    "voter": """ELECTION COMMISSION OF INDIA
+IDENTITY CARD
+Elector's Name : Anil Verma
+Father's Name : Mohan Verma
+Sex : Male
+Date of Birth : 1978-03-22
+Address : 45, MG Road, Lucknow
+contact +91 9123456789 anil.verma@example.com
+""",
+    "noisy": """REPUBLIC OF INDIA
+Suni1 Yadav
+D0B 12-11-1992
+FEMALE
+addr unknown
+987654321 0
+""",
+}
+
+
+# --- The previous field-by-field extractors, kept here only for comparison ---
+
+def extract_aadhaar_number(text):
+    """Extract 12-digit Aadhaar number"""
+    # Pattern: 1234 5678 9012 or 123456789012
+    patterns = [
+        r'\b\d{4}\s\d{4}\s\d{4}\b',
+        r'\b\d{12}\b'
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, text)
+        if match:
+            return match.group(0).replace(' ', '')
+    return None
+
+
+def extract_pan_number(text):
+    """Extract PAN number (Format: ABCDE1234F)"""
+    pattern = r'\b[A-Z]{5}\d{4}[A-Z]\b'
+    match = re.search(pattern, text)
+    return match.group(0) if match else None
+
+
+def extract_name(text):
+    """Extract name from ID card"""
+    lines = text.split('\n')
+    
+    # Look for "Name:" or similar labels
+    for i, line in enumerate(lines):
+        if re.search(r'name\s*:?', line, re.IGNORECASE):
+            # Next line or same line after colon
+            if ':' in line:
+                name = line.split(':', 1)[1].strip()
+                if name and len(name) > 2:
+                    return clean_name(name)
+            if i + 1 < len(lines):
+                name = lines[i + 1].strip()
+                if name and len(name) > 2:
+                    return clean_name(name)
+    
+    # If no label found, first non-empty line with alphabetic characters
+    for line in lines:
+        line = line.strip()
+        if len(line) > 2 and re.search(r'[A-Za-z]', line):
+            # Skip common headers
+            if not any(word in line.upper() for word in ['GOVERNMENT', 'INDIA', 'CARD', 'REPUBLIC']):
+                return clean_name(line)
+    
+    return None
+
+
+def extract_dob(text):
+    """Extract date of birth"""
+    # Common date patterns
+    patterns = [
+        r'\b(\d{2}[-/]\d{2}[-/]\d{4})\b',  # DD-MM-YYYY or DD/MM/YYYY
+        r'\b(\d{2}[-/]\d{2}[-/]\d{2})\b',  # DD-MM-YY
+        r'\b(\d{4}[-/]\d{2}[-/]\d{2})\b',  # YYYY-MM-DD
+    ]
+    
+    # Look for DOB label
+    for line in text.split('\n'):
+        if re.search(r'(dob|birth|date of birth)', line, re.IGNORECASE):
+            for pattern in patterns:
+                match = re.search(pattern, line)
+                if match:
+                    return match.group(1)
+    
+    # Search entire text for first date
+    for pattern in patterns:
+        match = re.search(pattern, text)
+        if match:
+            return match.group(1)
+    
+    return None
+
+
+def extract_address(text):
+    """Extract address from ID card"""
+    lines = text.split('\n')
+    address_lines = []
+    capturing = False
+    
+    for i, line in enumerate(lines):
+        line = line.strip()
+        if re.search(r'address\s*:?', line, re.IGNORECASE):
+            capturing = True
+            # Check if address is on same line after colon
+            if ':' in line:
+                addr = line.split(':', 1)[1].strip()
+                if addr:
+                    address_lines.append(addr)
+            continue
+        
+        if capturing:
+            # Stop at next labeled field or document boundary
+            if re.search(r'(phone|mobile|email|pin|signature)', line, re.IGNORECASE):
+                break
+            if line and len(line) > 3:
+                address_lines.append(line)
+            if len(address_lines) >= 4:  # Max 4 lines of address
+                break
+    
+    if address_lines:
+        return ', '.join(address_lines)
+    
+    return None
+
+
+def extract_phone(text):
+    """Extract phone number"""
+    # Indian phone patterns
+    patterns = [
+        r'\b[6-9]\d{9}\b',  # 10-digit mobile
+        r'\+91[\s-]?[6-9]\d{9}\b',  # With country code
+    ]
+    
+    for pattern in patterns:
+        match = re.search(pattern, text)
+        if match:
+            phone = match.group(0)
+            # Clean up
+            phone = re.sub(r'[^\d+]', '', phone)
+            return phone
+    
+    return None
+
+
+def extract_email(text):
+    """Extract email address"""
+    pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
+    match = re.search(pattern, text)
+    return match.group(0) if match else None
+
+
+def extract_gender(text):
+    """Extract gender"""
+    text_upper = text.upper()
+    if re.search(r'\bMALE\b', text_upper) and not re.search(r'\bFEMALE\b', text_upper):
+        return "Male"
+    elif re.search(r'\bFEMALE\b', text_upper):
+        return "Female"
+    elif re.search(r'\bOTHER\b', text_upper):
+        return "Other"
+    return None
+
+
+def legacy_parse_id_data(text):
+    """The extraction as it was: every field re-scans the whole text"""
+    data = {
+        "raw_text": text, "name": None, "dob": None, "id_number": None, "address": None,
+        "phone": None, "email": None, "gender": None, "document_type": None
+    }
+    text_upper = text.upper()
+    if "AADHAAR" in text_upper or "आधार" in text:
+        data["document_type"] = "Aadhaar Card"
+        data["id_number"] = extract_aadhaar_number(text)
+    elif "INCOME TAX" in text_upper or "PAN" in text_upper:
+        data["document_type"] = "PAN Card"
+        data["id_number"] = extract_pan_number(text)
+    elif "VOTER" in text_upper or "ELECTION" in text_upper:
+        data["document_type"] = "Voter ID"
+    elif "DRIVING" in text_upper or "LICENSE" in text_upper:
+        data["document_type"] = "Driving License"
+    else:
+        data["document_type"] = "ID Card"
+    data["name"] = extract_name(text)
+    data["dob"] = extract_dob(text)
+    data["address"] = extract_address(text)
+    data["phone"] = extract_phone(text)
+    data["email"] = extract_email(text)
+    data["gender"] = extract_gender(text)
+    return data
+
+
+def time_per_call(func, texts, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for text in texts:
+            func(text)
+    return (time.perf_counter() - start) / (iterations * len(texts)) * 1e6
+
+
+def compare(texts, iterations, repeats=REPEATS):
+    """
+    Best µs/call for (legacy, single-pass). The two are timed alternately, so
+    both see the same background load, and the minimum of the repeats is the
+    run least disturbed by it.
+    """
+    legacy, new = [], []
+    for _ in range(repeats):
+        legacy.append(time_per_call(legacy_parse_id_data, texts, iterations))
+        new.append(time_per_call(parse_id_data, texts, iterations))
+    return min(legacy), min(new)
+
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    print("Field differences (new vs legacy):")
+    differences = 0
+    for label, text in SAMPLES.items():
+        new, old = parse_id_data(text), legacy_parse_id_data(text)
+        for field in old:
+            if new[field] != old[field]:
+                differences += 1
+                print(f"   {label}.{field}: {new[field]!r} (legacy {old[field]!r})")
+    if not differences:
+        print("   none")
+
+    texts = list(SAMPLES.values())
+    # Long OCR output (e.g. a multi-page upload) is where repeated scans hurt most
+    long_texts = ["\n".join(texts * 25)]
+    for name, batch, rounds in (("ID card", texts, iterations), ("long text", long_texts, max(1, iterations // 50))):
+        legacy_us, new_us = compare(batch, rounds)
+        print(f"{name:>10}: legacy {legacy_us:9.1f} µs/call   single-pass {new_us:9.1f} µs/call   "
+              f"speedup {legacy_us / new_us:4.2f}x")
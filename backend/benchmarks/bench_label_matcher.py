@@ -0,0 +1,111 @@
+"""
+Microbenchmark: label-dictionary matcher vs the previous one-regex-per-field scan
+
+Run from the backend directory:
+    python benchmarks/bench_label_matcher.py [iterations]
+"""
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.llm_agent import extract_questions_manually
+
+SAMPLES = {
+    "job application": """APPLICATION FORM
+Namo : ______________________
+Fathor's Namo : ______________________
+Date of Bich : ____/____/________
+Gonder : Male / Female
+Marital Status : __________
+Religion : __________
+Languages Known : __________
+Qualitication : __________
+Experience : __________
+Mobile : __________  Emailid : __________
+Addeoss : ______________________________
+Place : ________  Dat : ________  Signature
+""",
+    "noisy scan": """ADMISSI0N F0RM
+Full Nane ____________
+Fathers Narne ____________
+Date 0f Birth __/__/____
+Gendor M / F
+Natlonality ________
+Qualificaton ________
+Mobil No. ________
+E-mail ________
+Adress ____________________
+Pin code ______
+Signatur
+""",
+    "sparse": """RECEIPT
+Amount received with thanks
+Place: Jaipur
+""",
+}
+
+# Instruction pages that often follow the form in a multi-page upload
+INSTRUCTIONS = """GENERAL INSTRUCTIONS
+1. Fill the form in BLOCK LETTERS with a black or blue ball point pen.
+2. The candidate must attach a self attested copy of the certificate issued by the
+   competent authority along with the application.
+3. Incomplete applications or applications received after the last date will be
+   rejected without any further correspondence.
+4. Candidates are advised to keep a photocopy of the filled application for future reference.
+5. The decision of the selection committee shall be final and binding in all matters.
+"""
+
+LEGACY_FIELDS = [
+    (r'(?i)(nam[eo]|name)', "Name"),
+    (r'(?i)(mobile|phone|contact)', "Mobile Number"),
+    (r'(?i)(email|emailid|e-mail)', "Email Address"),
+    (r'(?i)(father.*nam[eo]|fathor.*nam[eo])', "Father's Name"),
+    (r'(?i)(gender|gonder|sex)', "Gender"),
+    (r'(?i)(date.*birth|dob|date.*bich)', "Date of Birth"),
+    (r'(?i)(marital.*status|martial.*status)', "Marital Status"),
+    (r'(?i)(religion)', "Religion"),
+    (r'(?i)(language.*known)', "Languages Known"),
+    (r'(?i)(qualification|qualitication|education)', "Qualification"),
+    (r'(?i)(experience)', "Experience"),
+    (r'(?i)(address|addeoss)', "Address"),
+    (r'(?i)(place)', "Place"),
+    (r'(?i)(signature)', "Signature"),
+]
+
+
+def legacy_extract_questions(text):
+    """The extraction as it was: one case-insensitive regex scan per field"""
+    return [question for pattern, question in LEGACY_FIELDS if re.search(pattern, text)]
+
+
+def time_per_call(func, texts, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for text in texts:
+            func(text)
+    return (time.perf_counter() - start) / (iterations * len(texts)) * 1e6
+
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    print("Fields found (manual extraction needs more than 5 to skip the LLM):")
+    for label, text in SAMPLES.items():
+        new = [q["question"] for q in extract_questions_manually(text)]
+        old = legacy_extract_questions(text)
+        print(f"   {label}: {len(new)} fields (legacy {len(old)})")
+        if set(new) != set(old):
+            print(f"      only new:    {sorted(set(new) - set(old))}")
+            print(f"      only legacy: {sorted(set(old) - set(new))}")
+
+    texts = list(SAMPLES.values())
+    # A multi-page upload: the forms followed by twenty pages of instructions
+    long_texts = ["\f".join(texts + [INSTRUCTIONS * 4] * 20)]
+    for name, batch, rounds in (("form", texts, iterations), ("multi-page", long_texts, max(1, iterations // 50))):
+        legacy_us = time_per_call(legacy_extract_questions, batch, rounds)
+        new_us = time_per_call(extract_questions_manually, batch, rounds)
+        print(f"{name:>10}: legacy {legacy_us:9.1f} µs/call   matcher {new_us:9.1f} µs/call   "
+              f"speedup {legacy_us / new_us:4.2f}x")
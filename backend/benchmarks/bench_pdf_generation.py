@@ -0,0 +1,195 @@
+"""
+Benchmark: filled-PDF generation for 100-field forms, previous layout code vs the current one
+
+Run from the backend directory:
+    python benchmarks/bench_pdf_generation.py [iterations]
+"""
+import io
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas
+
+from utils.pdf_generator import fill_pdf_form, wrap_text
+
+WORDS = (
+    "house number street road near opposite colony nagar district tehsil village post office "
+    "state pin code government school college university bachelor master degree experience years "
+    "working company private limited department ministry scheme beneficiary account bank branch"
+).split()
+
+
+def make_form(fields, answer_words, seed=0):
+    """A request payload with long answers and document previews"""
+    rng = random.Random(seed)
+    answers = {
+        str(i): {
+            "question": f"{i}. " + " ".join(rng.choices(WORDS, k=rng.randint(4, 14))).capitalize(),
+            "answer": " ".join(rng.choices(WORDS, k=rng.randint(answer_words // 4, answer_words))),
+        }
+        for i in range(1, fields + 1)
+    }
+    documents = {
+        f"Document {i}": {"filename": f"scan_{i}.jpg", "extracted_text": " ".join(rng.choices(WORDS, k=80))}
+        for i in range(1, 4)
+    }
+    profile = {"name": "Test User", "email": "test@example.com", "phone": "9876543210"}
+    return {"answers": answers, "documents": documents, "user_profile": profile}
+
+
+def legacy_fill_pdf_form(data, output):
+    """fill_pdf_form as it was: whole-line re-measuring and one drawString per line"""
+    c = canvas.Canvas(output, pagesize=letter)
+    width, height = letter
+    
+    # Title
+    c.setFont("Helvetica-Bold", 24)
+    c.drawString(1*inch, height - 1*inch, "Filled Government Form")
+    
+    # Horizontal line
+    c.line(1*inch, height - 1.2*inch, width - 1*inch, height - 1.2*inch)
+    
+    # Form fields - dynamic
+    c.setFont("Helvetica", 12)
+    y_position = height - 2*inch
+    
+    # Get answers dict
+    answers = data.get('answers', {})
+    
+    # Display all question-answer pairs
+    for q_id, answer_data in answers.items():
+        if y_position < 2*inch:
+            # Create new page if needed
+            c.showPage()
+            y_position = height - 1*inch
+        
+        question = answer_data.get('question', '')
+        answer = answer_data.get('answer', '')
+        
+        c.setFont("Helvetica-Bold", 11)
+        # Wrap question text
+        question_lines = legacy_wrap_text(c, question, width - 2*inch, "Helvetica-Bold", 11)
+        for line in question_lines:
+            c.drawString(1*inch, y_position, line)
+            y_position -= 0.3*inch
+        
+        c.setFont("Helvetica", 11)
+        # Wrap answer text
+        answer_lines = legacy_wrap_text(c, str(answer), width - 2*inch, "Helvetica", 11)
+        for line in answer_lines:
+            c.drawString(1.2*inch, y_position, line)
+            y_position -= 0.3*inch
+        
+        y_position -= 0.2*inch  # Extra space between questions
+    
+    # Attached documents section
+    documents = data.get('documents', {})
+    if documents:
+        y_position -= 0.5*inch
+        c.setFont("Helvetica-Bold", 12)
+        c.drawString(1*inch, y_position, "Attached Documents:")
+        y_position -= 0.4*inch
+        
+        for doc_type, doc_info in documents.items():
+            c.setFont("Helvetica", 11)
+            c.drawString(1.2*inch, y_position, f"• {doc_type}: {doc_info.get('filename', 'N/A')}")
+            y_position -= 0.3*inch
+            
+            # Show extracted text if available
+            if doc_info.get('extracted_text'):
+                c.setFont("Helvetica-Oblique", 9)
+                text_preview = doc_info['extracted_text'][:200] + "..."
+                preview_lines = legacy_wrap_text(c, text_preview, width - 2.5*inch, "Helvetica-Oblique", 9)
+                for line in preview_lines[:3]:  # Max 3 lines
+                    c.drawString(1.5*inch, y_position, line)
+                    y_position -= 0.25*inch
+                y_position -= 0.2*inch
+    
+    # User profile section
+    user_profile = data.get('user_profile', {})
+    if user_profile:
+        y_position -= 0.5*inch
+        if y_position < 2*inch:
+            c.showPage()
+            y_position = height - 1*inch
+        
+        c.setFont("Helvetica-Bold", 12)
+        c.drawString(1*inch, y_position, "User Profile:")
+        y_position -= 0.4*inch
+        
+        c.setFont("Helvetica", 10)
+        profile_fields = [
+            ("Name", user_profile.get('name')),
+            ("Email", user_profile.get('email')),
+            ("Phone", user_profile.get('phone')),
+        ]
+        
+        for label, value in profile_fields:
+            if value:
+                c.drawString(1.2*inch, y_position, f"{label}: {value}")
+                y_position -= 0.3*inch
+    
+    # Footer
+    c.setFont("Helvetica-Oblique", 10)
+    c.drawString(1*inch, 1*inch, f"Generated by BharatVoice AI on {datetime.now().strftime('%d-%m-%Y %H:%M')}")
+    c.drawString(1*inch, 0.7*inch, "This is an AI-assisted form. Please verify all information.")
+    
+    c.save()
+    output.seek(0)
+    return output
+
+
+def legacy_wrap_text(canvas_obj, text, max_width, font_name, font_size):
+    """wrap_text as it was: stringWidth of the whole growing line for every word"""
+    words = text.split()
+    lines = []
+    current_line = ""
+    
+    for word in words:
+        test_line = current_line + " " + word if current_line else word
+        if canvas_obj.stringWidth(test_line, font_name, font_size) < max_width:
+            current_line = test_line
+        else:
+            if current_line:
+                lines.append(current_line)
+            current_line = word
+    
+    if current_line:
+        lines.append(current_line)
+    
+    return lines
+
+
+def time_per_call(func, data, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(data, io.BytesIO())
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    # Same line breaks as before (widths are additive for the standard fonts)
+    sample = make_form(100, 120)
+    c = canvas.Canvas(io.BytesIO())
+    mismatches = sum(
+        wrap_text(c, item["answer"], letter[0] - 2*inch, "Helvetica", 11)
+        != legacy_wrap_text(c, item["answer"], letter[0] - 2*inch, "Helvetica", 11)
+        for item in sample["answers"].values()
+    )
+    print(f"Wrapped answers that differ from the previous layout: {mismatches}")
+
+    for label, answer_words in (("short answers", 10), ("long answers", 120)):
+        data = make_form(100, answer_words)
+        legacy_ms = time_per_call(legacy_fill_pdf_form, data, iterations)
+        new_ms = time_per_call(fill_pdf_form, data, iterations)
+        print(f"100 fields, {label:>13}: before {legacy_ms:7.1f} ms/PDF   after {new_ms:7.1f} ms/PDF   "
+              f"speedup {legacy_ms / new_ms:4.2f}x")
@@ -0,0 +1,262 @@
+"""
+Benchmark suite: OCR -> questions -> PDF, stage by stage, on synthetic forms and ID cards
+
+Every input is generated with PIL from fixed seeds, so runs are comparable.
+Each stage reports p50/p95 latency, throughput and peak Python memory
+(tracemalloc, measured in a separate untimed pass). The LLM is a stub, so
+detect_form_questions measures our own code, not the network.
+
+Run from the backend directory:
+    python benchmarks/bench_pipeline.py [--iterations N] [--save-baseline] [--tolerance 0.25]
+
+Results are compared against benchmarks/baseline.json when it exists; the run
+exits with status 1 if any stage's p50 or peak memory regresses past the
+tolerance. Baselines are machine-specific: record one (--save-baseline) on the
+machine that runs the comparison, with Tesseract installed. OCR stages are
+skipped without Tesseract; stages missing from either side are listed, and
+--strict turns them into a failure (so CI cannot pass by not measuring OCR).
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import shutil
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from utils import llm_cache
+from utils.llm_agent import detect_form_questions, extract_questions_manually
+from utils.llm_client import LLMProvider, set_provider
+from utils.ocr_extractor import extract_id_data, extract_text, parse_id_data
+from utils.pdf_generator import fill_pdf_form
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+# Differences below these are timer / allocator noise, whatever the tolerance
+MIN_REGRESSION_MS = 0.05
+MIN_REGRESSION_KB = 64
+
+FORM_LABELS = [
+    "Full Name", "Father's Name", "Date of Birth", "Gender", "Mobile Number", "Email Address",
+    "Marital Status", "Religion", "Languages Known", "Qualification", "Experience",
+    "Address", "Place", "Date", "Signature",
+]
+ID_CARD_LINES = [
+    "GOVERNMENT OF INDIA",
+    "Name: Ramesh Kumar Sharma",
+    "Date of Birth: 15/08/1985",
+    "Gender: MALE",
+    "Address: House No 12, Gandhi Nagar",
+    "Jaipur, Rajasthan 302001",
+    "Mobile: 9876543210",
+    "2341 2341 2346",
+]
+RESOLUTIONS = {"100dpi": 100, "200dpi": 200, "300dpi": 300}
+NOISE_LEVELS = {"clean": 0, "noisy": 25}       # std-dev of gaussian pixel noise (grey levels)
+
+
+def _font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:    # Pillow without FreeType sizing
+        return ImageFont.load_default()
+
+
+def _add_noise(image, sigma, rng):
+    if not sigma:
+        return image
+    pixels = np.asarray(image, dtype=np.float32)
+    pixels = pixels + rng.normal(0, sigma, pixels.shape)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+
+def _to_png(image, dpi):
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG", dpi=(dpi, dpi))
+    return buffer.getvalue()
+
+
+def synth_form(dpi, sigma, seed=0):
+    """A4 application form: title and one labelled blank per line"""
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    image = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    size = max(10, dpi // 7)
+    draw.text((dpi, dpi // 2), "APPLICATION FORM", fill=0, font=_font(size * 3 // 2))
+    y = dpi
+    for number, label in enumerate(FORM_LABELS, 1):
+        draw.text((dpi, y), f"{number}. {label}: ______________________", fill=0, font=_font(size))
+        y += size * 2
+    return _to_png(_add_noise(image, sigma, np.random.default_rng(seed)), dpi)
+
+
+def synth_id_card(dpi, sigma, seed=0):
+    """Credit-card sized ID with the usual Aadhaar fields"""
+    width, height = int(3.37 * dpi), int(2.13 * dpi)
+    image = Image.new("L", (width, height), 235)
+    draw = ImageDraw.Draw(image)
+    size = max(8, dpi // 14)
+    y = size
+    for line in ID_CARD_LINES:
+        draw.text((size, y), line, fill=0, font=_font(size))
+        y += int(size * 1.4)
+    return _to_png(_add_noise(image, sigma, np.random.default_rng(seed)), dpi)
+
+
+def form_text(labels=FORM_LABELS):
+    """What Tesseract reads from synth_form, so text stages run without Tesseract too"""
+    lines = ["APPLICATION FORM"] + [f"{n}. {label}: ______________________" for n, label in enumerate(labels, 1)]
+    return "\n".join(lines)
+
+
+def pdf_request(fields, seed=0):
+    rng = random.Random(seed)
+    words = "house street road near colony nagar district village state school college bank".split()
+    answers = {
+        str(i): {"question": FORM_LABELS[i % len(FORM_LABELS)], "answer": " ".join(rng.choices(words, k=12))}
+        for i in range(1, fields + 1)
+    }
+    return {"answers": answers, "documents": {}, "user_profile": {"name": "Test User", "email": "t@example.com"}}
+
+
+class StubLLM(LLMProvider):
+    """Answers instantly with a fixed question list"""
+
+    name = "stub"
+
+    async def _generate(self, prompt, system, temperature, model, timeout):
+        return json.dumps([
+            {"id": i, "question": label, "field_type": "text", "required": True}
+            for i, label in enumerate(FORM_LABELS, 1)
+        ])
+
+
+def build_stages():
+    """[(stage name, zero-argument callable)] for every stage that can run here"""
+    loop = asyncio.new_event_loop()
+    set_provider(StubLLM())
+    llm_cache.question_cache.backend = None     # every call must reach the (stub) LLM
+    logging.getLogger("bharatvoice").setLevel(logging.WARNING)    # keep per-call INFO lines out of the table
+
+    # Few labels, so manual extraction gives up and the LLM path runs
+    sparse_text = form_text(FORM_LABELS[:4])
+    full_text = form_text()
+    id_text = "\n".join(ID_CARD_LINES)
+    stages = [
+        ("extract_questions_manually", lambda: extract_questions_manually(full_text)),
+        ("detect_form_questions[stub llm]", lambda: loop.run_until_complete(detect_form_questions(sparse_text))),
+        ("parse_id_data", lambda: parse_id_data(id_text)),
+    ]
+    for fields in (15, 100):
+        request = pdf_request(fields)
+        stages.append((f"fill_pdf_form[{fields} fields]", lambda request=request: fill_pdf_form(request).close()))
+
+    if shutil.which("tesseract"):
+        for res_name, dpi in RESOLUTIONS.items():
+            for noise_name, sigma in NOISE_LEVELS.items():
+                form = synth_form(dpi, sigma)
+                card = synth_id_card(dpi, sigma)
+                stages.append((f"extract_text[{res_name},{noise_name}]", lambda form=form: extract_text(form)))
+                stages.append((f"extract_id_data[{res_name},{noise_name}]", lambda card=card: extract_id_data(card)))
+    else:
+        print("ℹ️ Tesseract not found: extract_text / extract_id_data stages skipped")
+    return stages
+
+
+def measure(func, iterations):
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()    # warm-up: imports, caches, lazily built templates
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - start) * 1000)
+
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "ops_per_s": round(len(samples) / (sum(samples) / 1000), 1),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def coverage(results, baseline):
+    """(baseline stages that were not measured, measured stages with no baseline)"""
+    return sorted(set(baseline) - set(results)), sorted(set(results) - set(baseline))
+
+
+def regressions(results, baseline, tolerance):
+    found = []
+    for stage, result in results.items():
+        base = baseline.get(stage)
+        if base is None:
+            continue
+        if result["p50_ms"] > base["p50_ms"] * (1 + tolerance) and result["p50_ms"] - base["p50_ms"] > MIN_REGRESSION_MS:
+            found.append(f"{stage}: p50 {result['p50_ms']} ms (baseline {base['p50_ms']} ms)")
+        if result["peak_kb"] > base["peak_kb"] * (1 + tolerance) and result["peak_kb"] - base["peak_kb"] > MIN_REGRESSION_KB:
+            found.append(f"{stage}: peak {result['peak_kb']} KB (baseline {base['peak_kb']} KB)")
+    return found
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the OCR -> questions -> PDF pipeline")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown / growth (0.25 = 25%%)")
+    parser.add_argument("--strict", action="store_true",
+                        help="fail when a stage is missing from the run or the baseline (e.g. no Tesseract)")
+    args = parser.parse_args()
+
+    if args.strict and not shutil.which("tesseract"):
+        print("❌ --strict needs Tesseract: the OCR stages would not be measured")
+        sys.exit(1)
+
+    results = {}
+    print(f"{'stage':<40} {'p50 ms':>9} {'p95 ms':>9} {'ops/s':>9} {'peak KB':>9}")
+    for name, func in build_stages():
+        result = measure(func, args.iterations)
+        results[name] = result
+        print(f"{name:<40} {result['p50_ms']:>9.3f} {result['p95_ms']:>9.3f} "
+              f"{result['ops_per_s']:>9.1f} {result['peak_kb']:>9.1f}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"✅ Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        missing, unbaselined = coverage(results, baseline)
+        if missing:
+            print(f"⚠️ {len(missing)} baseline stage(s) not measured: {', '.join(missing)}")
+        if unbaselined:
+            print(f"⚠️ {len(unbaselined)} stage(s) without a baseline: {', '.join(unbaselined)}")
+        if not any(stage.startswith("extract_text[") for stage in baseline):
+            print("⚠️ The baseline has no OCR stages: record it again (--save-baseline) with Tesseract installed")
+        found = regressions(results, baseline, args.tolerance)
+        if args.strict and (missing or unbaselined):
+            found += [f"{stage}: not measured" for stage in missing]
+            found += [f"{stage}: no baseline" for stage in unbaselined]
+        if found:
+            print(f"❌ {len(found)} regression(s) past {args.tolerance:.0%}:")
+            for line in found:
+                print(f"   {line}")
+            sys.exit(1)
+        print(f"✅ No regressions against {args.baseline}")
@@ -0,0 +1,388 @@
+"""
+Load harness: the real app with local stand-ins for Gemini/OpenAI, Whisper and Tesseract
+
+Starts uvicorn for every combination of --workers and --ocr-workers, drives
+open-loop mixed traffic (Poisson arrivals) at each rate in --rates, and reports
+per-endpoint latency histograms, throughput and the rate at which each
+configuration saturates (throughput falls behind the offered rate, p95 passes
+--slo-ms, or more than --max-error-rate of requests fail).
+
+The stand-ins take "median_ms,p95_ms,error_rate" (log-normal latency):
+    --llm 800,2500,0.02   --stt 400,1200,0.01   --ocr 300,900,0
+
+Run from the backend directory:
+    python benchmarks/load_harness.py --rates 5,10,20 --duration 20 --workers 1,2 --ocr-workers 2,4
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import numpy as np
+
+ENDPOINTS = {
+    "/scan-form": 2,
+    "/upload-document": 2,
+    "/validate-answer": 4,
+    "/speech-to-text": 4,
+    "/generate-filled-form": 2,
+}
+HISTOGRAM_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+FORM_TEXT = "APPLICATION FORM\n1. Full Name: ________\n2. Date of Birth: ________\n3. Village: ________"
+
+
+class LatencyModel:
+    """Log-normal latency from its median and p95, plus a failure probability"""
+
+    def __init__(self, spec):
+        median_ms, p95_ms, error_rate = (float(part) for part in spec.split(","))
+        self.median = median_ms / 1000
+        self.sigma = math.log(max(p95_ms, median_ms) / median_ms) / 1.645 if median_ms > 0 else 0.0
+        self.error_rate = error_rate
+
+    def sample(self):
+        delay = self.median * math.exp(random.gauss(0, self.sigma)) if self.median > 0 else 0.0
+        return delay, random.random() < self.error_rate
+
+
+def install_fake_tesseract():
+    """Tesseract stand-in configured by LOAD_OCR; blocks its OCR worker like the real one"""
+    import pytesseract
+    ocr_model = LatencyModel(os.getenv("LOAD_OCR", "300,900,0"))
+
+    def fake_tesseract(image, **kwargs):
+        delay, fail = ocr_model.sample()
+        time.sleep(delay)
+        if fail:
+            raise RuntimeError("fake OCR error")
+        # A fresh reference number per page keeps the LLM question cache from answering
+        return f"{FORM_TEXT}\nReference: {random.getrandbits(48):x}"
+
+    def fake_tesseract_data(image, **kwargs):
+        words = fake_tesseract(image).split()
+        count = len(words)
+        return {
+            "text": words, "left": [10 * i for i in range(count)], "top": [20] * count,
+            "width": [40] * count, "height": [12] * count, "conf": ["90"] * count,
+            "block_num": [1] * count, "par_num": [1] * count, "line_num": [i // 4 for i in range(count)],
+            "word_num": list(range(count)), "level": [5] * count, "page_num": [1] * count,
+        }
+
+    pytesseract.image_to_string = fake_tesseract
+    pytesseract.image_to_data = fake_tesseract_data
+
+
+def init_ocr_worker(thread_limit):
+    """OCR pool initializer: the usual thread cap, then the fake Tesseract (workers may be spawned, not forked)"""
+    os.environ["OMP_THREAD_LIMIT"] = thread_limit
+    install_fake_tesseract()
+
+
+def install_fakes():
+    """Swap the external services for stand-ins configured by LOAD_LLM / LOAD_STT / LOAD_OCR"""
+    from utils import ocr_executor
+    from utils.llm_client import LLMProvider, set_provider
+    from utils.speech_to_text import STTBackend, STTError, STT_BACKEND, set_stt_backend
+
+    llm_model = LatencyModel(os.getenv("LOAD_LLM", "800,2500,0.02"))
+    stt_model = LatencyModel(os.getenv("LOAD_STT", "400,1200,0.01"))
+
+    class ServiceUnavailable(Exception):
+        status_code = 503     # retried by LLMProvider.complete, like a real 503
+
+    class FakeLLM(LLMProvider):
+        name = "fake"
+
+        async def _generate(self, prompt, system, temperature, model, timeout):
+            delay, fail = llm_model.sample()
+            await asyncio.sleep(delay)
+            if fail:
+                raise ServiceUnavailable("fake LLM error")
+            if system and "Extract questions" in system:
+                return json.dumps([
+                    {"id": 1, "question": "Full Name", "field_type": "text", "required": True},
+                    {"id": 2, "question": "Date of Birth", "field_type": "date", "required": True},
+                    {"id": 3, "question": "Village", "field_type": "text", "required": False},
+                ])
+            return json.dumps({"valid": True, "suggestion": ""})
+
+    class FakeSTT(STTBackend):
+        name = "fake"
+
+        async def transcribe(self, audio_bytes, filename="input.wav", language=None):
+            delay, fail = stt_model.sample()
+            await asyncio.sleep(delay)
+            if fail:
+                raise STTError("fake STT error")
+            return "my name is test user"
+
+    install_fake_tesseract()
+    ocr_executor._init_worker = init_ocr_worker
+    set_provider(FakeLLM())
+    set_stt_backend(FakeSTT(), STT_BACKEND)
+
+
+def create_app():
+    """uvicorn factory: the real app with the stand-ins installed (in every worker)"""
+    install_fakes()
+    from main import app
+    return app
+
+
+# --- Request payloads ---------------------------------------------------------
+
+def _png():
+    from PIL import Image, ImageDraw
+    image = Image.new("L", (1240, 1754), 255)
+    draw = ImageDraw.Draw(image)
+    for line, text in enumerate(FORM_TEXT.splitlines()):
+        draw.text((120, 120 + 40 * line), text, fill=0)
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def _wav(seconds=3.0, rate=48000):
+    t = np.arange(int(rate * seconds)) / rate
+    tone = 0.3 * np.sin(2 * np.pi * 220 * t) * (t > 0.5) * (t < seconds - 0.5)
+    stereo = np.repeat((tone * 32767).astype("<i2")[:, None], 2, axis=1)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(2)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        out.writeframes(stereo.tobytes())
+    return buffer.getvalue()
+
+
+class Payloads:
+    def __init__(self):
+        self.png = _png()
+        self.wav = _wav()
+        self.answers = {
+            str(i): {"question": f"Question {i}", "answer": f"Answer number {i} for the load test"}
+            for i in range(1, 21)
+        }
+
+    def request(self, endpoint):
+        """httpx.request keyword arguments for one call"""
+        # Trailing bytes after IEND are ignored by decoders but give every upload its own cache key
+        unique_png = self.png + os.urandom(8)
+        if endpoint == "/scan-form":
+            return {"files": {"file": ("form.png", unique_png, "image/png")}}
+        if endpoint == "/upload-document":
+            return {"files": {"file": ("doc.png", unique_png, "image/png")}, "data": {"document_type": "id"}}
+        if endpoint == "/validate-answer":
+            return {"data": {"question": "What is your occupation?", "answer": f"Farmer {random.randint(1, 10**6)}"}}
+        if endpoint == "/speech-to-text":
+            return {"files": {"file": ("input.wav", self.wav, "audio/wav")}}
+        return {"json": {"answers": self.answers, "documents": {}, "user_profile": {"name": "Load Test"}}}
+
+
+# --- Traffic ---------------------------------------------------------------------
+
+def _failed(response):
+    if response.status_code >= 400:
+        return True
+    if response.headers.get("content-type", "").startswith("application/json"):
+        return response.json().get("success") is False
+    return False
+
+
+async def drive(base_url, rate, duration, max_inflight, payloads):
+    """Open-loop traffic at `rate` req/s for `duration` s; returns per-endpoint samples"""
+    names, weights = zip(*ENDPOINTS.items())
+    samples = {name: {"latencies": [], "errors": 0, "dropped": 0} for name in names}
+    inflight = set()
+    limits = httpx.Limits(max_connections=max_inflight, max_keepalive_connections=max_inflight)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        async def call(endpoint):
+            start = time.perf_counter()
+            try:
+                response = await client.post(endpoint, **payloads.request(endpoint))
+                failed = _failed(response)
+            except httpx.HTTPError:
+                failed = True
+            samples[endpoint]["latencies"].append((time.perf_counter() - start) * 1000)
+            samples[endpoint]["errors"] += failed
+
+        started = time.perf_counter()
+        next_at = started
+        while next_at - started < duration:
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+            endpoint = random.choices(names, weights)[0]
+            if len(inflight) >= max_inflight:
+                samples[endpoint]["dropped"] += 1     # the client itself is saturated
+            else:
+                task = asyncio.create_task(call(endpoint))
+                inflight.add(task)
+                task.add_done_callback(inflight.discard)
+            next_at += random.expovariate(rate)
+        if inflight:
+            await asyncio.wait(inflight)
+        elapsed = time.perf_counter() - started
+    return samples, elapsed
+
+
+def summarize(samples, duration):
+    """
+    Per-endpoint counts, latency percentiles and throughput
+    Throughput is over the send window (`duration`), not the drain after it:
+    requests still in flight when sending stops are served in the drain, and
+    counting that time would report a shortfall on short runs. A server that
+    falls behind shows up as p95 latency over the SLO instead.
+    """
+    summary = {}
+    for endpoint, data in samples.items():
+        latencies = sorted(data["latencies"])
+        count = len(latencies)
+        summary[endpoint] = {
+            "requests": count,
+            "errors": data["errors"],
+            "dropped": data["dropped"],
+            "throughput": round(count / duration, 2),
+            "p50_ms": round(latencies[count // 2], 1) if count else None,
+            "p95_ms": round(latencies[min(count - 1, int(count * 0.95))], 1) if count else None,
+            "p99_ms": round(latencies[min(count - 1, int(count * 0.99))], 1) if count else None,
+            "histogram": [sum(1 for value in latencies if low <= value < high)
+                          for low, high in zip([0] + HISTOGRAM_MS, HISTOGRAM_MS + [float("inf")])],
+        }
+    return summary
+
+
+def print_summary(summary):
+    print(f"   {'endpoint':<24} {'req':>6} {'err':>5} {'drop':>5} {'req/s':>7} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for endpoint, s in summary.items():
+        if not s["requests"]:
+            continue
+        print(f"   {endpoint:<24} {s['requests']:>6} {s['errors']:>5} {s['dropped']:>5} {s['throughput']:>7} "
+              f"{s['p50_ms']:>8} {s['p95_ms']:>8} {s['p99_ms']:>8}")
+    labels = [f"<{ms}" for ms in HISTOGRAM_MS] + [f">={HISTOGRAM_MS[-1]}"]
+    print(f"   latency histogram (ms): {' '.join(f'{label:>7}' for label in labels)}")
+    for endpoint, s in summary.items():
+        if s["requests"]:
+            print(f"   {endpoint:<24} {' '.join(f'{count:>7}' for count in s['histogram'])}")
+
+
+# --- Servers -----------------------------------------------------------------------
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers, ocr_workers, args, workdir):
+    port = _free_port()
+    env = dict(
+        os.environ,
+        LOAD_LLM=args.llm, LOAD_STT=args.stt, LOAD_OCR=args.ocr,
+        OCR_WORKERS=str(ocr_workers), STT_BACKEND="stub", STT_FALLBACK="",
+        USER_DB_PATH=os.path.join(workdir, "users.sqlite3"),
+        FORM_TEMPLATES_PATH=os.path.join(workdir, "form_templates.json"),
+        FORM_TEMPLATE_AUTO_PROMOTE="false", LLM_CACHE_BACKEND="memory",
+    )
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "load_harness:create_app", "--factory",
+         "--app-dir", os.path.join(backend_dir, "benchmarks"), "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=backend_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            httpx.get(f"{base_url}/ocr-cache-stats", timeout=1)
+            return process, base_url
+        except httpx.HTTPError:
+            time.sleep(0.3)
+    process.kill()
+    raise RuntimeError("server did not start")
+
+
+def saturation_reason(summary, offered, achieved, drain, slo_ms, max_error_rate):
+    """Why this run counts as saturated, or None"""
+    requests = sum(s["requests"] for s in summary.values())
+    failures = sum(s["errors"] + s["dropped"] for s in summary.values())
+    p95s = [s["p95_ms"] for s in summary.values() if s["p95_ms"] is not None]
+    if achieved < offered * 0.9:
+        return f"completed {achieved:.2f} of {offered:.2f} req/s"
+    if p95s and max(p95s) > slo_ms:
+        return f"p95 {max(p95s):.0f} ms over the {slo_ms:.0f} ms SLO"
+    if drain * 1000 > slo_ms:
+        return f"backlog took {drain:.1f} s to drain after sending stopped"
+    if failures > requests * max_error_rate:
+        return f"{failures} of {requests} requests failed"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive mixed traffic at the app with fake AI services")
+    parser.add_argument("--rates", default="2,5,10", help="offered request rates (req/s) to sweep")
+    parser.add_argument("--duration", type=float, default=15, help="seconds per rate")
+    parser.add_argument("--workers", default="1", help="uvicorn worker counts to compare")
+    parser.add_argument("--ocr-workers", default="2", help="OCR pool sizes to compare")
+    parser.add_argument("--max-inflight", type=int, default=256)
+    parser.add_argument("--slo-ms", type=float, default=5000, help="p95 latency that counts as saturated")
+    parser.add_argument("--max-error-rate", type=float, default=0.05,
+                        help="failure share that counts as saturated (keep it above the injected error rates)")
+    parser.add_argument("--llm", default="800,2500,0.02")
+    parser.add_argument("--stt", default="400,1200,0.01")
+    parser.add_argument("--ocr", default="300,900,0")
+    parser.add_argument("--json", help="also write the full results to this file")
+    args = parser.parse_args()
+
+    rates = [float(rate) for rate in args.rates.split(",")]
+    payloads = Payloads()
+    results = []
+    for workers in (int(w) for w in args.workers.split(",")):
+        for ocr_workers in (int(w) for w in args.ocr_workers.split(",")):
+            print(f"\n🚦 workers={workers} ocr_workers={ocr_workers}")
+            saturation = None
+            with tempfile.TemporaryDirectory() as workdir:
+                process, base_url = start_server(workers, ocr_workers, args, workdir)
+                try:
+                    for rate in rates:
+                        samples, elapsed = asyncio.run(drive(base_url, rate, args.duration, args.max_inflight, payloads))
+                        summary = summarize(samples, args.duration)
+                        # Poisson arrivals: compare against what was really sent, not the nominal rate.
+                        # Both are measured over the send window; the drain is reported separately
+                        offered = sum(s["requests"] + s["dropped"] for s in summary.values()) / args.duration
+                        achieved = sum(s["requests"] for s in summary.values()) / args.duration
+                        drain = max(0.0, elapsed - args.duration)
+                        print(f"  offered {rate:g} req/s (sent {offered:.2f}) -> completed {achieved:.2f} req/s "
+                              f"(drain {drain:.1f} s)")
+                        print_summary(summary)
+                        results.append({"workers": workers, "ocr_workers": ocr_workers, "rate": rate,
+                                        "offered": round(offered, 2), "achieved": round(achieved, 2), "drain_s": round(drain, 2),
+                                        "endpoints": summary})
+                        reason = saturation_reason(summary, offered, achieved, drain, args.slo_ms, args.max_error_rate)
+                        if reason:
+                            saturation = f"{rate:g} req/s ({reason})"
+                            break
+                finally:
+                    process.terminate()
+                    process.wait(timeout=30)
+            print(f"  saturation: {saturation or f'not reached up to {rates[-1]:g} req/s'}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
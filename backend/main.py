@@ -1,24 +1,50 @@
-from fastapi import FastAPI, UploadFile, Form, HTTPException
+from fastapi import FastAPI, UploadFile, Form, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
-from utils.speech_to_text import speech_to_text
-from utils.ocr_extractor import extract_text
-from utils.llm_agent import detect_form_questions, validate_answer
-from utils.pdf_generator import fill_pdf_form
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from utils.speech_to_text import transcribe_recording, get_stt_backend, close_stt_backends, STTError, STT_BACKEND
+from utils.ocr_extractor import (
+    extract_page, extract_page_layout, may_have_pages, split_upload, parse_id_data, split_pages,
+    OCRError, PAGE_SEPARATOR
+)
+from utils.ocr_cache import ocr_cache, make_key
+from utils.ocr_executor import run_ocr, run_ocr_pages, shutdown_executor, OCRBusyError, OCRTimeoutError
+from utils.llm_agent import (
+    detect_form_questions_with_source, validate_answer, validate_answers, extract_questions_manually
+)
+from utils.llm_client import close_provider
+from utils.llm_cache import question_cache
+from utils.form_templates import template_registry, fingerprint, upload_page_hash, FORM_TEMPLATE_AUTO_PROMOTE
+from utils.pdf_generator import fill_pdf_form, iter_pdf
+from utils.form_overlay import form_layouts, locate_questions, overlay_pdf
+from utils.user_store import user_store
+from utils.pdf_batch import bulk_pdf_zip, shutdown_pdf_executor, PDF_BULK_MAX_FORMS
+from utils.uploads import (
+    UploadLimitMiddleware, read_upload, release_upload, check_image_pixels, UPLOAD_MAX_BYTES,
+    AUDIO_UPLOAD_MAX_BYTES, BULK_JSON_MAX_BYTES
+)
+from utils.metrics import MetricsMiddleware, POOL_IN_FLIGHT, register_collector, render, stage_timer
+from utils.structured_log import RequestIdMiddleware, get_logger, log_payload
+from utils.stt_stream import StreamingRecognizer, STT_STREAM_SAMPLE_RATE, STT_STREAM_MAX_BUFFER_BYTES
 from pydantic import BaseModel
 from typing import List, Dict, Optional, Any
+import asyncio
+import contextlib
 import json
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
 
-app = FastAPI()
+logger = get_logger("main")
 
-# In-memory user database (replace with real database in production)
-users_db = {}
-user_profiles = {}
+app = FastAPI()
 
+# Body size limits per endpoint (added first so CORS headers still reach 413 responses)
+app.add_middleware(UploadLimitMiddleware)
+# Request latency per route; wraps the upload limit, so rejected uploads are counted too
+app.add_middleware(MetricsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -26,6 +52,139 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Correlation ID for every log line of a request (X-Request-ID in and out); outermost
+app.add_middleware(RequestIdMiddleware)
+
+@app.on_event("startup")
+async def startup():
+    # Open the user database now, so a bad USER_DB_PATH fails at startup rather than on the first login
+    await asyncio.to_thread(user_store.open)
+    # Load a local speech model now rather than on the first voice answer
+    if STT_BACKEND == "local":
+        try:
+            await asyncio.to_thread(get_stt_backend)
+        except STTError as e:
+            logger.warning("Local speech model not loaded: %s", e)
+
+@app.on_event("shutdown")
+async def shutdown():
+    shutdown_executor()
+    shutdown_pdf_executor()
+    await close_provider()
+    await close_stt_backends()
+    user_store.close()
+
+def ocr_http_error(error):
+    """HTTPException for an OCR executor error: 503 for a full queue, 504 for a slow job"""
+    if isinstance(error, OCRBusyError):
+        return HTTPException(status_code=503, detail=str(error), headers={"Retry-After": "5"})
+    return HTTPException(status_code=504, detail=str(error))
+
+async def ocr(func, *args):
+    """Run OCR on the executor, mapping a full queue to 503 and a slow job to 504"""
+    try:
+        return await run_ocr(func, *args)
+    except (OCRBusyError, OCRTimeoutError) as e:
+        raise ocr_http_error(e)
+
+async def ocr_pages(page_func, file_bytes):
+    """
+    OCR an upload with one OCR job per page (page_func: extract_page or
+    extract_page_layout), so a long PDF takes about as long as its slowest page
+    and every page gets the full OCR_JOB_TIMEOUT; results in page order
+    Multi-page uploads are split first, so each job is sent only its own page.
+    Raises OCRError when the upload cannot be read
+    """
+    pages = [file_bytes]
+    if may_have_pages(file_bytes):
+        pages = await ocr(split_upload, file_bytes) or pages
+    results = [None] * len(pages)
+    try:
+        async with contextlib.aclosing(run_ocr_pages(page_func, pages)) as finished:
+            async for index, result in finished:
+                results[index] = result
+    except (OCRBusyError, OCRTimeoutError) as e:
+        raise ocr_http_error(e)
+    return results
+
+def read_document(file):
+    """
+    Upload contents for OCR (bytes or an mmap of the spool, see release_upload);
+    oversized files and images get 413
+    """
+    data = read_upload(file, UPLOAD_MAX_BYTES)
+    try:
+        check_image_pixels(data)
+    except HTTPException:
+        release_upload(data)
+        raise
+    return data
+
+async def ocr_text(file_bytes):
+    """OCR an upload, answering repeat uploads from the OCR cache"""
+    key = make_key(file_bytes)
+    text = await asyncio.to_thread(ocr_cache.get, key)
+    if text is None:
+        try:
+            text = PAGE_SEPARATOR.join(await ocr_pages(extract_page, file_bytes))
+        except OCRError as e:
+            return str(e)
+        await asyncio.to_thread(ocr_cache.put, key, text)
+    return text
+
+async def ocr_form(form_bytes):
+    """
+    OCR a form upload keeping word positions
+    The text goes to the OCR cache and the page layouts to the form layout cache,
+    both under the upload's cache key, which is returned as the form_id
+    Returns (text, form_id)
+    """
+    form_id = make_key(form_bytes)
+    text = await asyncio.to_thread(ocr_cache.get, form_id)
+    if text is None or not await asyncio.to_thread(form_layouts.has, form_id):
+        try:
+            results = await ocr_pages(extract_page_layout, form_bytes)
+        except OCRError as e:
+            return str(e), form_id
+        text = PAGE_SEPARATOR.join(page_text for page_text, _ in results)
+        await asyncio.to_thread(ocr_cache.put, form_id, text)
+        await asyncio.to_thread(form_layouts.put, form_id, bytes(form_bytes), [layout for _, layout in results])
+    return text, form_id
+
+async def form_questions(form_bytes, extracted_text):
+    """
+    Questions for a scanned form: a known template answers directly,
+    anything else goes through manual extraction / LLM detection
+    Returns (questions, template) where template describes the match or is None
+    """
+    try:
+        image_hash = await run_ocr(upload_page_hash, form_bytes)
+    except (OCRError, OCRBusyError, OCRTimeoutError):
+        # The form is already OCR'd: a busy pool only costs the layout half of the match
+        image_hash = None
+    fp = fingerprint(extracted_text, image_hash)
+
+    template, similarity = template_registry.match(fp)
+    if template is not None:
+        logger.info("Matched form template %r (%.2f)", template["name"], similarity)
+        return template["questions"], {"id": template["id"], "name": template["name"], "similarity": similarity}
+
+    questions, source = await detect_form_questions_with_source(extracted_text)
+    # Only fresh LLM answers count as agreement: a cache hit repeats an earlier answer
+    if FORM_TEMPLATE_AUTO_PROMOTE and source == "llm":
+        # Name the template after the form's first line of text (usually its title)
+        title = next((line.strip() for line in extracted_text.splitlines() if line.strip()), None)
+        await asyncio.to_thread(template_registry.propose, fp, questions, title[:80] if title else None)
+    return questions, None
+
+async def place_questions(form_id, questions):
+    """Tie questions to label positions on the cached form layout; returns how many were placed"""
+    entry = await asyncio.to_thread(form_layouts.get, form_id)
+    if entry is None:
+        return 0
+    fields = locate_questions(questions, entry["pages"])
+    await asyncio.to_thread(form_layouts.set_fields, form_id, fields)
+    return len(fields)
 
 class UserProfile(BaseModel):
     email: str
@@ -44,27 +203,36 @@ class RegisterRequest(BaseModel):
     password: str
     name: str
 
+class AnswerToValidate(BaseModel):
+    id: Optional[Any] = None
+    question: str
+    answer: str
+    field_type: Optional[str] = None
+    required: Optional[bool] = None
+
+class ValidateAnswersRequest(BaseModel):
+    answers: List[AnswerToValidate]
+
 class GeneratePDFRequest(BaseModel):
     answers: Dict[str, Any]
     documents: Optional[Dict[str, Any]] = {}
     user_profile: Optional[Dict[str, Any]] = {}
+    form_id: Optional[str] = None     # from /scan-form: draw the answers onto that form
 
 # Step 1: Upload and scan form to detect questions
 @app.post("/scan-form")
 async def scan_form(file: UploadFile):
     """Scan uploaded form and detect all questions using OCR + AI"""
+    form_bytes = b""
     try:
-        print(f"\n{'='*60}")
-        print(f"📤 Received form upload: {file.filename}")
-        
         # Extract text from form using OCR
-        form_bytes = await file.read()
-        print(f"📦 File size: {len(form_bytes)} bytes")
+        form_bytes = read_document(file)
+        logger.info("Received form upload", extra={"upload_bytes": len(form_bytes)})
         
-        extracted_text = extract_text(form_bytes)
+        extracted_text, form_id = await ocr_form(form_bytes)
         
         if extracted_text.startswith("ERROR:"):
-            print(f"❌ OCR failed: {extracted_text}")
+            logger.warning("OCR failed: %s", extracted_text[:200])
             return {
                 "success": False,
                 "error": extracted_text,
@@ -72,46 +240,211 @@ async def scan_form(file: UploadFile):
                 "questions": []
             }
         
-        print(f"✅ OCR extracted {len(extracted_text)} characters")
-        print(f"📄 Text preview: {extracted_text[:300]}...")
+        pages = split_pages(extracted_text)
+        logger.info("OCR extracted %d characters from %d page(s)", len(extracted_text), len(pages))
+        log_payload(logger, "OCR text", extracted_text)
         
-        # Use AI to detect questions from the extracted text
-        questions = detect_form_questions(extracted_text)
+        # Known template first, otherwise use AI to detect questions from the extracted text
+        questions, template = await form_questions(form_bytes, extracted_text)
+        located = await place_questions(form_id, questions)
         
-        print(f"✅ Detected {len(questions)} questions")
-        for i, q in enumerate(questions[:3], 1):
-            print(f"   {i}. {q['question']}")
-        print(f"{'='*60}\n")
+        logger.info("Detected %d questions (%d placed on the form)", len(questions), located)
         
         return {
             "success": True,
             "extracted_text": extracted_text,
+            "pages": pages,
+            "page_count": len(pages),
             "questions": questions,
-            "total_questions": len(questions)
+            "total_questions": len(questions),
+            "template": template,
+            "form_id": form_id
         }
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"❌ Error in scan_form: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in scan_form: %s", e)
         return {"success": False, "error": str(e)}
+    finally:
+        release_upload(form_bytes)
+
+# Step 1 (streaming): same as /scan-form, but reports progress as NDJSON events
+@app.post("/scan-form-stream")
+async def scan_form_stream(file: UploadFile):
+    """
+    Scan uploaded form and stream one JSON object per line as each stage finishes:
+    received -> page (one per OCR'd page) -> ocr_done -> manual_questions -> questions
+    Any failure ends the stream with an error event.
+    """
+    # Read before returning: the upload's spool file is closed once this handler returns.
+    # The mapping outlives it and is released after the response, even on disconnect
+    form_bytes = read_document(file)
+    return StreamingResponse(
+        scan_form_events(file.filename, form_bytes),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release_upload, form_bytes)
+    )
+
+def ndjson_event(event, **data):
+    return json.dumps({"event": event, **data}) + "\n"
+
+async def scan_form_events(filename, form_bytes):
+    try:
+        yield ndjson_event("received", filename=filename, size=len(form_bytes))
+
+        form_id = make_key(form_bytes)
+        extracted_text = await asyncio.to_thread(ocr_cache.get, form_id)
+        if extracted_text is not None and await asyncio.to_thread(form_layouts.has, form_id):
+            pages = split_pages(extracted_text)
+            for number, page_text in enumerate(pages, 1):
+                yield ndjson_event("page", page=number, page_count=len(pages), text=page_text, cached=True)
+        else:
+            # Split once, so each page job is sent only its own page rather than the whole upload
+            page_uploads = [form_bytes]
+            if may_have_pages(form_bytes):
+                page_uploads = await run_ocr(split_upload, form_bytes) or page_uploads
+            page_count = len(page_uploads)
+            pages = [None] * page_count
+            layouts = [None] * page_count
+
+            # Every page is its own OCR job (OCR_PAGE_WORKERS at a time), reported as soon as it finishes
+            async with contextlib.aclosing(run_ocr_pages(extract_page_layout, page_uploads)) as finished:
+                async for index, (page_text, layout) in finished:
+                    pages[index] = page_text
+                    layouts[index] = layout
+                    yield ndjson_event("page", page=index + 1, page_count=page_count, text=page_text, cached=False)
+
+            extracted_text = PAGE_SEPARATOR.join(pages)
+            await asyncio.to_thread(ocr_cache.put, form_id, extracted_text)
+            await asyncio.to_thread(form_layouts.put, form_id, bytes(form_bytes), layouts)
+
+        yield ndjson_event("ocr_done", extracted_text=extracted_text, page_count=len(pages))
+
+        # Cheap local guess first, so the client has something to show right away
+        manual_questions = extract_questions_manually(extracted_text.replace(PAGE_SEPARATOR, "\n\n"))
+        yield ndjson_event("manual_questions", questions=manual_questions)
+
+        questions, template = await form_questions(form_bytes, extracted_text)
+        await place_questions(form_id, questions)
+        yield ndjson_event(
+            "questions", questions=questions, total_questions=len(questions), template=template, form_id=form_id
+        )
+    except OCRBusyError as e:
+        yield ndjson_event("error", error=str(e), status_code=503)
+    except OCRTimeoutError as e:
+        yield ndjson_event("error", error=str(e), status_code=504)
+    except OCRError as e:
+        yield ndjson_event("error", error=str(e))
+    except HTTPException as e:
+        yield ndjson_event("error", error=e.detail, status_code=e.status_code)
+    except Exception as e:
+        logger.exception("Error in scan_form_stream: %s", e)
+        yield ndjson_event("error", error=str(e))
+
+# Known form templates
+@app.get("/form-templates")
+async def list_form_templates():
+    """List registered form templates and registry hit/miss counters"""
+    return {"success": True, "templates": template_registry.list(), "stats": template_registry.stats()}
+
+@app.delete("/form-templates/{template_id}")
+async def delete_form_template(template_id: str):
+    """Remove a form template (e.g. one promoted from a bad LLM answer)"""
+    if not await asyncio.to_thread(template_registry.remove, template_id):
+        raise HTTPException(status_code=404, detail="Template not found")
+    return {"success": True, "message": "Template removed"}
 
 # Step 2: Convert speech to text for answering questions
 @app.post("/speech-to-text")
 async def speech_api(file: UploadFile):
     """Convert voice recording to text"""
+    audio_bytes = b""
     try:
-        text = speech_to_text(await file.read())
-        return {"success": True, "text": text}
+        audio_bytes = read_upload(file, AUDIO_UPLOAD_MAX_BYTES)
+        text, audio = await transcribe_recording(audio_bytes, file.filename or "input.wav")
+        return {"success": True, "text": text, "audio": audio}
+    except HTTPException:
+        raise
+    except STTError as e:
+        return {"success": False, "error": str(e), "text": ""}
     except Exception as e:
         return {"success": False, "error": str(e), "text": ""}
+    finally:
+        release_upload(audio_bytes)
+
+@app.websocket("/ws/speech-to-text")
+async def speech_stream(websocket: WebSocket, sample_rate: int = STT_STREAM_SAMPLE_RATE):
+    """
+    Live voice answers: the client sends 16-bit mono PCM chunks (binary messages)
+    while recording and {"type": "stop"} when done. The server replies with
+    {"type": "partial"} and {"type": "final"} transcripts as speech is detected,
+    then {"type": "done", "text": full transcript}.
+    """
+    await websocket.accept()
+    if not 8000 <= sample_rate <= 48000:
+        await websocket.send_json({"type": "error", "error": "sample_rate must be between 8000 and 48000"})
+        await websocket.close(code=1003)
+        return
+
+    recognizer = StreamingRecognizer(sample_rate)
+    chunks = asyncio.Queue()
+    buffered = 0
+
+    async def receive_audio():
+        # Reads ahead of recognition; buffered bytes are the per-connection memory bound
+        nonlocal buffered
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                await chunks.put(None)
+                return
+            if message.get("bytes"):
+                data = message["bytes"]
+                if buffered + len(data) > STT_STREAM_MAX_BUFFER_BYTES:
+                    await chunks.put(OverflowError())
+                    return
+                buffered += len(data)
+                await chunks.put(data)
+            elif message.get("text"):
+                try:
+                    control = json.loads(message["text"])
+                except ValueError:
+                    control = {}
+                if isinstance(control, dict) and control.get("type") == "stop":
+                    await chunks.put(None)
+                    return
+
+    receiver = asyncio.create_task(receive_audio())
+    try:
+        while True:
+            item = await chunks.get()
+            if item is None:
+                break
+            if isinstance(item, OverflowError):
+                await websocket.send_json({"type": "error", "error": "Audio is arriving faster than it can be recognised"})
+                await websocket.close(code=1008)
+                return
+            buffered -= len(item)
+            for event in await recognizer.feed(item):
+                await websocket.send_json(event)
+        for event in await recognizer.finish():
+            await websocket.send_json(event)
+        await websocket.send_json({"type": "done", "text": recognizer.transcript})
+        await websocket.close()
+    except (WebSocketDisconnect, RuntimeError):
+        pass    # client went away mid-stream
+    finally:
+        receiver.cancel()
 
 # Step 3: Upload supporting documents
 @app.post("/upload-document")
 async def upload_document(file: UploadFile, document_type: str = Form(...)):
     """Upload and extract text from supporting documents"""
+    doc_bytes = b""
     try:
-        doc_bytes = await file.read()
-        extracted_text = extract_text(doc_bytes)
+        doc_bytes = read_document(file)
+        extracted_text = await ocr_text(doc_bytes)
         
         return {
             "success": True,
@@ -119,18 +452,21 @@ async def upload_document(file: UploadFile, document_type: str = Form(...)):
             "extracted_text": extracted_text,
             "filename": file.filename
         }
+    except HTTPException:
+        raise
     except Exception as e:
         return {"success": False, "error": str(e)}
+    finally:
+        release_upload(doc_bytes)
 
 # NEW: Auto-fill from ID card
 @app.post("/auto-fill-from-id")
 async def auto_fill_from_id(file: UploadFile):
     """Upload ID card and extract all structured data for auto-filling form"""
+    doc_bytes = b""
     try:
-        from utils.ocr_extractor import extract_id_data
-        
-        doc_bytes = await file.read()
-        id_data = extract_id_data(doc_bytes)
+        doc_bytes = read_document(file)
+        id_data = parse_id_data(await ocr_text(doc_bytes))
         
         if "error" in id_data:
             return {
@@ -144,22 +480,18 @@ async def auto_fill_from_id(file: UploadFile):
             "data": id_data,
             "message": f"Extracted data from {id_data.get('document_type', 'ID card')}"
         }
+    except HTTPException:
+        raise
     except Exception as e:
         return {"success": False, "error": str(e), "data": None}
+    finally:
+        release_upload(doc_bytes)
 
 # Step 4: User authentication - Register
 @app.post("/register")
 async def register(request: RegisterRequest):
     """Register new user"""
-    if request.email in users_db:
-        raise HTTPException(status_code=400, detail="User already exists")
-    
-    users_db[request.email] = {
-        "password": request.password,  # In production, hash this!
-        "name": request.name
-    }
-    
-    user_profiles[request.email] = {
+    profile = {
         "name": request.name,
         "email": request.email,
         "phone": "",
@@ -167,6 +499,12 @@ async def register(request: RegisterRequest):
         "dob": "",
         "documents": {}
     }
+    # Password hashing and SQLite writes are blocking, so they run in a worker thread
+    created = await asyncio.to_thread(
+        user_store.create_user, request.email, request.password, request.name, profile
+    )
+    if not created:
+        raise HTTPException(status_code=400, detail="User already exists")
     
     return {"success": True, "message": "User registered successfully"}
 
@@ -174,15 +512,16 @@ async def register(request: RegisterRequest):
 @app.post("/login")
 async def login(request: LoginRequest):
     """Login user"""
-    if request.email not in users_db:
+    valid = await asyncio.to_thread(user_store.verify_password, request.email, request.password)
+    if valid is None:
         raise HTTPException(status_code=404, detail="User not found")
     
-    if users_db[request.email]["password"] != request.password:
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid password")
     
     return {
         "success": True,
-        "profile": user_profiles.get(request.email, {})
+        "profile": await asyncio.to_thread(user_store.get_profile, request.email) or {}
     }
 
 # Step 6: Save/Update user profile
@@ -191,7 +530,7 @@ async def save_profile(email: str = Form(...), profile_data: str = Form(...)):
     """Save user profile for future use"""
     try:
         profile = json.loads(profile_data)
-        user_profiles[email] = profile
+        await asyncio.to_thread(user_store.save_profile, email, profile)
         return {"success": True, "message": "Profile saved successfully"}
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -200,54 +539,147 @@ async def save_profile(email: str = Form(...), profile_data: str = Form(...)):
 @app.get("/get-profile/{email}")
 async def get_profile(email: str):
     """Get saved user profile"""
-    if email not in user_profiles:
+    profile = await asyncio.to_thread(user_store.get_profile, email)
+    if profile is None:
         raise HTTPException(status_code=404, detail="Profile not found")
     
-    return {"success": True, "profile": user_profiles[email]}
+    return {"success": True, "profile": profile}
 
 # Step 8: Generate filled PDF form
 @app.post("/generate-filled-form")
 async def generate_filled_form(request: GeneratePDFRequest):
     """Generate filled PDF form with all answers and documents"""
     try:
-        print(f"\n{'='*60}")
-        print(f"📄 Generating PDF")
-        print(f"📦 Request data received")
-        
         data = {
             "answers": request.answers,
             "documents": request.documents,
             "user_profile": request.user_profile
         }
         
-        print(f"✅ Data prepared successfully")
-        print(f"   - Answers: {len(data.get('answers', {}))} questions")
-        print(f"   - Documents: {len(data.get('documents', {}))} files")
+        logger.info(
+            "Generating PDF",
+            extra={"answers": len(data.get("answers") or {}), "documents": len(data.get("documents") or {})}
+        )
         
-        file_path = fill_pdf_form(data)
-        print(f"✅ PDF generated: {file_path}")
-        print(f"{'='*60}\n")
+        # Rendering is CPU-bound; each request gets its own buffer, so nothing is shared on disk
+        entry = await asyncio.to_thread(form_layouts.get, request.form_id) if request.form_id else None
+        if request.form_id and entry is None:
+            logger.warning(
+                "Form layout %s not found (evicted, or scanned by another worker without OCR_CACHE_DIR); "
+                "using the generic PDF", request.form_id[:12]
+            )
+        if entry is not None and entry["fields"]:
+            # Fill the scanned form itself from its cached layout (no OCR needed)
+            logger.info("Overlaying answers on scanned form %s", request.form_id[:12])
+            with POOL_IN_FLIGHT.track(pool="pdf"), stage_timer("pdf_render"):
+                pdf = await asyncio.to_thread(overlay_pdf, entry, data["answers"])
+        else:
+            with POOL_IN_FLIGHT.track(pool="pdf"), stage_timer("pdf_render"):
+                pdf = await asyncio.to_thread(fill_pdf_form, data)
+        size = pdf.seek(0, os.SEEK_END)
+        pdf.seek(0)
+        logger.info("PDF generated", extra={"pdf_bytes": size})
         
-        return FileResponse(
-            file_path, 
-            media_type='application/pdf', 
-            filename='filled_form.pdf'
+        return StreamingResponse(
+            iter_pdf(pdf),
+            media_type='application/pdf',
+            headers={
+                "Content-Length": str(size),
+                "Content-Disposition": 'attachment; filename="filled_form.pdf"'
+            }
         )
     except Exception as e:
-        print(f"❌ Error generating PDF: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error generating PDF: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+def pdf_payload(item):
+    """fill_pdf_form data for one GeneratePDFRequest-shaped dict"""
+    request = GeneratePDFRequest(**item)
+    return {
+        "answers": request.answers,
+        "documents": request.documents,
+        "user_profile": request.user_profile
+    }
+
+def bulk_forms(items):
+    """
+    (index, payload) for every bulk item (a dict, or one NDJSON line),
+    or (index, error message) for items that are not valid requests
+    """
+    for index, item in enumerate(items, 1):
+        if index > PDF_BULK_MAX_FORMS:
+            yield index, f"Batch limit of {PDF_BULK_MAX_FORMS} forms reached; remaining forms were skipped"
+            return
+        try:
+            if isinstance(item, bytes):
+                item = json.loads(item)
+            yield index, pdf_payload(item)
+        except Exception as e:
+            yield index, f"Invalid form: {e}"
+
+# Step 8 (bulk): Generate many filled PDFs as one ZIP
+@app.post("/generate-filled-forms-bulk")
+async def generate_filled_forms_bulk(request: Request):
+    """
+    Render many filled forms in parallel and stream them back as a ZIP
+    Body: a JSON array of GeneratePDFRequest objects, {"forms": [...]}, or
+    NDJSON (Content-Type: application/x-ndjson) with one request per line;
+    bodies over BULK_JSON_MAX_BYTES must be NDJSON
+    """
+    # Spool the body first: the response streams while the forms are read back,
+    # and memory stays bounded however large the batch is
+    body = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    try:
+        async for chunk in request.stream():
+            body.write(chunk)
+        size = body.tell()
+        body.seek(0)
+        if "ndjson" in request.headers.get("content-type", ""):
+            items = (line for line in body if line.strip())
+        elif size > BULK_JSON_MAX_BYTES:
+            body.close()
+            raise HTTPException(
+                status_code=413,
+                detail=f"JSON bodies over {BULK_JSON_MAX_BYTES} bytes must be sent as NDJSON (application/x-ndjson)"
+            )
+        else:
+            # Parsed off the event loop: a large array takes a while to decode
+            items = await asyncio.to_thread(json.load, body)
+            if isinstance(items, dict):
+                items = items.get("forms")
+            if not isinstance(items, list):
+                raise ValueError('expected a list of forms or {"forms": [...]}')
+    except ValueError as e:
+        body.close()
+        raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+    forms = bulk_forms(items)
+    
+    async def zip_chunks():
+        try:
+            async for chunk in bulk_pdf_zip(forms):
+                if chunk:
+                    yield chunk
+        finally:
+            body.close()
+    
+    logger.info("Bulk PDF generation started")
+    return StreamingResponse(
+        zip_chunks(),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="filled_forms.zip"'}
+    )
+
 # Step 9: Validate answer with AI
 @app.post("/validate-answer")
 async def validate_answer_api(
     question: str = Form(...),
-    answer: str = Form(...)
+    answer: str = Form(""),
+    field_type: Optional[str] = Form(None),
+    required: Optional[bool] = Form(None)
 ):
-    """Use AI to validate if answer is appropriate for the question"""
+    """Use AI to validate if answer is appropriate for the question (empty is fine when required is false)"""
     try:
-        is_valid, suggestion = validate_answer(question, answer)
+        is_valid, suggestion = await validate_answer(question, answer, field_type, required is not False)
         return {
             "success": True,
             "is_valid": is_valid,
@@ -255,3 +687,56 @@ async def validate_answer_api(
         }
     except Exception as e:
         return {"success": False, "error": str(e)}
+
+# Step 9 (batch): Validate every answer of a form in one call
+@app.post("/validate-answers")
+async def validate_answers_api(request: ValidateAnswersRequest):
+    """Validate all question/answer pairs of a form; failed chunks return partial results"""
+    try:
+        results = await validate_answers([item.dict() for item in request.answers])
+        return {
+            "success": True,
+            "results": results,
+            "all_validated": all(r["validated"] for r in results)
+        }
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+# OCR cache statistics
+@app.get("/ocr-cache-stats")
+async def ocr_cache_stats():
+    """Hit/miss counters for the OCR result cache"""
+    return {"success": True, "stats": ocr_cache.stats(), "layout_cache": form_layouts.stats()}
+
+# LLM question cache statistics
+@app.get("/llm-cache-stats")
+async def llm_cache_stats():
+    """Hit/miss counters for the question-detection cache"""
+    return {"success": True, "stats": question_cache.stats()}
+
+
+def cache_metrics():
+    """Hit/miss counters the caches already keep, read at scrape time"""
+    ocr = ocr_cache.stats()
+    caches = {
+        "ocr": (ocr["memory_hits"] + ocr["disk_hits"], ocr["misses"]),
+        "llm_questions": (question_cache.hits, question_cache.misses),
+        "form_layout": (form_layouts.hits, form_layouts.misses),
+        "form_template": (template_registry.hits, template_registry.misses),
+        "profile": (user_store.profiles.hits, user_store.profiles.misses),
+    }
+    return [
+        ("bharatvoice_cache_hits_total", "counter", "Cache lookups answered from the cache", ["cache"],
+         [((name,), hits) for name, (hits, _) in caches.items()]),
+        ("bharatvoice_cache_misses_total", "counter", "Cache lookups that missed", ["cache"],
+         [((name,), misses) for name, (_, misses) in caches.items()]),
+    ]
+
+
+register_collector(cache_metrics)
+
+# Prometheus metrics for this worker process
+@app.get("/metrics")
+async def metrics():
+    """Request/stage latency histograms, cache and fallback counters, pool gauges"""
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
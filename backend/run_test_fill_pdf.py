@@ -7,7 +7,9 @@ if __name__ == '__main__':
         "user_profile": {"name": "Test User", "email": "test@example.com"}
     }
     try:
-        path = fill_pdf_form(data)
+        path = 'filled_form.pdf'
+        with open(path, 'wb') as f:
+            fill_pdf_form(data, f)
         print('PDF generated at:', path)
     except Exception as e:
         import traceback
@@ -0,0 +1,201 @@
+import io
+import os
+import wave
+
+import numpy as np
+
+from utils.metrics import AUDIO_UNDECODED
+from utils.structured_log import get_logger
+from utils.uploads import as_stream
+
+# Audio preprocessing configuration
+# Recordings are decoded, downmixed, resampled and trimmed before any STT backend sees them
+AUDIO_PREPROCESS = os.getenv("AUDIO_PREPROCESS", "true").lower() in ("1", "true", "yes")
+AUDIO_TARGET_RATE = int(os.getenv("AUDIO_TARGET_RATE", "16000"))
+AUDIO_MAX_SECONDS = float(os.getenv("AUDIO_MAX_SECONDS", "120"))
+AUDIO_TRIM_PADDING_MS = int(os.getenv("AUDIO_TRIM_PADDING_MS", "200"))   # kept around detected speech
+# Voice activity detection (shared with live recognition)
+STT_VAD_THRESHOLD_DB = float(os.getenv("STT_VAD_THRESHOLD_DB", "-45"))   # never speech below this level
+STT_VAD_MARGIN_DB = float(os.getenv("STT_VAD_MARGIN_DB", "10"))          # speech is this far above the noise floor
+
+TRIM_FRAME_MS = 30
+
+logger = get_logger("audio")
+
+# Leading bytes of the containers browsers record into
+_SIGNATURES = [
+    (0, b"\x1a\x45\xdf\xa3", "webm"),
+    (0, b"OggS", "ogg"),
+    (4, b"ftyp", "mp4"),
+    (0, b"ID3", "mp3"),
+    (0, b"\xff\xfb", "mp3"),
+    (0, b"fLaC", "flac"),
+]
+
+
+class DecoderMissingError(ValueError):
+    """Compressed audio arrived but PyAV is not installed"""
+
+
+def sniff_extension(data, filename="input.wav"):
+    """File extension for the audio's real container (backends pick the decoder by name)"""
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        return "wav"
+    for offset, magic, extension in _SIGNATURES:
+        if data[offset:offset + len(magic)] == magic:
+            return extension
+    return filename.rsplit(".", 1)[-1].lower() if "." in filename else "wav"
+
+
+def pcm_to_wav(pcm, sample_rate):
+    """Wrap 16-bit mono PCM in a WAV container (what the STT backends accept)"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def _decode_wav(data, max_seconds):
+    """PCM WAV with the standard library: (float32 samples of shape (n, channels), sample rate)"""
+    with wave.open(as_stream(data)) as wav:
+        channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+        raw = wav.readframes(min(wav.getnframes(), int(max_seconds * rate)))
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768
+    elif width == 3:
+        triples = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = triples[:, 0] | (triples[:, 1] << 8) | (triples[:, 2] << 16)
+        samples = (np.where(values & 0x800000, values - (1 << 24), values)).astype(np.float32) / 8388608
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648
+    else:
+        raise ValueError(f"unsupported WAV sample width {width}")
+    return samples.reshape(-1, channels), rate
+
+
+def _decode_av(data, max_seconds, rate):
+    """
+    Compressed recordings (WebM/Opus, Ogg, MP4/AAC, MP3) with PyAV. ffmpeg's
+    resampler does the downmix and rate conversion while decoding.
+    """
+    import av
+    limit = int(max_seconds * rate)
+    chunks, total = [], 0
+    with av.open(as_stream(data)) as container:
+        resampler = av.AudioResampler(format="flt", layout="mono", rate=rate)
+        for frame in container.decode(audio=0):
+            for out in resampler.resample(frame):
+                chunks.append(out.to_ndarray().reshape(-1))
+                total += chunks[-1].size
+            if total >= limit:
+                break
+        else:
+            for out in resampler.resample(None):
+                chunks.append(out.to_ndarray().reshape(-1))
+    if not chunks:
+        raise ValueError("no audio stream")
+    return np.concatenate(chunks)[:limit].reshape(-1, 1), rate
+
+
+def decode_audio(data, max_seconds=AUDIO_MAX_SECONDS, rate=AUDIO_TARGET_RATE):
+    """(float32 samples of shape (n, channels), sample rate); raises ValueError for undecodable audio"""
+    if sniff_extension(data) == "wav":
+        try:
+            return _decode_wav(data, max_seconds)
+        except (wave.Error, EOFError, ValueError):
+            pass    # e.g. float WAV; PyAV can still read it
+    try:
+        return _decode_av(data, max_seconds, rate)
+    except ImportError:
+        raise DecoderMissingError("compressed audio needs PyAV (pip install av)") from None
+    except Exception as e:
+        raise ValueError(f"could not decode audio ({str(e)[:100]})") from e
+
+
+def resample(samples, source_rate, target_rate):
+    """
+    Band-limited resampling of a mono signal in the frequency domain: dropping
+    the bins above the new Nyquist frequency is the anti-aliasing filter
+    """
+    if source_rate == target_rate or samples.size == 0:
+        return samples
+    n_out = max(1, round(samples.size * target_rate / source_rate))
+    spectrum = np.fft.rfft(samples)
+    bins = n_out // 2 + 1
+    if bins > spectrum.size:
+        spectrum = np.concatenate([spectrum, np.zeros(bins - spectrum.size, dtype=spectrum.dtype)])
+    resampled = np.fft.irfft(spectrum[:bins], n_out) * (n_out / samples.size)
+    return resampled.astype(np.float32)
+
+
+def trim_silence(samples, rate, padding_ms=AUDIO_TRIM_PADDING_MS):
+    """
+    Cut leading and trailing silence. Frame levels are compared against the
+    quietest tenth of the recording (its noise floor); if nothing stands out as
+    speech the audio is left as it is for the backend to judge.
+    """
+    frame = int(rate * TRIM_FRAME_MS / 1000)
+    count = samples.size // frame
+    if count < 2:
+        return samples
+    frames = samples[:count * frame].reshape(count, frame)
+    levels = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-20)
+    floor = np.percentile(levels, 10)
+    speech = np.flatnonzero(levels > max(STT_VAD_THRESHOLD_DB, floor + STT_VAD_MARGIN_DB))
+    if speech.size == 0:
+        return samples
+    padding = int(rate * padding_ms / 1000)
+    start = max(0, speech[0] * frame - padding)
+    end = min(samples.size, (speech[-1] + 1) * frame + padding)
+    return samples[start:end]
+
+
+def normalize_audio(data, filename="input.wav", keep_smaller=False):
+    """
+    Decode a recording and return it as trimmed 16 kHz mono 16-bit WAV
+    Returns (audio bytes, filename, stats). Audio that cannot be decoded goes
+    through unchanged (with a filename matching its real format; logged and
+    counted in bharatvoice_audio_undecoded_total). With keep_smaller set, a
+    recording whose normalized form is bigger is also sent as it is (a
+    compressed Opus upload costs less to send than the equivalent WAV), but only
+    when neither the AUDIO_MAX_SECONDS cap nor trimming shortened it.
+    """
+    stats = {"normalized": False, "original_bytes": len(data), "bytes": len(data)}
+    original_name = f"{filename.rsplit('.', 1)[0] or 'input'}.{sniff_extension(data, filename)}"
+    try:
+        samples, rate = decode_audio(data)
+    except ValueError as e:
+        reason = "no_decoder" if isinstance(e, DecoderMissingError) else "invalid"
+        AUDIO_UNDECODED.inc(reason=reason)
+        stats["reason"] = str(e)
+        logger.warning("Audio sent without preprocessing", extra={"audio": stats})
+        return data, original_name, stats
+
+    # The decoders stop at the cap, so a full-length result means the recording was cut
+    capped = samples.shape[0] >= int(AUDIO_MAX_SECONDS * rate)
+    channels = samples.shape[1]
+    mono = samples.mean(axis=1, dtype=np.float32) if channels > 1 else samples[:, 0]
+    mono = resample(mono, rate, AUDIO_TARGET_RATE)
+    duration = mono.size / AUDIO_TARGET_RATE
+    mono = trim_silence(mono, AUDIO_TARGET_RATE)
+    pcm = (np.clip(mono, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+    audio = pcm_to_wav(pcm, AUDIO_TARGET_RATE)
+
+    stats.update({
+        "source_rate": rate,
+        "source_channels": channels,
+        "seconds": round(mono.size / AUDIO_TARGET_RATE, 2),
+        "trimmed_seconds": round(duration - mono.size / AUDIO_TARGET_RATE, 2),
+        "capped": capped,
+    })
+    shortened = capped or stats["trimmed_seconds"] > 0
+    if keep_smaller and not shortened and len(audio) >= len(data):
+        stats["reason"] = "original is smaller"
+        return data, original_name, stats
+    stats.update({"normalized": True, "bytes": len(audio)})
+    return audio, "audio.wav", stats
@@ -0,0 +1,327 @@
+import json
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+
+from PIL import ImageOps
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfgen import canvas
+
+from utils.label_matcher import label_matcher
+from utils.ocr_cache import OCR_CACHE_DIR, DiskBudget, atomic_write
+from utils.ocr_extractor import load_page
+from utils.pdf_generator import (
+    PAGE_HEIGHT, PAGE_WIDTH, PDF_SPOOL_MAX_BYTES, PageLayout, draw_page_template, wrap_text
+)
+from utils.structured_log import get_logger
+
+# Form layout cache configuration
+# Holds each scanned form's bytes and word boxes so PDFs can be drawn onto it later
+FORM_LAYOUT_CACHE_MAX_BYTES = int(os.getenv("FORM_LAYOUT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Longest side of the page images embedded in overlay PDFs
+OVERLAY_MAX_SIDE = int(os.getenv("OVERLAY_MAX_SIDE", "2000"))
+
+ANSWER_FONT = "Helvetica"
+ANSWER_COLOR = (0.05, 0.15, 0.55)       # blue ink, so answers stand out from the printed form
+MIN_FONT_SIZE = 6
+MAX_FONT_SIZE = 14
+_PUNCTUATION = set(":;-.")
+_QUESTION_WORD = re.compile(r"[a-z]{3,}")
+_QUESTION_STOP_WORDS = {"what", "your", "the", "and", "enter", "please", "provide"}
+# form_ids are OCR cache keys (ocr_cache.make_key); they also name files in the cache directory
+_FORM_ID = re.compile(r"^[0-9a-f]{64}-[0-9a-f]{12}$")
+
+logger = get_logger("form_overlay")
+
+
+def valid_form_id(form_id):
+    """Whether a client-supplied form_id looks like a cache key (anything else is treated as a miss)"""
+    return isinstance(form_id, str) and bool(_FORM_ID.match(form_id))
+
+
+class FormLayoutCache:
+    """
+    Scanned forms (upload bytes, page word boxes, question boxes): an in-memory
+    LRU bounded by size, plus the OCR cache directory (OCR_CACHE_DIR) when set,
+    so a form_id scanned by one worker can be filled by another
+    """
+
+    def __init__(self, max_bytes=FORM_LAYOUT_CACHE_MAX_BYTES, cache_dir=OCR_CACHE_DIR):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._budget = DiskBudget(cache_dir)
+
+    @staticmethod
+    def _entry_size(entry):
+        # Word boxes cost roughly 100 bytes each as Python objects
+        return len(entry["file_bytes"]) + 100 * sum(len(page["words"]) for page in entry["pages"])
+
+    def get(self, form_id):
+        """Cached entry for a form_id, or None (may read the disk tier: call it from a thread)"""
+        if not valid_form_id(form_id):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            entry = self._entries.get(form_id)
+            if entry is not None:
+                self._entries.move_to_end(form_id)
+                self.hits += 1
+                return entry
+        entry = self._read_disk(form_id)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        self._store_memory(form_id, entry)
+        return entry
+
+    def has(self, form_id):
+        """Whether a form is cached, without loading it from disk"""
+        if not valid_form_id(form_id):
+            return False
+        with self._lock:
+            if form_id in self._entries:
+                return True
+        return bool(self.cache_dir) and os.path.exists(self._disk_path(form_id, "layout.json"))
+
+    def put(self, form_id, file_bytes, pages):
+        """Store a scanned form in both tiers (writes the disk tier: call it from a thread)"""
+        entry = {"file_bytes": file_bytes, "pages": pages, "fields": {}}
+        self._store_memory(form_id, entry)
+        if self.cache_dir:
+            try:
+                atomic_write(self._disk_path(form_id, "form"), file_bytes)
+                self._write_layout(form_id, entry)
+            except OSError as e:
+                logger.warning("Could not write form layout: %s", e)
+                return
+            self._budget.note_write(len(file_bytes))
+
+    def _store_memory(self, form_id, entry):
+        size = self._entry_size(entry)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(form_id, None)
+            if old is not None:
+                self._size -= self._entry_size(old)
+            self._entries[form_id] = entry
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= self._entry_size(evicted)
+
+    def set_fields(self, form_id, fields):
+        with self._lock:
+            entry = self._entries.get(form_id)
+            if entry is not None:
+                entry["fields"] = fields
+        if entry is not None and self.cache_dir:
+            try:
+                self._write_layout(form_id, entry)
+            except OSError as e:
+                logger.warning("Could not write form layout: %s", e)
+
+    def _disk_path(self, form_id, suffix):
+        return os.path.join(self.cache_dir, form_id[:2], f"{form_id}.{suffix}")
+
+    def _write_layout(self, form_id, entry):
+        layout = {"pages": entry["pages"], "fields": entry["fields"]}
+        atomic_write(self._disk_path(form_id, "layout.json"), json.dumps(layout))
+
+    def _read_disk(self, form_id):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._disk_path(form_id, "layout.json"), "r", encoding="utf-8") as f:
+                layout = json.load(f)
+            with open(self._disk_path(form_id, "form"), "rb") as f:
+                file_bytes = f.read()
+        except (OSError, ValueError):
+            return None
+        return {"file_bytes": file_bytes, "pages": layout["pages"], "fields": layout["fields"]}
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+def _page_lines(page):
+    """Word indexes of a page grouped by OCR line"""
+    lines = OrderedDict()
+    for index, word in enumerate(page["words"]):
+        lines.setdefault(word[5], []).append(index)
+    return list(lines.values())
+
+
+def _answer_box(words, line, first, last):
+    """Where the answer to a label spanning line[first..last] goes: right of the label (and its colon)"""
+    label_words = [words[line[k]] for k in range(first, last + 1)]
+    x = label_words[-1][1] + label_words[-1][3]
+    following = last + 1
+    if following < len(line) and set(words[line[following]][0]) <= _PUNCTUATION:
+        x = words[line[following]][1] + words[line[following]][3]
+        following += 1
+    # Stop before the next printed label on the same line ("Mobile ____ Email ____")
+    limit = 0.97
+    for k in range(following, len(line)):
+        if any(ch.isalnum() for ch in words[line[k]][0]):
+            limit = words[line[k]][1]
+            break
+    return {
+        "x": round(x + 0.008, 5),
+        "top": min(word[2] for word in label_words),
+        "height": max(word[4] for word in label_words),
+        "max_x": limit,
+    }
+
+
+def locate_questions(questions, pages):
+    """
+    Tie each question to the place its label was printed
+    Returns {question id (str): {"page", "x", "top", "height", "max_x"}} in page fractions
+    Labels are found with the label dictionary first (so "Date of Bich" matches
+    "Date of Birth"), then by the question's words
+    """
+    labels = {}
+    page_lines = []
+    for page_index, page in enumerate(pages):
+        words = page["words"]
+        lines = _page_lines(page)
+        page_lines.append(lines)
+        for line in lines:
+            line_text = ""
+            starts = []
+            for index in line:
+                starts.append(len(line_text))
+                line_text += words[index][0] + " "
+            for match in label_matcher.find(line_text):
+                if match["question"] in labels:
+                    continue
+                first = max(k for k, start in enumerate(starts) if start <= match["start"])
+                last = max(k for k, start in enumerate(starts) if start < match["end"])
+                labels[match["question"]] = {"page": page_index, **_answer_box(words, line, first, last)}
+
+    fields = {}
+    for question in questions:
+        text = str(question.get("question", ""))
+        canonical = label_matcher.find(text)
+        if canonical and canonical[0]["question"] in labels:
+            fields[str(question.get("id"))] = labels[canonical[0]["question"]]
+            continue
+
+        # Fallback: the line sharing most of the question's words
+        wanted = set(_QUESTION_WORD.findall(text.lower())) - _QUESTION_STOP_WORDS
+        best, best_score = None, 0
+        for page_index, lines in enumerate(page_lines):
+            words = pages[page_index]["words"]
+            for line in lines:
+                matched = [k for k, index in enumerate(line) if words[index][0].lower().strip(":.") in wanted]
+                if len(matched) > best_score:
+                    best, best_score = (page_index, line, matched[0], matched[-1]), len(matched)
+        if best is not None and best_score * 2 >= len(wanted):
+            page_index, line, first, last = best
+            fields[str(question.get("id"))] = {
+                "page": page_index, **_answer_box(pages[page_index]["words"], line, first, last)
+            }
+    return fields
+
+
+def _fit_font_size(text, size, max_width):
+    width = pdfmetrics.stringWidth(text, ANSWER_FONT, size)
+    if width > max_width and width > 0:
+        size = max(MIN_FONT_SIZE, size * max_width / width)
+    return size
+
+
+def overlay_pdf(entry, answers, output=None):
+    """
+    Draw the answers onto the original pages of a scanned form
+    entry is a FormLayoutCache entry, answers the GeneratePDFRequest answers
+    ({question id: {"question", "answer"}}). Answers without a located label
+    are listed on a final page. Returns output rewound to the start.
+    """
+    if output is None:
+        output = tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_BYTES)
+    c = canvas.Canvas(output)
+    draw_page_template(c)
+
+    placed = set()
+    by_page = {}
+    for q_id, answer_data in answers.items():
+        box = entry["fields"].get(str(q_id))
+        answer = str(answer_data.get("answer", "")).strip()
+        if box is not None and answer:
+            by_page.setdefault(box["page"], []).append((box, answer))
+            placed.add(q_id)
+
+    for page_index in range(len(entry["pages"])):
+        image = load_page(entry["file_bytes"], page_index)
+        if entry["pages"][page_index].get("exif_transposed", True):
+            # Draw on the same upright page the word boxes were measured on
+            image = ImageOps.exif_transpose(image)
+        if image.mode not in ("L", "RGB"):
+            image = image.convert("RGB")
+        dpi = image.info.get("dpi", (0, 0))[0]
+        if dpi >= 50:   # lower values are placeholders written by some cameras and scanners
+            page_width, page_height = image.width * 72 / dpi, image.height * 72 / dpi
+        else:
+            page_width = PAGE_WIDTH
+            page_height = image.height * PAGE_WIDTH / image.width
+        if max(image.size) > OVERLAY_MAX_SIDE:
+            image.thumbnail((OVERLAY_MAX_SIDE, OVERLAY_MAX_SIDE))
+
+        c.setPageSize((page_width, page_height))
+        c.drawImage(ImageReader(image), 0, 0, page_width, page_height)
+        c.setFillColorRGB(*ANSWER_COLOR)
+        for box, answer in by_page.get(page_index, []):
+            x = box["x"] * page_width
+            max_width = max(box["max_x"] * page_width - x, 1)
+            size = min(MAX_FONT_SIZE, max(MIN_FONT_SIZE, box["height"] * page_height * 0.9))
+            size = _fit_font_size(answer, size, max_width)
+            baseline = page_height - (box["top"] + box["height"]) * page_height
+            c.setFont(ANSWER_FONT, size)
+            c.drawString(x, baseline, answer)
+        c.showPage()
+
+    remaining = [answers[q_id] for q_id in answers if q_id not in placed]
+    remaining = [item for item in remaining if str(item.get("answer", "")).strip()]
+    if remaining:
+        c.setPageSize(letter)
+        layout = PageLayout(c, PAGE_HEIGHT - 1*inch)
+        layout.draw_lines(["Additional answers"], 1*inch, "Helvetica-Bold", 14, 0.5*inch)
+        for item in remaining:
+            layout.ensure_space(2*inch)
+            question_lines = wrap_text(c, str(item.get("question", "")), PAGE_WIDTH - 2*inch, "Helvetica-Bold", 11)
+            layout.draw_lines(question_lines, 1*inch, "Helvetica-Bold", 11, 0.3*inch)
+            answer_lines = wrap_text(c, str(item.get("answer", "")), PAGE_WIDTH - 2*inch, "Helvetica", 11)
+            layout.draw_lines(answer_lines, 1.2*inch, "Helvetica", 11, 0.3*inch)
+            layout.skip(0.2*inch)
+        layout.finish()
+    else:
+        c.save()
+
+    output.seek(0)
+    return output
+
+
+form_layouts = FormLayoutCache()
@@ -0,0 +1,353 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+from PIL import Image
+
+from utils.llm_cache import normalize_form_text
+from utils.ocr_extractor import load_page, OCRError, ocr_error_message
+from utils.structured_log import get_logger
+
+try:
+    import fcntl
+except ImportError:    # Windows: no cross-process lock (single-worker development)
+    fcntl = None
+
+# Template registry configuration
+FORM_TEMPLATES_PATH = os.getenv("FORM_TEMPLATES_PATH", "form_templates.json")
+# Minimum estimated Jaccard similarity of label shingles to count as the same form
+FORM_TEMPLATE_MIN_SIMILARITY = float(os.getenv("FORM_TEMPLATE_MIN_SIMILARITY", "0.8"))
+# Maximum Hamming distance between page hashes (out of 64 bits)
+FORM_TEMPLATE_MAX_HASH_DISTANCE = int(os.getenv("FORM_TEMPLATE_MAX_HASH_DISTANCE", "12"))
+# Add forms answered by the OCR + LLM path to the registry automatically, once
+# FORM_TEMPLATE_PROMOTE_AFTER fresh LLM detections of the same form (never LLM
+# cache hits, which repeat one answer) agreed on the questions
+FORM_TEMPLATE_AUTO_PROMOTE = os.getenv("FORM_TEMPLATE_AUTO_PROMOTE", "true").lower() == "true"
+FORM_TEMPLATE_PROMOTE_AFTER = int(os.getenv("FORM_TEMPLATE_PROMOTE_AFTER", "3"))
+# Templates kept; the least recently matched are dropped beyond this
+FORM_TEMPLATE_MAX_ENTRIES = int(os.getenv("FORM_TEMPLATE_MAX_ENTRIES", "500"))
+# Forms with fewer label shingles than this (blank or unreadable scans) are never matched
+FORM_TEMPLATE_MIN_SHINGLES = 8
+# Forms seen but not yet promoted (per process)
+FORM_TEMPLATE_MAX_PENDING = 256
+
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16                     # 16 bands x 4 rows: ~0.8 similarity is found with >99% probability
+HASH_BANDS = 4                     # 4 x 16-bit bands of the 64-bit page hash
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = np.random.default_rng(20240601)   # fixed seed: signatures must be stable across restarts
+_PERM_A = _rng.integers(1, 1 << 32, MINHASH_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 1 << 32, MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+_WORD = re.compile(r"[a-z]{2,}")
+
+logger = get_logger("form_templates")
+
+
+def page_hash(image):
+    """64-bit difference hash (dHash) of a page image"""
+    if image.format == "JPEG":
+        image.draft("L", (64, 64))
+    small = image.convert("L").resize((9, 8), Image.BILINEAR)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def upload_page_hash(file_bytes):
+    """Page hash of the first page of an upload (runs on the OCR executor)"""
+    try:
+        return page_hash(load_page(file_bytes, 0))
+    except Exception as e:
+        raise OCRError(ocr_error_message(e)) from None
+
+
+def label_shingles(text):
+    """Word unigrams and bigrams of the normalized OCR text"""
+    words = _WORD.findall(normalize_form_text(text))
+    shingles = set(words)
+    shingles.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return shingles
+
+
+def minhash(shingles):
+    """MinHash signature of a shingle set (MINHASH_PERMUTATIONS values)"""
+    if not shingles:
+        return np.full(MINHASH_PERMUTATIONS, _MERSENNE_PRIME, dtype=np.uint64)
+    values = np.array([zlib.crc32(s.encode("utf-8")) for s in shingles], dtype=np.uint64)
+    # (a * x + b) mod p for every permutation and shingle at once; a, x < 2^32 so no overflow
+    hashed = (_PERM_A[:, None] * values[None, :] + _PERM_B[:, None]) % _MERSENNE_PRIME
+    return hashed.min(axis=1)
+
+
+def fingerprint(text, image_hash=None):
+    """Layout + text fingerprint of a scanned form"""
+    shingles = label_shingles(text)
+    return {"page_hash": image_hash, "minhash": minhash(shingles), "shingles": len(shingles)}
+
+
+def _lsh_bands(signature):
+    rows = MINHASH_PERMUTATIONS // LSH_BANDS
+    return [
+        (band, signature[band * rows:(band + 1) * rows].tobytes())
+        for band in range(LSH_BANDS)
+    ]
+
+
+def _hash_bands(image_hash):
+    # Pigeonhole: two hashes within HASH_BANDS - 1 bits share at least one band exactly
+    return [(band, (image_hash >> (16 * band)) & 0xFFFF) for band in range(HASH_BANDS)]
+
+
+def _similarity(fp, template):
+    """Estimated label similarity of a fingerprint and a template, or None if they are different forms"""
+    similarity = float(np.mean(template["minhash"] == fp["minhash"]))
+    if similarity < FORM_TEMPLATE_MIN_SIMILARITY:
+        return None
+    if fp["page_hash"] is not None and template["page_hash"] is not None:
+        if bin(fp["page_hash"] ^ template["page_hash"]).count("1") > FORM_TEMPLATE_MAX_HASH_DISTANCE:
+            return None
+    return similarity
+
+
+@contextmanager
+def _file_lock(path):
+    """Exclusive lock shared by every worker process that writes the registry file"""
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class TemplateRegistry:
+    """
+    Known forms and their question lists, indexed by MinHash LSH over label
+    shingles and by bands of the page hash
+    """
+
+    def __init__(self, path=FORM_TEMPLATES_PATH):
+        self.path = path
+        self._templates = {}
+        self._text_index = defaultdict(set)
+        self._hash_index = defaultdict(set)
+        self._pending = OrderedDict()
+        self._removed = set()      # ids deleted or evicted here, so a merge does not bring them back
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def match(self, fp):
+        """
+        Nearest known template for a fingerprint, or None
+        Returns (template, similarity)
+        """
+        if fp["shingles"] < FORM_TEMPLATE_MIN_SHINGLES:
+            return None, 0.0
+        signature = fp["minhash"]
+        with self._lock:
+            candidates = set()
+            for band in _lsh_bands(signature):
+                candidates |= self._text_index.get(band, set())
+            if fp["page_hash"] is not None:
+                for band in _hash_bands(fp["page_hash"]):
+                    candidates |= self._hash_index.get(band, set())
+
+            best, best_score = None, 0.0
+            for template_id in candidates:
+                template = self._templates[template_id]
+                similarity = _similarity(fp, template)
+                if similarity is not None and similarity > best_score:
+                    best, best_score = template, similarity
+
+            if best is None:
+                self.misses += 1
+                return None, 0.0
+            self.hits += 1
+            best["hits"] += 1
+            best["last_used_at"] = time.time()
+            return best, best_score
+
+    def propose(self, fp, questions, name=None):
+        """
+        Count a freshly detected question list (not an LLM cache hit) towards
+        promotion; the form becomes a template once FORM_TEMPLATE_PROMOTE_AFTER
+        independent detections of it returned the same questions, so one bad
+        LLM answer is never served to later uploads
+        Returns the new template, or None while the form is still pending
+        Blocking (may write the registry file): call it from a thread
+        """
+        if fp["shingles"] < FORM_TEMPLATE_MIN_SHINGLES:
+            return None
+        labels = tuple(q.get("question", "") for q in questions)
+        with self._lock:
+            for key, entry in self._pending.items():
+                if entry["labels"] == labels and _similarity(fp, entry) is not None:
+                    entry["count"] += 1
+                    break
+            else:
+                key = uuid.uuid4().hex
+                entry = {
+                    "labels": labels,
+                    "minhash": np.asarray(fp["minhash"], dtype=np.uint64),
+                    "page_hash": fp["page_hash"],
+                    "count": 1,
+                }
+                self._pending[key] = entry
+                while len(self._pending) > FORM_TEMPLATE_MAX_PENDING:
+                    self._pending.popitem(last=False)
+            self._pending.move_to_end(key)
+            if entry["count"] < FORM_TEMPLATE_PROMOTE_AFTER:
+                return None
+            del self._pending[key]
+        logger.info("Promoting form to a template after %d agreeing detections", entry["count"])
+        return self.add(fp, questions, name=name)
+
+    def add(self, fp, questions, name=None):
+        """Register a form's question list under its fingerprint"""
+        if fp["shingles"] < FORM_TEMPLATE_MIN_SHINGLES:
+            return None
+        template = {
+            "id": uuid.uuid4().hex[:12],
+            "name": name or (questions[0]["question"] if questions else "Untitled form"),
+            "page_hash": fp["page_hash"],
+            "minhash": np.asarray(fp["minhash"], dtype=np.uint64),
+            "questions": questions,
+            "hits": 0,
+            "created_at": time.time(),
+            "last_used_at": time.time(),
+        }
+        with self._lock:
+            self._index(template)
+        self.save()
+        return template
+
+    def remove(self, template_id):
+        with self._lock:
+            if template_id not in self._templates:
+                return False
+            self._unindex(template_id)
+        self.save()
+        return True
+
+    def list(self):
+        with self._lock:
+            return [
+                {
+                    "id": t["id"],
+                    "name": t["name"],
+                    "total_questions": len(t["questions"]),
+                    "hits": t["hits"],
+                    "created_at": t["created_at"],
+                }
+                for t in self._templates.values()
+            ]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "templates": len(self._templates),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+    def save(self):
+        """
+        Write the registry to FORM_TEMPLATES_PATH atomically
+        Other workers write the same file, so under the file lock it is re-read
+        and merged first (their new templates are picked up here as well)
+        Blocking: call it from a thread on the request path
+        """
+        if not self.path:
+            return
+        with _file_lock(self.path):
+            on_disk = self._read()
+            with self._lock:
+                for template in on_disk:
+                    if template["id"] not in self._templates and template["id"] not in self._removed:
+                        self._index(template)
+                self._evict()
+                data = [
+                    {**t, "minhash": [int(v) for v in t["minhash"]]}
+                    for t in self._templates.values()
+                ]
+            tmp_path = None
+            try:
+                directory = os.path.dirname(os.path.abspath(self.path))
+                fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.warning("Could not save form templates: %s", e)
+                if tmp_path is not None and os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+
+    def _read(self):
+        """Templates in the registry file (empty if it is missing or unreadable)"""
+        if not self.path or not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Could not load form templates: %s", e)
+            return []
+        for template in data:
+            template["minhash"] = np.asarray(template["minhash"], dtype=np.uint64)
+            template.setdefault("last_used_at", template.get("created_at", 0))
+        return data
+
+    def _load(self):
+        data = self._read()
+        if not data:
+            return
+        for template in data:
+            self._index(template)
+        self._evict()
+        logger.info("Loaded %d form templates", len(self._templates))
+
+    def _evict(self):
+        """Drop the least recently matched templates beyond FORM_TEMPLATE_MAX_ENTRIES (lock held)"""
+        excess = len(self._templates) - FORM_TEMPLATE_MAX_ENTRIES
+        if excess <= 0:
+            return
+        oldest = sorted(self._templates.values(), key=lambda t: t["last_used_at"])[:excess]
+        for template in oldest:
+            self._unindex(template["id"])
+
+    def _unindex(self, template_id):
+        template = self._templates.pop(template_id)
+        self._removed.add(template_id)
+        bands = [(self._text_index, band) for band in _lsh_bands(template["minhash"])]
+        if template["page_hash"] is not None:
+            bands += [(self._hash_index, band) for band in _hash_bands(template["page_hash"])]
+        for index, band in bands:
+            index[band].discard(template_id)
+            if not index[band]:
+                del index[band]
+
+    def _index(self, template):
+        self._templates[template["id"]] = template
+        for band in _lsh_bands(template["minhash"]):
+            self._text_index[band].add(template["id"])
+        if template["page_hash"] is not None:
+            for band in _hash_bands(template["page_hash"]):
+                self._hash_index[band].add(template["id"])
+
+
+template_registry = TemplateRegistry()
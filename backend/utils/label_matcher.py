@@ -0,0 +1,256 @@
+import json
+import os
+import re
+from collections import defaultdict
+from itertools import compress
+
+from utils.structured_log import get_logger
+
+# Field label dictionary configuration
+# FORM_LABELS_PATH: optional JSON file with extra labels (same shape as DEFAULT_FORM_LABELS);
+# an entry whose "question" matches a default label replaces it
+FORM_LABELS_PATH = os.getenv("FORM_LABELS_PATH")
+# Other words allowed between the words of a multi-word alias ("Date of Birth", "Father's Name")
+LABEL_MAX_GAP = int(os.getenv("LABEL_MAX_GAP", "2"))
+
+# Aliases list content words only; misspellings that are more than the allowed
+# edit distance away from the label (see max_edits) must be listed explicitly.
+DEFAULT_FORM_LABELS = [
+    {"question": "Name", "field_type": "text", "required": True,
+     "aliases": ["name", "namo"]},
+    {"question": "Mobile Number", "field_type": "phone", "required": True,
+     "aliases": ["mobile", "phone", "contact"]},
+    {"question": "Email Address", "field_type": "email", "required": True,
+     "aliases": ["email", "emailid", "mail"]},
+    {"question": "Father's Name", "field_type": "text", "required": True,
+     "aliases": ["father name", "father namo", "fathor namo"]},
+    {"question": "Mother's Name", "field_type": "text", "required": False,
+     "aliases": ["mother name", "mother namo"]},
+    {"question": "Gender", "field_type": "text", "required": True,
+     "aliases": ["gender", "sex"]},
+    {"question": "Date of Birth", "field_type": "date", "required": True,
+     "aliases": ["date birth", "date bich", "dob", "birth date"]},
+    {"question": "Marital Status", "field_type": "text", "required": False,
+     "aliases": ["marital status", "martial status"]},
+    {"question": "Religion", "field_type": "text", "required": False,
+     "aliases": ["religion"]},
+    {"question": "Nationality", "field_type": "text", "required": False,
+     "aliases": ["nationality"]},
+    {"question": "Languages Known", "field_type": "text", "required": False,
+     "aliases": ["languages known", "language known"]},
+    {"question": "Qualification", "field_type": "text", "required": False,
+     "aliases": ["qualification", "education"]},
+    {"question": "Occupation", "field_type": "text", "required": False,
+     "aliases": ["occupation", "profession"]},
+    {"question": "Experience", "field_type": "text", "required": False,
+     "aliases": ["experience"]},
+    {"question": "Address", "field_type": "text", "required": True,
+     "aliases": ["address", "addeoss"]},
+    {"question": "PIN Code", "field_type": "text", "required": False,
+     "aliases": ["pin code", "pincode"]},
+    {"question": "Aadhaar Number", "field_type": "text", "required": False,
+     "aliases": ["aadhaar", "aadhar"]},
+    {"question": "Place", "field_type": "text", "required": False,
+     "aliases": ["place"]},
+    {"question": "Signature", "field_type": "text", "required": False,
+     "aliases": ["signature"]},
+]
+
+_WORD = re.compile(r"[a-z]+")
+# Everything except a-z maps to a space (same length, so offsets are preserved)
+_NON_LETTERS = str.maketrans({
+    char: " "
+    for char in [chr(code) for code in range(128)] + list("\u00a0\u00b7\u2013\u2014\u2018\u2019\u201c\u201d\u2022\u2026")
+    if not "a" <= char <= "z"
+})
+_WORD_CACHE_SIZE = 20000
+
+logger = get_logger("label_matcher")
+
+
+def max_edits(word):
+    """Edit distance tolerated for an alias word: none for short words, 1 up to 7 letters, then 2"""
+    if len(word) <= 4:
+        return 0
+    return 1 if len(word) <= 7 else 2
+
+
+def _trigrams(word):
+    padded = f"${word}$"
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def _edit_distance(a, b, limit):
+    """Levenshtein distance of a and b, or limit + 1 once it is known to exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb)
+            ))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def load_labels(path=FORM_LABELS_PATH):
+    """Default label dictionary merged with the entries in FORM_LABELS_PATH"""
+    labels = {label["question"]: label for label in DEFAULT_FORM_LABELS}
+    if path:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for label in json.load(f):
+                    labels[label["question"]] = label
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning("Could not load form labels from %s: %s", path, e)
+    return list(labels.values())
+
+
+class LabelMatcher:
+    """
+    Finds form field labels in OCR text in one pass over its words
+
+    Every word of every alias goes into a trigram index. A word of the text is
+    looked up once (results are cached per distinct word), its candidates are
+    narrowed with the q-gram count filter and confirmed with a bounded edit
+    distance, so OCR misspellings such as "Gonder" or "Qualitication" match
+    without being listed.
+    """
+
+    def __init__(self, labels, max_gap=LABEL_MAX_GAP):
+        self.labels = labels
+        self.max_gap = max_gap
+        self._words = []                    # distinct alias words
+        self._trigram_index = defaultdict(list)
+        self._aliases_by_first = defaultdict(list)   # first word id -> [(word ids, label index)]
+        self._word_cache = {}
+
+        word_ids = {}
+        for label_index, label in enumerate(labels):
+            for alias in label["aliases"]:
+                ids = []
+                for word in _WORD.findall(alias.casefold()):
+                    if word not in word_ids:
+                        word_ids[word] = len(self._words)
+                        self._words.append(word)
+                        for gram in set(_trigrams(word)):
+                            self._trigram_index[gram].append(word_ids[word])
+                    ids.append(word_ids[word])
+                if ids:
+                    self._aliases_by_first[ids[0]].append((tuple(ids), label_index))
+        # Try longer aliases first so "Father's Name" wins over "Name"
+        for aliases in self._aliases_by_first.values():
+            aliases.sort(key=lambda alias: -len(alias[0]))
+
+    def _match_word(self, token):
+        """{alias word id: edit distance} for one word of the text"""
+        matches = self._word_cache.get(token)
+        if matches is not None:
+            return matches
+
+        counts = defaultdict(int)
+        for gram in set(_trigrams(token)):
+            for word_id in self._trigram_index.get(gram, ()):
+                counts[word_id] += 1
+        matches = {}
+        for word_id, shared in counts.items():
+            word = self._words[word_id]
+            limit = max_edits(word)
+            # q-gram lemma: each edit destroys at most 3 of the alias word's trigrams
+            if shared < len(word) - 3 * limit or abs(len(word) - len(token)) > limit:
+                continue
+            if limit == 0:
+                if token == word:
+                    matches[word_id] = 0
+            elif token[0] == word[0]:
+                # OCR rarely garbles the first letter; requiring it keeps "same" from matching "name"
+                distance = _edit_distance(token, word, limit)
+                if distance <= limit:
+                    matches[word_id] = distance
+
+        self._word_cache[token] = matches
+        return matches
+
+    def find(self, text):
+        """
+        All label occurrences in text, in reading order
+        Returns dicts with the label's question, field_type, required, the matched
+        text, its start/end offsets and the total edit distance
+        """
+        # Every non-letter becomes a space without changing offsets, so one
+        # str.split() tokenizes the text and offsets are only computed for hits
+        lowered = text.lower()
+        spaced = " " + lowered.translate(_NON_LETTERS) + " "
+        tokens = spaced.split()
+        if len(self._word_cache) >= _WORD_CACHE_SIZE:
+            self._word_cache.clear()
+        for token in set(tokens).difference(self._word_cache):
+            self._match_word(token)
+        token_matches = list(map(self._word_cache.get, tokens))
+        hits = list(compress(range(len(tokens)), token_matches))
+        if not hits:
+            return []
+
+        # Offsets of hit tokens; any earlier whole-word occurrence would also be a hit
+        offsets = {}
+        cursor = 0
+        for i in hits:
+            start = spaced.find(f" {tokens[i]} ", cursor) + 1
+            offsets[i] = start - 1
+            cursor = start + len(tokens[i])
+
+        source = text if len(lowered) == len(text) else lowered
+        found = []
+        covered = -1
+        for i in hits:
+            if i <= covered:
+                continue
+            best = None
+            for first_id, first_distance in token_matches[i].items():
+                for ids, label_index in self._aliases_by_first.get(first_id, ()):
+                    end, distance = self._match_rest(token_matches, i, ids, first_distance)
+                    if end is not None:
+                        if best is None or (len(ids), -distance) > (best[0], -best[2]):
+                            best = (len(ids), end, distance, label_index)
+                        break
+            if best is None:
+                continue
+            _, end, distance, label_index = best
+            label = self.labels[label_index]
+            start_offset, end_offset = offsets[i], offsets[end] + len(tokens[end])
+            found.append({
+                "question": label["question"],
+                "field_type": label["field_type"],
+                "required": label["required"],
+                "label": source[start_offset:end_offset],
+                "start": start_offset,
+                "end": end_offset,
+                "distance": distance,
+            })
+            covered = end
+        return found
+
+    def _match_rest(self, token_matches, i, ids, distance):
+        """Match the remaining alias words after token i; returns (last token index, distance)"""
+        position = i
+        for word_id in ids[1:]:
+            for step in range(1, self.max_gap + 2):
+                candidate = position + step
+                if candidate >= len(token_matches):
+                    return None, distance
+                if word_id in token_matches[candidate]:
+                    position = candidate
+                    distance += token_matches[candidate][word_id]
+                    break
+            else:
+                return None, distance
+        return position, distance
+
+
+label_matcher = LabelMatcher(load_labels())
@@ -1,57 +1,84 @@
-import os
-import google.generativeai as genai
-from openai import OpenAI
+import asyncio
 import json
-import re
+import logging
+import os
+from utils.llm_client import get_provider
+from utils.metrics import FALLBACK_QUESTIONS, LLM_PARSE_FAILURES, stage_timer
+from utils.structured_log import get_logger, log_payload
+from utils.label_matcher import label_matcher
+from utils import llm_cache
+from utils.validators import validate_locally
 
-# Configure Gemini
-ai_provider = os.getenv("AI_PROVIDER", "gemini").lower()
+# Bump when the question-detection prompt changes so cached answers are not reused
+QUESTION_PROMPT_VERSION = 1
 
-if ai_provider == "gemini":
-    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-    model = genai.GenerativeModel('gemini-pro')
-else:
-    openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Answers validated per LLM request by validate_answers
+LLM_VALIDATION_CHUNK_SIZE = int(os.getenv("LLM_VALIDATION_CHUNK_SIZE", "10"))
+
+logger = get_logger("llm_agent")
 
 
 def extract_questions_manually(text):
     """
     Manually extract field labels from form text
+    Labels come from the label dictionary (utils/label_matcher.py) and are
+    returned in the order they appear on the form, each field once
     """
     questions = []
-    field_id = 1
-    
-    # Common field patterns
-    field_mapping = [
-        (r'(?i)(nam[eo]|name)', "Name", "text", True),
-        (r'(?i)(mobile|phone|contact)', "Mobile Number", "phone", True),
-        (r'(?i)(email|emailid|e-mail)', "Email Address", "email", True),
-        (r'(?i)(father.*nam[eo]|fathor.*nam[eo])', "Father's Name", "text", True),
-        (r'(?i)(gender|gonder|sex)', "Gender", "text", True),
-        (r'(?i)(date.*birth|dob|date.*bich)', "Date of Birth", "date", True),
-        (r'(?i)(marital.*status|martial.*status)', "Marital Status", "text", False),
-        (r'(?i)(religion)', "Religion", "text", False),
-        (r'(?i)(language.*known)', "Languages Known", "text", False),
-        (r'(?i)(qualification|qualitication|education)', "Qualification", "text", False),
-        (r'(?i)(experience)', "Experience", "text", False),
-        (r'(?i)(address|addeoss)', "Address", "text", True),
-        (r'(?i)(place)', "Place", "text", False),
-        (r'(?i)(signature)', "Signature", "text", False),
-    ]
+    seen = set()
     
-    for pattern, question, field_type, required in field_mapping:
-        if re.search(pattern, text):
+    with stage_timer("manual_extraction"):
+        for match in label_matcher.find(text):
+            if match["question"] in seen:
+                continue
+            seen.add(match["question"])
             questions.append({
-                "id": field_id,
-                "question": question,
-                "field_type": field_type,
-                "required": required
+                "id": len(questions) + 1,
+                "question": match["question"],
+                "field_type": match["field_type"],
+                "required": match["required"]
             })
-            field_id += 1
     
     return questions
 
 
+def clean_json_array(result):
+    """
+    Pull the JSON array out of an LLM response
+    (drops markdown code fences, language tags and surrounding explanations)
+    """
+    # Look for JSON array
+    if "```" in result:
+        # Extract content between code blocks
+        parts = result.split("```")
+        for part in parts:
+            part = part.strip()
+            # Remove language identifier
+            if part.startswith("json"):
+                part = part[4:].strip()
+            # Check if this part contains a JSON array
+            if "[" in part and "]" in part:
+                start = part.find("[")
+                end = part.rfind("]") + 1
+                return part[start:end]
+    else:
+        # No code blocks, try to find JSON array directly
+        if "[" in result and "]" in result:
+            start = result.find("[")
+            end = result.rfind("]") + 1
+            return result[start:end]
+    return result
+
+
+def _loads_response(text, call):
+    """json.loads for an LLM response; failures are counted per call in the metrics"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        LLM_PARSE_FAILURES.inc(call=call)
+        raise
+
+
 def get_fallback_questions():
     """
     Return fallback questions if all else fails
@@ -65,26 +92,41 @@ def get_fallback_questions():
     ]
 
 
-def detect_form_questions(extracted_text):
+async def detect_form_questions(extracted_text):
     """
     Use AI to detect all questions in the form from OCR extracted text
     Returns a list of questions that need to be answered
     """
+    questions, _ = await detect_form_questions_with_source(extracted_text)
+    return questions
+
+
+async def detect_form_questions_with_source(extracted_text):
+    """
+    detect_form_questions, also saying where the questions came from:
+    "llm" (a fresh answer), "cache" (an earlier answer for the same text),
+    "manual" (label parsing found enough fields) or "fallback"
+    Returns (questions, source)
+    """
     
     # Check if extracted text is valid
     if not extracted_text or extracted_text.startswith("ERROR:"):
-        print(f"⚠️ OCR Error: {extracted_text}")
+        logger.warning("No usable OCR text, using fallback questions", extra={"ocr_error": (extracted_text or "")[:200]})
         # Return fallback with error message
-        return get_fallback_questions()
+        FALLBACK_QUESTIONS.inc()
+        return get_fallback_questions(), "fallback"
+    
+    # Multi-page uploads separate pages with form feeds
+    extracted_text = extracted_text.replace("\f", "\n\n")
     
-    print(f"📄 Extracted text length: {len(extracted_text)} characters")
-    print(f"📄 Full extracted text: {extracted_text}")
+    logger.debug("Detecting questions", extra={"chars": len(extracted_text)})
+    log_payload(logger, "Extracted text", extracted_text)
     
     # Try manual extraction first as backup
     manual_questions = extract_questions_manually(extracted_text)
     if len(manual_questions) > 5:
-        print(f"✅ Manual extraction found {len(manual_questions)} questions!")
-        return manual_questions
+        logger.info("Manual extraction found %d questions", len(manual_questions))
+        return manual_questions, "manual"
     
     prompt = f"""
 Extract ALL field labels from this form and convert each to a question.
@@ -122,102 +164,83 @@ Return ONLY JSON array (no explanations):
 Create a question for EVERY field label you find in the form text above.
 """
     
+    llm = get_provider()
+    cache_key = llm_cache.make_key(
+        extracted_text, llm.name, getattr(llm, "default_model", ""), QUESTION_PROMPT_VERSION
+    )
+    cached_questions = await llm_cache.question_cache.aget(cache_key)
+    if cached_questions is not None:
+        logger.info("Using cached questions for this form (%d questions)", len(cached_questions))
+        return cached_questions, "cache"
+    
     try:
-        if ai_provider == "gemini":
-            print("🤖 Using Gemini AI to detect questions...")
-            response = model.generate_content(prompt)
-            result = response.text.strip()
-            print(f"🤖 Gemini raw response length: {len(result)} chars")
-            print(f"🤖 Raw response: {result}")
-            
-            # Clean up the result - remove markdown, code blocks, explanations
-            # Look for JSON array
-            if "```" in result:
-                # Extract content between code blocks
-                parts = result.split("```")
-                for part in parts:
-                    part = part.strip()
-                    # Remove language identifier
-                    if part.startswith("json"):
-                        part = part[4:].strip()
-                    # Check if this part contains a JSON array
-                    if "[" in part and "]" in part:
-                        start = part.find("[")
-                        end = part.rfind("]") + 1
-                        result = part[start:end]
-                        break
-            else:
-                # No code blocks, try to find JSON array directly
-                if "[" in result and "]" in result:
-                    start = result.find("[")
-                    end = result.rfind("]") + 1
-                    result = result[start:end]
-            
-            print(f"🤖 Cleaned JSON: {result[:500]}")
-            
+        logger.debug("Using %s to detect questions", llm.name)
+        result = await llm.complete(
+            prompt,
+            system="You are a form analysis expert. Extract questions from forms and return valid JSON.",
+            temperature=0.3
+        )
+        logger.debug("LLM response received", extra={"chars": len(result)})
+        log_payload(logger, "Raw LLM response", result)
+        
+        with stage_timer("json_cleanup"):
+            result = clean_json_array(result)
             # Try to parse JSON
-            questions = json.loads(result)
-            
-            # Validate it's a list
-            if not isinstance(questions, list):
-                print("❌ Response is not a list, using fallback")
-                raise ValueError("Response is not a list")
-            
-            # Validate each question has required fields
-            valid_questions = []
-            for i, q in enumerate(questions, 1):
-                if isinstance(q, dict) and "question" in q:
-                    # Ensure all required fields exist
-                    valid_q = {
-                        "id": i,
-                        "question": q.get("question", ""),
-                        "field_type": q.get("field_type", "text"),
-                        "required": q.get("required", False)
-                    }
-                    valid_questions.append(valid_q)
-            
-            if len(valid_questions) > 0:
-                print(f"✅ Successfully detected {len(valid_questions)} questions from form!")
-                for i, q in enumerate(valid_questions[:5], 1):
-                    print(f"   {i}. {q['question']} ({q['field_type']})")
-                return valid_questions
-            else:
-                print("❌ No valid questions found, using fallback")
-                raise ValueError("No valid questions")
-                
-        else:
-            response = openai_client.chat.completions.create(
-                model="gpt-4-turbo-preview",
-                messages=[
-                    {"role": "system", "content": "You are a form analysis expert. Extract questions from forms and return valid JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3
+            questions = _loads_response(result, "detect_form_questions")
+        
+        # Validate it's a list
+        if not isinstance(questions, list):
+            LLM_PARSE_FAILURES.inc(call="detect_form_questions")
+            raise ValueError("Response is not a list")
+        
+        # Validate each question has required fields
+        valid_questions = []
+        for i, q in enumerate(questions, 1):
+            if isinstance(q, dict) and "question" in q:
+                # Ensure all required fields exist
+                valid_q = {
+                    "id": i,
+                    "question": q.get("question", ""),
+                    "field_type": q.get("field_type", "text"),
+                    "required": q.get("required", False)
+                }
+                valid_questions.append(valid_q)
+        
+        if len(valid_questions) > 0:
+            logger.info(
+                "Detected %d questions from form", len(valid_questions),
+                extra={"first_questions": [q["question"] for q in valid_questions[:5]]}
             )
-            questions = json.loads(response.choices[0].message.content)
-            return questions
+            await llm_cache.question_cache.aset(cache_key, valid_questions)
+            return valid_questions, "llm"
+        else:
+            raise ValueError("No valid questions")
             
     except Exception as e:
-        print(f"❌ Error detecting questions: {e}")
-        print(f"❌ Error type: {type(e).__name__}")
-        import traceback
-        traceback.print_exc()
         # Fallback questions if AI fails
-        print("⚠️ Using fallback questions")
+        logger.warning("Question detection failed, using fallback questions: %s: %s", type(e).__name__, e,
+                       exc_info=logger.isEnabledFor(logging.DEBUG))
+        FALLBACK_QUESTIONS.inc()
         return [
             {"id": 1, "question": "What is your full name?", "field_type": "text", "required": True},
             {"id": 2, "question": "Date of Birth (DD/MM/YYYY)", "field_type": "date", "required": True},
             {"id": 3, "question": "Complete Address", "field_type": "text", "required": True},
             {"id": 4, "question": "Phone Number", "field_type": "phone", "required": True},
             {"id": 5, "question": "Email Address", "field_type": "email", "required": False},
-        ]
+        ], "fallback"
 
 
-def validate_answer(question, answer):
+async def validate_answer(question, answer, field_type=None, required=True):
     """
     Use AI to validate if the answer is appropriate for the question
+    Answers whose format decides the result (phone, email, date, PIN, Aadhaar, PAN)
+    are checked locally without an LLM call.
     Returns (is_valid, suggestion)
     """
+    local_result = validate_locally(question, answer, field_type, required)
+    if local_result is not None:
+        return local_result
+    
     prompt = f"""
     Question: {question}
     User's Answer: {answer}
@@ -230,42 +253,128 @@ def validate_answer(question, answer):
     """
     
     try:
-        if ai_provider == "gemini":
-            response = model.generate_content(prompt)
-            result = response.text.strip()
+        result = await get_provider().complete(
+            prompt,
+            system="You validate form answers. Return valid JSON.",
+            temperature=0.3
+        )
+        with stage_timer("json_cleanup"):
             if result.startswith("```"):
                 result = result.split("```")[1]
                 if result.startswith("json"):
                     result = result[4:]
-            
-            validation = json.loads(result)
-            return validation.get("valid", True), validation.get("suggestion", "")
-        else:
-            response = openai_client.chat.completions.create(
-                model="gpt-4-turbo-preview",
-                messages=[
-                    {"role": "system", "content": "You validate form answers. Return valid JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3
-            )
-            validation = json.loads(response.choices[0].message.content)
-            return validation.get("valid", True), validation.get("suggestion", "")
+            validation = _loads_response(result, "validate_answer")
+        return validation.get("valid", True), validation.get("suggestion", "")
             
     except Exception as e:
-        print(f"Error validating answer: {e}")
+        logger.warning("Answer validation failed: %s", e)
         return True, ""  # Default to valid if AI fails
 
 
-def get_next_question(user_response, field):
+async def validate_answers(items):
+    """
+    Validate a whole form with as few LLM round trips as possible
+    items: list of {"id", "question", "answer", "field_type" and "required" (optional)} dicts
+    Answers the local validators can decide never reach the LLM.
+    Large forms are split into chunks of LLM_VALIDATION_CHUNK_SIZE that run concurrently.
+    Returns one result per item, in order: {"id", "is_valid", "suggestion", "validated"};
+    items in a chunk that failed keep the single-answer default (valid) with validated False.
+    """
+    results = [None] * len(items)
+    pending = []
+    for index, item in enumerate(items):
+        local_result = validate_locally(
+            item["question"], item["answer"], item.get("field_type"), item.get("required") is not False
+        )
+        if local_result is None:
+            pending.append((index, item))
+        else:
+            results[index] = {
+                "id": item.get("id"),
+                "is_valid": local_result[0],
+                "suggestion": local_result[1],
+                "validated": True
+            }
+    
+    chunks = [
+        pending[i:i + LLM_VALIDATION_CHUNK_SIZE]
+        for i in range(0, len(pending), LLM_VALIDATION_CHUNK_SIZE)
+    ]
+    outcomes = await asyncio.gather(
+        *(_validate_chunk([item for _, item in chunk]) for chunk in chunks),
+        return_exceptions=True
+    )
+    
+    for chunk, outcome in zip(chunks, outcomes):
+        if isinstance(outcome, Exception):
+            logger.warning("Answer validation failed for %d answers: %s", len(chunk), outcome)
+            outcome = [
+                {
+                    "id": item.get("id"),
+                    "is_valid": True,
+                    "suggestion": "",
+                    "validated": False,
+                    "error": str(outcome)
+                }
+                for _, item in chunk
+            ]
+        for (index, _), result in zip(chunk, outcome):
+            results[index] = result
+    return results
+
+
+async def _validate_chunk(chunk):
+    """One structured LLM request for a chunk of question/answer pairs"""
+    lines = []
+    for number, item in enumerate(chunk, 1):
+        lines.append(f"{number}. Question: {item['question']}\n   User's Answer: {item['answer']}")
+    pairs = "\n".join(lines)
+    prompt = f"""
+    Validate each answer below for its form question.
+    
+    {pairs}
+    
+    For each numbered item decide if the answer is appropriate and complete for the question.
+    Return a JSON array with exactly {len(chunk)} objects, in the same order:
+    [{{"item": 1, "valid": true, "suggestion": ""}}, {{"item": 2, "valid": false, "suggestion": "helpful suggestion to improve the answer"}}]
+    
+    Return valid JSON only.
+    """
+    
+    result = await get_provider().complete(
+        prompt,
+        system="You validate form answers. Return valid JSON.",
+        temperature=0.3
+    )
+    with stage_timer("json_cleanup"):
+        validations = _loads_response(clean_json_array(result), "validate_answers")
+    if not isinstance(validations, list):
+        LLM_PARSE_FAILURES.inc(call="validate_answers")
+        raise ValueError("Response is not a list")
+    
+    by_item = {}
+    for position, validation in enumerate(validations, 1):
+        if isinstance(validation, dict):
+            by_item[validation.get("item", position)] = validation
+    
+    results = []
+    for number, item in enumerate(chunk, 1):
+        validation = by_item.get(number)
+        results.append({
+            "id": item.get("id"),
+            "is_valid": validation.get("valid", True) if validation else True,
+            "suggestion": validation.get("suggestion", "") if validation else "",
+            "validated": validation is not None
+        })
+    return results
+
+
+async def get_next_question(user_response, field):
     """
     Generate next question using AI (Gemini or OpenAI)
     """
     try:
-        if ai_provider == "gemini":
-            # Use Google Gemini (Free API)
-            
-            prompt = f"""You are a friendly AI form assistant helping users fill government forms.
+        prompt = f"""You are a friendly AI form assistant helping users fill government forms.
             
 Current field: {field}
 User's response: {user_response}
@@ -274,27 +383,8 @@ Based on their response, ask the next logical question to continue form filling.
 Be conversational, friendly, and encouraging. Keep questions simple and clear.
 
 Next question:"""
-            
-            response = model.generate_content(prompt)
-            return response.text.strip()
-            
-        else:
-            # Use OpenAI GPT-4
-            
-            context = f"""
-            You are a friendly AI form assistant.
-            Current field: {field}
-            User said: {user_response}.
-            Ask the next logical question to continue form filling.
-            """
-            resp = openai_client.chat.completions.create(
-                model="gpt-4-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant."},
-                    {"role": "user", "content": context}
-                ]
-            )
-            return resp.choices[0].message.content.strip()
+        
+        return await get_provider().complete(prompt, system="You are a helpful assistant.")
             
     except Exception as e:
         error_msg = str(e)
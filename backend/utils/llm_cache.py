@@ -0,0 +1,228 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from utils.structured_log import get_logger
+
+# LLM response cache configuration
+# LLM_CACHE_BACKEND: "memory", "sqlite" or "none"
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory").lower()
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+_UNDERSCORES = re.compile(r"_{2,}")
+_DIGITS = re.compile(r"\d")
+_WHITESPACE = re.compile(r"\s+")
+
+logger = get_logger("llm_cache")
+
+
+def normalize_form_text(text):
+    """
+    Reduce OCR text to what identifies the form: case-folded, digits masked,
+    runs of underscores and whitespace collapsed
+    Two scans of the same blank form usually normalize to the same string.
+    """
+    text = text.casefold()
+    text = _DIGITS.sub("#", text)
+    text = _UNDERSCORES.sub("_", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def make_key(text, provider, model, prompt_version):
+    """Cache key for one LLM request on normalized form text"""
+    material = f"{provider}\0{model}\0{prompt_version}\0{normalize_form_text(text)}"
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class MemoryCacheBackend:
+    """In-process LRU with per-entry TTL"""
+
+    def __init__(self, max_entries=LLM_CACHE_MAX_ENTRIES, ttl=LLM_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCacheBackend:
+    """
+    File-backed cache shared by every worker on the host; survives restarts
+    Hits are not written back one by one: access times are batched and the
+    table is trimmed every TRIM_EVERY writes, so it can briefly hold up to
+    TRIM_EVERY rows more than max_entries.
+    """
+
+    blocking = True
+    TOUCH_BATCH = 64    # hits whose access time is written back together
+    TRIM_EVERY = 64     # writes between expiry / LRU trims
+
+    def __init__(self, path=LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES, ttl=LLM_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._touched = {}
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM llm_cache WHERE key = ? AND expires_at >= ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= self.TOUCH_BATCH:
+                self._flush_touched()
+                self._conn.commit()
+            return row[0]
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._touched.pop(key, None)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl, now)
+            )
+            self._writes += 1
+            if self._writes >= self.TRIM_EVERY:
+                self._writes = 0
+                self._trim(now)
+            self._conn.commit()
+
+    def _flush_touched(self):
+        self._conn.executemany(
+            "UPDATE llm_cache SET accessed_at = ? WHERE key = ?",
+            [(accessed_at, key) for key, accessed_at in self._touched.items()]
+        )
+        self._touched.clear()
+
+    def _trim(self, now):
+        """Drop expired rows, then the least recently used beyond max_entries"""
+        self._flush_touched()
+        self._conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (now,))
+        excess = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                " SELECT key FROM llm_cache ORDER BY accessed_at LIMIT ?)",
+                (excess,)
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._touched.clear()
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+
+class ResponseCache:
+    """JSON value cache over a pluggable backend, with hit/miss counters"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if self.backend is None:
+            return None
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            logger.warning("LLM cache read failed: %s", e)
+            value = None
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(value)
+
+    def set(self, key, value):
+        if self.backend is None:
+            return
+        try:
+            self.backend.set(key, json.dumps(value))
+        except Exception as e:
+            logger.warning("LLM cache write failed: %s", e)
+
+    async def aget(self, key):
+        """get() for async callers; blocking (file-backed) backends run in a worker thread"""
+        if getattr(self.backend, "blocking", False):
+            return await asyncio.to_thread(self.get, key)
+        return self.get(key)
+
+    async def aset(self, key, value):
+        """set() for async callers; blocking (file-backed) backends run in a worker thread"""
+        if getattr(self.backend, "blocking", False):
+            return await asyncio.to_thread(self.set, key, value)
+        return self.set(key, value)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": len(self.backend) if self.backend is not None else 0,
+        }
+
+
+def create_backend(kind=LLM_CACHE_BACKEND):
+    if kind == "sqlite":
+        return SQLiteCacheBackend()
+    if kind == "memory":
+        return MemoryCacheBackend()
+    return None
+
+
+question_cache = ResponseCache(create_backend())
@@ -0,0 +1,200 @@
+import asyncio
+import os
+import random
+
+import httpx
+
+from utils.metrics import POOL_IN_FLIGHT, stage_timer
+from utils.structured_log import get_logger
+
+# LLM client configuration
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))            # deadline for one call, retries included
+LLM_ATTEMPT_TIMEOUT = float(os.getenv("LLM_ATTEMPT_TIMEOUT", "15"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))  # in-flight calls per provider
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+logger = get_logger("llm_client")
+
+
+class LLMError(Exception):
+    """Raised when an LLM call fails for good (non-retryable error, retries or deadline exhausted)"""
+
+
+class LLMProvider:
+    """
+    Base class for async LLM providers
+
+    Subclasses implement _generate(); complete() adds the concurrency limit,
+    per-call deadline and jittered exponential backoff.
+    """
+
+    name = "base"
+
+    def __init__(self, max_concurrency=LLM_MAX_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+
+    async def _generate(self, prompt, system, temperature, model, timeout):
+        raise NotImplementedError
+
+    def is_retryable(self, error):
+        """Rate limits, timeouts, connection drops and 5xx responses are worth retrying"""
+        if isinstance(error, (asyncio.TimeoutError, httpx.TransportError)):
+            return True
+        status = getattr(error, "status_code", None) or getattr(error, "code", None)
+        return isinstance(status, int) and status in RETRYABLE_STATUS_CODES
+
+    async def complete(self, prompt, system=None, temperature=None, model=None, timeout=LLM_TIMEOUT):
+        """
+        Send one prompt and return the response text
+        Raises LLMError once the error is not retryable or the deadline/retries run out
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        attempt = 0
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise LLMError(f"{self.name}: deadline of {timeout:.0f}s exceeded")
+            attempt_timeout = min(LLM_ATTEMPT_TIMEOUT, remaining)
+            try:
+                with POOL_IN_FLIGHT.track(pool="llm"):
+                    async with self._semaphore:
+                        with stage_timer("llm_call"):
+                            return await asyncio.wait_for(
+                                self._generate(prompt, system, temperature, model, attempt_timeout),
+                                timeout=attempt_timeout
+                            )
+            except Exception as e:
+                if attempt >= LLM_MAX_RETRIES or not self.is_retryable(e):
+                    raise LLMError(f"{self.name}: {type(e).__name__}: {e}") from e
+                # Full jitter: spread retries so a burst of 429s does not come back in lockstep
+                delay = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)))
+                if loop.time() + delay >= deadline:
+                    raise LLMError(f"{self.name}: deadline of {timeout:.0f}s exceeded") from e
+                logger.warning(
+                    "%s call failed (%s), retrying in %.2fs", self.name, type(e).__name__, delay,
+                    extra={"provider": self.name, "attempt": attempt + 1}
+                )
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    async def close(self):
+        pass
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini through the SDK's async (gRPC) client, which keeps one channel open"""
+
+    name = "gemini"
+
+    def __init__(self, api_key, model="gemini-pro", **kwargs):
+        super().__init__(**kwargs)
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self._genai = genai
+        self.default_model = model
+        self._models = {}
+
+    def _model(self, name):
+        if name not in self._models:
+            self._models[name] = self._genai.GenerativeModel(name)
+        return self._models[name]
+
+    async def _generate(self, prompt, system, temperature, model, timeout):
+        # The Gemini API used here has no system role; callers put instructions in the prompt
+        generation_config = {"temperature": temperature} if temperature is not None else None
+        # This SDK version takes no per-request timeout; complete() enforces it with wait_for
+        response = await self._model(model or self.default_model).generate_content_async(
+            prompt,
+            generation_config=generation_config
+        )
+        return response.text.strip()
+
+    def is_retryable(self, error):
+        from google.api_core import exceptions as google_exceptions
+        if isinstance(error, (
+            google_exceptions.ResourceExhausted,
+            google_exceptions.ServiceUnavailable,
+            google_exceptions.DeadlineExceeded,
+            google_exceptions.InternalServerError,
+        )):
+            return True
+        return super().is_retryable(error)
+
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI chat completions over one pooled httpx connection pool"""
+
+    name = "openai"
+
+    def __init__(self, api_key, model="gpt-4-turbo-preview", **kwargs):
+        super().__init__(**kwargs)
+        from openai import AsyncOpenAI
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency
+            ),
+            timeout=httpx.Timeout(LLM_ATTEMPT_TIMEOUT, connect=5.0)
+        )
+        # Retries are handled by complete() so they share its deadline and backoff
+        self._client = AsyncOpenAI(api_key=api_key, http_client=self._http, max_retries=0)
+        self.default_model = model
+
+    async def _generate(self, prompt, system, temperature, model, timeout):
+        messages = []
+        if system:
+            messages.append({"role": "system", "content": system})
+        messages.append({"role": "user", "content": prompt})
+        kwargs = {"temperature": temperature} if temperature is not None else {}
+        response = await self._client.chat.completions.create(
+            model=model or self.default_model,
+            messages=messages,
+            timeout=timeout,
+            **kwargs
+        )
+        return response.choices[0].message.content.strip()
+
+    def is_retryable(self, error):
+        import openai
+        if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)):
+            return True
+        return super().is_retryable(error)
+
+    async def close(self):
+        await self._http.aclose()
+
+
+_provider = None
+
+
+def get_provider():
+    """Shared provider for AI_PROVIDER, created on first use"""
+    global _provider
+    if _provider is None:
+        if os.getenv("AI_PROVIDER", "gemini").lower() == "gemini":
+            _provider = GeminiProvider(api_key=os.getenv("GEMINI_API_KEY"))
+        else:
+            _provider = OpenAIProvider(api_key=os.getenv("OPENAI_API_KEY"))
+    return _provider
+
+
+def set_provider(provider):
+    """Replace the shared provider (e.g. with a stub in tests and benchmarks)"""
+    global _provider
+    _provider = provider
+
+
+async def close_provider():
+    global _provider
+    if _provider is not None:
+        await _provider.close()
+        _provider = None
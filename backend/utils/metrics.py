@@ -0,0 +1,236 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.structured_log import get_logger
+
+# Metrics configuration
+# Each uvicorn worker keeps its own metrics; scrape every worker (or run one per port)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Seconds; covers a cached lookup (ms) up to a slow OCR or LLM call (tens of seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_metrics = []
+_collectors = []
+
+logger = get_logger("metrics")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+
+class Counter:
+    """Monotonic count per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, self.labels, key, value) for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    """Current value per label set (e.g. jobs in flight in a pool)"""
+
+    kind = "gauge"
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            snapshot = [(key, list(entry[0]), entry[1], entry[2]) for key, entry in self._values.items()]
+        samples = []
+        for key, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket", self.labels + ("le",), key + (_format_value(bound),), cumulative))
+            samples.append((f"{self.name}_sum", self.labels, key, total))
+            samples.append((f"{self.name}_count", self.labels, key, count))
+        return samples
+
+
+def register_collector(func):
+    """
+    Add values read at scrape time: func() returns [(name, kind, help, labels, [(label values, value)])]
+    Used for counters that already exist elsewhere (cache hit/miss statistics)
+    """
+    _collectors.append(func)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, label_names, label_values, value in metric.samples():
+            lines.append(f"{name}{_format_labels(label_names, label_values)} {_format_value(value)}")
+    for collector in _collectors:
+        try:
+            families = collector()
+        except Exception as e:
+            logger.warning("Metrics collector failed: %s", e)
+            continue
+        for name, kind, help, label_names, values in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for label_values, value in values:
+                lines.append(f"{name}{_format_labels(label_names, label_values)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+REQUEST_SECONDS = Histogram("bharatvoice_request_duration_seconds", "HTTP request latency by route", ["route", "method"])
+REQUESTS = Counter("bharatvoice_requests_total", "HTTP requests by route and status", ["route", "method", "status"])
+STAGE_SECONDS = Histogram(
+    "bharatvoice_stage_duration_seconds",
+    "Time spent in each pipeline stage (image_decode, preprocess, ocr, ocr_queue, manual_extraction, "
+    "llm_call, json_cleanup, pdf_render, audio_preprocess, stt)",
+    ["stage"]
+)
+FALLBACK_QUESTIONS = Counter("bharatvoice_fallback_questions_total", "Forms answered with the generic fallback questions")
+LLM_PARSE_FAILURES = Counter("bharatvoice_llm_parse_failures_total", "LLM responses that were not the expected JSON", ["call"])
+AUDIO_UNDECODED = Counter(
+    "bharatvoice_audio_undecoded_total", "Recordings sent to speech-to-text without preprocessing", ["reason"]
+)
+POOL_IN_FLIGHT = Gauge("bharatvoice_pool_in_flight", "Jobs running or queued in each worker pool", ["pool"])
+
+
+# Stage timings from jobs that run in another process are buffered there and
+# shipped back with the job's result (see run_job)
+_buffer = None
+
+
+def observe_stage(stage, seconds):
+    if not METRICS_ENABLED:
+        return
+    if _buffer is not None:
+        _buffer.append((stage, seconds))
+    else:
+        STAGE_SECONDS.observe(seconds, stage=stage)
+
+
+@contextmanager
+def stage_timer(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def run_job(func, args, submitted, collect):
+    """
+    Executor-side wrapper: returns (result, stage timings, seconds spent queued)
+    With collect set (process pools) stage timings are buffered for the parent
+    process, which passes them to record_stages(); a worker process runs one job at a time.
+    """
+    global _buffer
+    waited = time.time() - submitted
+    if not collect:
+        return func(*args), [], waited
+    _buffer = []
+    try:
+        return func(*args), _buffer, waited
+    finally:
+        _buffer = None
+
+
+def record_stages(timings):
+    for stage, seconds in timings:
+        observe_stage(stage, seconds)
+
+
+class MetricsMiddleware:
+    """Request latency and status per route template (so /get-profile/{email} is one series)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            return await self.app(scope, receive, send)
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = _route_template(scope)
+            REQUEST_SECONDS.observe(time.perf_counter() - start, route=route, method=scope["method"])
+            REQUESTS.inc(route=route, method=scope["method"], status=status)
+
+
+def _route_template(scope):
+    from starlette.routing import Match
+    app = scope.get("app")
+    for route in getattr(app, "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
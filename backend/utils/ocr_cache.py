@@ -0,0 +1,228 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from utils.ocr_extractor import OCR_LANG, OCR_PSM, PREPROCESS_SIGNATURE
+from utils.structured_log import get_logger
+
+# Cache configuration
+OCR_CACHE_MAX_BYTES = int(os.getenv("OCR_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+# Optional on-disk tier; shared by every worker on the host and kept across restarts
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", "")
+# Size limit of that directory (OCR text and form layouts); the oldest entries are deleted beyond it, 0 = no limit
+OCR_CACHE_DISK_MAX_BYTES = int(os.getenv("OCR_CACHE_DISK_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+# Temp files this old were left by a crashed writer
+_STALE_TMP_SECONDS = 3600
+
+logger = get_logger("ocr_cache")
+
+
+def atomic_write(path, data):
+    """
+    Write bytes or text to path via a temp file and rename, so other workers
+    never see a partial file; raises OSError
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def trim_cache_dir(cache_dir, max_bytes):
+    """
+    Delete the oldest entries of a cache directory until it is under 90% of
+    max_bytes; returns the bytes freed
+    Files of one entry (e.g. a form and its layout) share a key and go
+    together; stale temp files are removed on the way.
+    """
+    now = time.time()
+    entries = {}
+    total = 0
+    for bucket in os.scandir(cache_dir):
+        if not bucket.is_dir():
+            continue
+        for item in os.scandir(bucket.path):
+            try:
+                stat = item.stat()
+            except OSError:
+                continue
+            if item.name.endswith(".tmp"):
+                if now - stat.st_mtime > _STALE_TMP_SECONDS:
+                    _unlink(item.path)
+                continue
+            key = item.name.split(".", 1)[0]
+            mtime, size, paths = entries.get(key, (0, 0, []))
+            entries[key] = (max(mtime, stat.st_mtime), size + stat.st_size, paths + [item.path])
+            total += stat.st_size
+
+    freed = 0
+    for _, size, paths in sorted(entries.values()):
+        if total - freed <= max_bytes * 0.9:
+            break
+        for path in paths:
+            _unlink(path)
+        freed += size
+    return freed
+
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+class DiskBudget:
+    """
+    Keeps a cache directory near max_bytes: writes are tallied, and every
+    time a twentieth of the budget has been written the directory is trimmed
+    """
+
+    def __init__(self, cache_dir, max_bytes=OCR_CACHE_DISK_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._written = 0
+        self._lock = threading.Lock()
+
+    def note_write(self, size):
+        """Count a write of size bytes (call it from a thread: it may scan the directory)"""
+        if not self.cache_dir or self.max_bytes <= 0:
+            return
+        with self._lock:
+            self._written += size
+            if self._written < self.max_bytes // 20:
+                return
+            self._written = 0
+        try:
+            freed = trim_cache_dir(self.cache_dir, self.max_bytes)
+        except OSError as e:
+            logger.warning("Could not trim cache directory: %s", e)
+            return
+        if freed:
+            logger.info("Trimmed cache directory", extra={"cache_dir": self.cache_dir, "freed_bytes": freed})
+
+
+def make_key(file_bytes):
+    """
+    Build the cache key for an upload: hash of the bytes plus every OCR setting
+    that can change the extracted text
+    """
+    digest = hashlib.sha256(file_bytes).hexdigest()
+    settings = f"{OCR_LANG}|{OCR_PSM}|{PREPROCESS_SIGNATURE}"
+    return f"{digest}-{hashlib.sha1(settings.encode('utf-8')).hexdigest()[:12]}"
+
+
+class OCRCache:
+    """
+    Two-tier OCR text cache: in-memory LRU bounded by bytes, then optional disk
+    """
+
+    def __init__(self, max_bytes=OCR_CACHE_MAX_BYTES, cache_dir=OCR_CACHE_DIR):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._budget = DiskBudget(cache_dir)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, key):
+        """Return cached text for key, or None (may read the disk tier: call it from a thread)"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return self._entries[key][0]
+
+        text = self._read_disk(key)
+        with self._lock:
+            if text is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self._store_memory(key, text)
+        return text
+
+    def put(self, key, text):
+        """Store text in both tiers (writes the disk tier: call it from a thread)"""
+        self._store_memory(key, text)
+        self._write_disk(key, text)
+
+    def stats(self):
+        """Hit/miss counters and current memory usage"""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+                "memory_bytes": self._size,
+                "max_memory_bytes": self.max_bytes,
+                "disk_enabled": bool(self.cache_dir),
+            }
+
+    def clear(self):
+        """Drop the in-memory tier (disk entries are left alone)"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _store_memory(self, key, text):
+        size = len(text.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[1]
+            self._entries[key] = (text, size)
+            self._size += size
+            # Evict least recently used entries until we fit again
+            while self._size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.txt")
+
+    def _read_disk(self, key):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, key, text):
+        if not self.cache_dir:
+            return
+        data = text.encode("utf-8")
+        try:
+            atomic_write(self._disk_path(key), data)
+        except OSError as e:
+            logger.warning("Could not write OCR cache entry: %s", e)
+            return
+        self._budget.note_write(len(data))
+
+
+ocr_cache = OCRCache()
@@ -0,0 +1,157 @@
+import asyncio
+import mmap
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.metrics import POOL_IN_FLIGHT, observe_stage, record_stages, run_job
+from utils.structured_log import with_request_id
+
+# OCR executor configuration
+# OCR_EXECUTOR: "process" runs each job in its own worker process, "thread" runs
+# it in a thread that waits on the Tesseract subprocess (both leave the event loop free)
+OCR_EXECUTOR = os.getenv("OCR_EXECUTOR", "process").lower()
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+OCR_MAX_QUEUE = int(os.getenv("OCR_MAX_QUEUE", str(OCR_WORKERS * 2)))
+OCR_JOB_TIMEOUT = float(os.getenv("OCR_JOB_TIMEOUT", "60"))              # per job, so per page of a document
+# Pages of one document OCR'd at the same time, each as its own OCR job
+OCR_PAGE_WORKERS = int(os.getenv("OCR_PAGE_WORKERS", str(OCR_WORKERS)))
+# Tesseract uses OpenMP internally; with one job per core we want one thread per job
+TESSERACT_THREADS = os.getenv("TESSERACT_THREADS", "1")
+
+_executor = None
+_executor_lock = threading.Lock()
+# Running + waiting jobs; anything beyond this is rejected instead of queued
+_slots = threading.BoundedSemaphore(OCR_WORKERS + OCR_MAX_QUEUE)
+
+
+class OCRBusyError(Exception):
+    """Raised when every OCR worker is busy and the wait queue is full"""
+
+
+class OCRTimeoutError(Exception):
+    """Raised when an OCR job does not finish within OCR_JOB_TIMEOUT"""
+
+
+def _init_worker(thread_limit):
+    """Cap Tesseract's OpenMP threads inside each worker process"""
+    os.environ["OMP_THREAD_LIMIT"] = thread_limit
+
+
+def get_executor():
+    """
+    Create the shared OCR executor on first use
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                if OCR_EXECUTOR == "thread":
+                    # Threads only wait on the tesseract subprocess, which inherits this env
+                    os.environ.setdefault("OMP_THREAD_LIMIT", TESSERACT_THREADS)
+                    _executor = ThreadPoolExecutor(
+                        max_workers=OCR_WORKERS,
+                        thread_name_prefix="ocr"
+                    )
+                else:
+                    _executor = ProcessPoolExecutor(
+                        max_workers=OCR_WORKERS,
+                        initializer=_init_worker,
+                        initargs=(TESSERACT_THREADS,)
+                    )
+    return _executor
+
+
+async def run_ocr(func, *args):
+    """
+    Run a blocking OCR function (extract_text, extract_id_data, ...) on the OCR executor
+
+    Raises OCRBusyError when the pool and its queue are full and
+    OCRTimeoutError when the job takes longer than OCR_JOB_TIMEOUT seconds.
+    """
+    if not _slots.acquire(blocking=False):
+        raise OCRBusyError(
+            f"OCR queue is full ({OCR_WORKERS} running, {OCR_MAX_QUEUE} waiting)"
+        )
+
+    in_process = OCR_EXECUTOR != "thread"
+    if in_process:
+        # Arguments are pickled to the worker process; an mmap'd upload has to become bytes
+        args = tuple(bytes(arg) if isinstance(arg, mmap.mmap) else arg for arg in args)
+    # Executor threads and processes do not inherit the request's logging context
+    func = with_request_id(func)
+    try:
+        executor = get_executor()
+        try:
+            future = executor.submit(run_job, func, args, time.time(), in_process)
+        except BrokenProcessPool:
+            _discard_executor(executor)
+            executor = get_executor()
+            future = executor.submit(run_job, func, args, time.time(), in_process)
+    except Exception:
+        _slots.release()
+        raise
+
+    # The slot is held until the job really finishes, even if the caller
+    # stops waiting, so a timed-out job still counts against the queue
+    POOL_IN_FLIGHT.inc(pool="ocr")
+    future.add_done_callback(lambda _: (_slots.release(), POOL_IN_FLIGHT.dec(pool="ocr")))
+
+    try:
+        result, timings, waited = await asyncio.wait_for(asyncio.wrap_future(future), timeout=OCR_JOB_TIMEOUT)
+        record_stages(timings)
+        observe_stage("ocr_queue", waited)
+        return result
+    except asyncio.TimeoutError:
+        future.cancel()
+        raise OCRTimeoutError(f"OCR did not finish within {OCR_JOB_TIMEOUT:.0f} seconds")
+    except BrokenProcessPool:
+        # A worker died (e.g. killed by the OOM killer); start a fresh pool for the next job
+        _discard_executor(executor)
+        raise
+
+
+async def run_ocr_pages(func, pages, limit=OCR_PAGE_WORKERS):
+    """
+    run_ocr(func, page, 0) for every page of a split upload (see split_upload),
+    yielding (index, result) as pages finish
+    At most `limit` pages of the document are submitted at a time, so a long
+    PDF waits for slots instead of failing with OCRBusyError on an idle pool.
+    """
+    gate = asyncio.Semaphore(max(1, limit))
+
+    async def run_page(index, page):
+        async with gate:
+            return index, await run_ocr(func, page, 0)
+
+    tasks = [asyncio.ensure_future(run_page(index, page)) for index, page in enumerate(pages)]
+    try:
+        for next_page in asyncio.as_completed(tasks):
+            yield await next_page
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _discard_executor(broken):
+    """
+    Drop a broken pool so get_executor() starts a new one. Every job that was
+    running on it fails at once, so only the first caller replaces it; the
+    others must not throw away the fresh pool that caller created.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_executor():
+    """Stop the OCR executor (called on app shutdown)"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
@@ -1,9 +1,18 @@
 import pytesseract
-from PIL import Image
+from PIL import Image, ImageOps, ImageSequence
 import io
+import math
+import numpy as np
+import pypdfium2 as pdfium
 import os
 import re
 import shutil
+import time
+import warnings
+from utils.metrics import observe_stage, stage_timer
+from utils.structured_log import get_logger
+from utils.uploads import as_stream, UPLOAD_MAX_PIXELS
+from utils.validators import verhoeff_valid
 
 # Try to set Tesseract path (works for Windows and Linux/Render)
 TESSERACT_PATHS = [
@@ -14,6 +23,8 @@ TESSERACT_PATHS = [
     '/usr/local/bin/tesseract',  # Alternative Linux path
 ]
 
+logger = get_logger("ocr")
+
 tesseract_found = False
 
 # First try to find tesseract using system PATH
@@ -21,37 +32,486 @@ tesseract_path = shutil.which('tesseract')
 if tesseract_path:
     pytesseract.pytesseract.tesseract_cmd = tesseract_path
     tesseract_found = True
-    print(f"✅ Tesseract found at: {tesseract_path}")
+    logger.info("Tesseract found at %s", tesseract_path)
 else:
     # If not in PATH, try predefined paths
     for path in TESSERACT_PATHS:
         if os.path.exists(path):
             pytesseract.pytesseract.tesseract_cmd = path
             tesseract_found = True
-            print(f"✅ Tesseract found at: {path}")
+            logger.info("Tesseract found at %s", path)
             break
 
 if not tesseract_found:
-    print("⚠️ Tesseract not found in standard locations!")
-    print("   Searched:")
-    for path in TESSERACT_PATHS:
-        print(f"   - {path}")
-    print("   OCR will fail until Tesseract is properly installed.")
+    logger.warning(
+        "Tesseract not found in standard locations; OCR will fail until it is installed",
+        extra={"searched": TESSERACT_PATHS}
+    )
+
+# Kill the tesseract subprocess if a single image takes longer than this
+TESSERACT_TIMEOUT = float(os.getenv("OCR_JOB_TIMEOUT", "60"))
+
+# OCR settings (part of the OCR cache key - change any of them and cached text is ignored)
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+OCR_PSM = int(os.getenv("OCR_PSM", "3"))
+
+# Image preprocessing before Tesseract
+# OCR_PREPROCESS_STEPS: comma separated subset of PREPROCESS_STEPS, run in that order
+PREPROCESS_STEPS = ["draft", "exif", "grayscale", "resample", "binarize", "deskew"]
+OCR_PREPROCESS_STEPS = [
+    step.strip() for step in os.getenv("OCR_PREPROCESS_STEPS", ",".join(PREPROCESS_STEPS)).split(",")
+    if step.strip() in PREPROCESS_STEPS
+]
+OCR_TARGET_DPI = int(os.getenv("OCR_TARGET_DPI", "300"))
+# Longest side in pixels after scaling, whatever the DPI (~A4 at 300 DPI)
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", "3500"))
+OCR_DESKEW_MAX_ANGLE = float(os.getenv("OCR_DESKEW_MAX_ANGLE", "5"))
+# Multi-page uploads (PDF, multi-frame TIFF)
+OCR_MAX_PAGES = int(os.getenv("OCR_MAX_PAGES", "20"))
+# Separator between pages in extract_text output (Tesseract's own page break)
+PAGE_SEPARATOR = "\f"
+# Bump whenever image preprocessing code changes what Tesseract sees
+PREPROCESS_VERSION = 3
+PREPROCESS_SIGNATURE = (
+    f"v{PREPROCESS_VERSION}:{'+'.join(OCR_PREPROCESS_STEPS)}:"
+    f"{OCR_TARGET_DPI}:{OCR_MAX_SIDE}:{OCR_DESKEW_MAX_ANGLE}:{OCR_MAX_PAGES}"
+)
+
+
+# Decompression bombs: PIL refuses to decode images over UPLOAD_MAX_PIXELS
+# (it only warns between 1x and 2x the limit; make that an error too)
+Image.MAX_IMAGE_PIXELS = UPLOAD_MAX_PIXELS
+warnings.simplefilter("error", Image.DecompressionBombWarning)
+
+
+class OCRError(Exception):
+    """OCR failure carrying the user-facing "ERROR: ..." message (picklable across worker processes)"""
+
+
+# EXIF Make / Model: set by cameras and phones, whose DPI tag is a placeholder
+_CAMERA_EXIF_TAGS = (271, 272)
+
+
+def _scan_dpi(image):
+    """
+    Horizontal DPI when the upload really reports one, else None
+    Cameras and phones write 72 (or 96) whatever the subject's size, so those
+    values and anything carrying camera EXIF count as missing
+    """
+    dpi = image.info.get("dpi")
+    if not dpi or not dpi[0] or float(dpi[0]) <= 96:
+        return None
+    if "exif" in image.info and any(tag in image.getexif() for tag in _CAMERA_EXIF_TAGS):
+        return None
+    return float(dpi[0])
+
+
+def _target_scale(image):
+    """
+    Scale factor that brings the image to OCR_TARGET_DPI, never past OCR_MAX_SIDE
+    on the long side; images without a real DPI are only ever shrunk to the cap
+    """
+    dpi = _scan_dpi(image)
+    # Never upscale more than 2x - it only adds pixels, not detail
+    scale = min(OCR_TARGET_DPI / dpi, 2.0) if dpi else 1.0
+    longest = max(image.size)
+    if longest * scale > OCR_MAX_SIDE:
+        scale = OCR_MAX_SIDE / longest
+    return scale
+
+
+def _draft(image):
+    """Let the JPEG decoder skip detail we would throw away anyway (1/2, 1/4, 1/8 scale)"""
+    if image.format != "JPEG":
+        return image
+    scale = _target_scale(image)
+    if scale < 1.0:
+        mode = "L" if "grayscale" in OCR_PREPROCESS_STEPS else image.mode
+        original_width = image.size[0]
+        image.draft(mode, (max(1, int(image.size[0] * scale)), max(1, int(image.size[1] * scale))))
+        reduction = original_width / image.size[0]
+        if reduction > 1 and "dpi" in image.info:
+            # Keep the DPI consistent with the reduced size for the resample step
+            dpi = image.info["dpi"]
+            image.info["dpi"] = (dpi[0] / reduction, dpi[1] / reduction)
+    return image
+
+
+def _exif(image):
+    """Apply the camera's EXIF orientation"""
+    image = ImageOps.exif_transpose(image)
+    # Word boxes then refer to the upright page (see ocr_page_layout)
+    image.info["exif_transposed"] = True
+    return image
+
+
+def _grayscale(image):
+    if image.mode == "L":
+        return image
+    if image.mode in ("RGBA", "LA", "P"):
+        # Flatten transparency onto white, otherwise it turns black
+        image = image.convert("RGBA")
+        background = Image.new("RGBA", image.size, (255, 255, 255, 255))
+        image = Image.alpha_composite(background, image)
+    return image.convert("L")
+
+
+def _resample(image):
+    scale = _target_scale(image)
+    if abs(scale - 1.0) < 0.05 and max(image.size) <= OCR_MAX_SIDE:
+        return image
+    size = (max(1, round(image.size[0] * scale)), max(1, round(image.size[1] * scale)))
+    resized = image.resize(size, Image.LANCZOS, reducing_gap=2.0)
+    dpi = _scan_dpi(image)
+    resized.info["dpi"] = (dpi * scale,) * 2 if dpi else (OCR_TARGET_DPI, OCR_TARGET_DPI)
+    return resized
+
+
+def otsu_threshold(pixels):
+    """Otsu threshold of a uint8 array, computed from its histogram"""
+    hist = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256, dtype=np.float64)
+    weight_bg = np.cumsum(hist)
+    weight_fg = weight_bg[-1] - weight_bg
+    sum_bg = np.cumsum(hist * levels)
+    mean_bg = sum_bg / np.maximum(weight_bg, 1)
+    mean_fg = (sum_bg[-1] - sum_bg) / np.maximum(weight_fg, 1)
+    between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    return int(np.argmax(between))
+
+
+def _binarize(image):
+    if image.mode != "L":
+        image = image.convert("L")
+    pixels = np.asarray(image)
+    threshold = otsu_threshold(pixels)
+    binary = np.where(pixels > threshold, 255, 0).astype(np.uint8)
+    result = Image.fromarray(binary, mode="L")
+    result.info = image.info
+    return result
+
+
+def estimate_skew(image, max_angle=OCR_DESKEW_MAX_ANGLE, step=0.25):
+    """
+    Estimate counter-clockwise text skew in degrees with a projection profile: text lines produce the
+    sharpest row histogram when they are horizontal. All candidate angles are scored
+    in one vectorized pass over a sample of the dark pixels.
+    """
+    small = image.convert("L")
+    if max(small.size) > 1000:
+        ratio = 1000 / max(small.size)
+        small = small.resize((max(1, int(small.size[0] * ratio)), max(1, int(small.size[1] * ratio))))
+    pixels = np.asarray(small)
+    ys, xs = np.nonzero(pixels < otsu_threshold(pixels))
+    if len(ys) < 100:
+        return 0.0
+    if len(ys) > 20000:
+        pick = np.random.default_rng(0).choice(len(ys), 20000, replace=False)
+        ys, xs = ys[pick], xs[pick]
+
+    angles = np.arange(-max_angle, max_angle + step / 2, step)
+    radians = np.deg2rad(angles)[:, None]
+    # Row each dark pixel lands in after rotating by each candidate angle
+    rows = np.round(ys[None, :] * np.cos(radians) - xs[None, :] * np.sin(radians)).astype(np.int64)
+    rows -= rows.min()
+    height = int(rows.max()) + 1
+    offsets = (np.arange(len(angles)) * height)[:, None]
+    profiles = np.bincount((rows + offsets).ravel(), minlength=len(angles) * height)
+    profiles = profiles.reshape(len(angles), height).astype(np.float64)
+    scores = np.sum(np.diff(profiles, axis=1) ** 2, axis=1)
+    best = int(np.argmax(scores))
+    # Sparse pages (a few words) give flat, noisy scores; only rotate on a clear win over 0°
+    if scores[best] < scores[int(np.argmin(np.abs(angles)))] * 1.15:
+        return 0.0
+    # Image rows grow downwards, so the best angle here is the clockwise correction;
+    # return it as counter-clockwise skew to match PIL's rotate()
+    return -float(angles[best])
+
+
+def _deskew(image):
+    angle = estimate_skew(image)
+    if abs(angle) < 0.2:
+        return image
+    fill = 255 if image.mode == "L" else (255, 255, 255)
+    rotated = image.rotate(-angle, resample=Image.BICUBIC, expand=True, fillcolor=fill)
+    # Kept so word boxes can be mapped back onto the unrotated page
+    rotated.info = dict(image.info, deskew=(angle, image.size))
+    return rotated
+
+
+def _unrotate(x, y, image):
+    """Point in a preprocessed image -> the same point on the page before deskewing"""
+    angle, (width, height) = image.info.get("deskew", (0.0, image.size))
+    if not angle:
+        return x, y
+    theta = math.radians(angle)
+    dx, dy = x - image.size[0] / 2, y - image.size[1] / 2
+    return (
+        dx * math.cos(theta) + dy * math.sin(theta) + width / 2,
+        -dx * math.sin(theta) + dy * math.cos(theta) + height / 2,
+    )
+
+
+_PREPROCESSORS = {
+    "draft": _draft,
+    "exif": _exif,
+    "grayscale": _grayscale,
+    "resample": _resample,
+    "binarize": _binarize,
+    "deskew": _deskew,
+}
+
+
+def preprocess_image(image, steps=None):
+    """
+    Run the configured preprocessing steps on a freshly opened PIL image
+    Returns (image, timings) where timings maps each step to milliseconds
+    """
+    steps = OCR_PREPROCESS_STEPS if steps is None else steps
+    timings = {}
+    for step in steps:
+        start = time.perf_counter()
+        image = _PREPROCESSORS[step](image)
+        if step == "draft":
+            # draft() only configures the decoder; the actual (reduced) decode happens here
+            image.load()
+        timings[step] = round((time.perf_counter() - start) * 1000, 2)
+    # The draft step is where PIL actually decodes the upload
+    observe_stage("image_decode", timings.get("draft", 0) / 1000)
+    observe_stage("preprocess", sum(ms for step, ms in timings.items() if step != "draft") / 1000)
+    return image, timings
+
+
+def load_pages(file_bytes):
+    """
+    Open an upload as a list of page images
+    PDFs are rasterized at OCR_TARGET_DPI, multi-frame TIFFs are split into frames
+    """
+    if file_bytes[:5] == b"%PDF-":
+        return render_pdf_pages(file_bytes)
+
+    image = Image.open(as_stream(file_bytes))
+    if getattr(image, "n_frames", 1) <= 1:
+        return [image]
+
+    pages = []
+    for frame in ImageSequence.Iterator(image):
+        if len(pages) >= OCR_MAX_PAGES:
+            break
+        pages.append(frame.copy())
+    return pages
+
+
+def pdf_input(file_bytes):
+    """pdfium takes bytes as they are and anything else (an mmap'd upload) as a stream"""
+    return file_bytes if isinstance(file_bytes, bytes) else as_stream(file_bytes)
+
+
+def render_pdf_pages(file_bytes):
+    """Rasterize each PDF page to a grayscale PIL image"""
+    pdf = pdfium.PdfDocument(pdf_input(file_bytes))
+    try:
+        # pdfium is not thread-safe, so pages are rendered one after another
+        return [_render_pdf_page(pdf, index) for index in range(min(len(pdf), OCR_MAX_PAGES))]
+    finally:
+        pdf.close()
+
+
+def _render_pdf_page(pdf, index):
+    page = pdf[index]
+    try:
+        width, height = page.get_size()
+        scale = OCR_TARGET_DPI / 72
+        if width * height * scale * scale > UPLOAD_MAX_PIXELS:
+            raise ValueError(f"PDF page {index + 1} is too large to render ({width:.0f}x{height:.0f} pt)")
+        with stage_timer("image_decode"):
+            image = page.render(scale=OCR_TARGET_DPI / 72, grayscale=True).to_pil()
+        image.info["dpi"] = (OCR_TARGET_DPI, OCR_TARGET_DPI)
+        return image
+    finally:
+        page.close()
+
+
+def may_have_pages(file_bytes):
+    """Whether an upload can hold several pages (PDF, TIFF); PNG and JPEG uploads are OCR'd whole"""
+    return file_bytes[:5] == b"%PDF-" or file_bytes[:4] in (b"II*\x00", b"MM\x00*")
+
+
+def split_upload(file_bytes):
+    """
+    One small upload per page of a multi-page PDF or TIFF (single-page PDFs,
+    single-frame TIFFs), so each page can be sent to an OCR worker on its own
+    instead of the whole document; [] when there is only one page
+    Raises OCRError if the upload cannot be opened
+    """
+    try:
+        if file_bytes[:5] == b"%PDF-":
+            pdf = pdfium.PdfDocument(pdf_input(file_bytes))
+            try:
+                if len(pdf) <= 1:
+                    return []
+                pages = []
+                for index in range(min(len(pdf), OCR_MAX_PAGES)):
+                    page_pdf = pdfium.PdfDocument.new()
+                    try:
+                        page_pdf.import_pages(pdf, [index])
+                        out = io.BytesIO()
+                        page_pdf.save(out)
+                    finally:
+                        page_pdf.close()
+                    pages.append(out.getvalue())
+                return pages
+            finally:
+                pdf.close()
+
+        image = Image.open(as_stream(file_bytes))
+        if getattr(image, "n_frames", 1) <= 1:
+            return []
+        pages = []
+        for frame in ImageSequence.Iterator(image):
+            if len(pages) >= OCR_MAX_PAGES:
+                break
+            out = io.BytesIO()
+            options = {"dpi": frame.info["dpi"]} if "dpi" in frame.info else {}
+            frame.save(out, format="TIFF", compression="tiff_lzw", **options)
+            pages.append(out.getvalue())
+        return pages
+    except Exception as e:
+        raise OCRError(ocr_error_message(e)) from None
+
+
+def load_page(file_bytes, index=0):
+    """Open a single page of an upload without decoding the others"""
+    if file_bytes[:5] == b"%PDF-":
+        pdf = pdfium.PdfDocument(pdf_input(file_bytes))
+        try:
+            return _render_pdf_page(pdf, index)
+        finally:
+            pdf.close()
+    image = Image.open(as_stream(file_bytes))
+    if getattr(image, "n_frames", 1) > 1:
+        image.seek(index)
+        image = image.copy()
+    return image
+
+
+def extract_page(file_bytes, index):
+    """
+    OCR one page of an upload, decoding only that page
+    Lets callers spread the pages of one document over separate OCR workers
+    Raises OCRError on failure
+    """
+    try:
+        return ocr_page(load_page(file_bytes, index))
+    except Exception as e:
+        # Some pytesseract/PIL exceptions cannot be pickled back from a worker process
+        raise OCRError(ocr_error_message(e)) from None
+
+
+def ocr_page(image):
+    """Preprocess and OCR a single page image"""
+    image, timings = preprocess_image(image)
+    logger.debug("Preprocessed page", extra={"size": image.size, "mode": image.mode, "timings_ms": timings})
+    with stage_timer("ocr"):
+        text = pytesseract.image_to_string(
+            image,
+            lang=OCR_LANG,
+            config=f"--psm {OCR_PSM}",
+            timeout=TESSERACT_TIMEOUT
+        )
+    return text.strip(PAGE_SEPARATOR)
+
+
+def ocr_page_layout(image):
+    """
+    Preprocess and OCR a single page image, keeping where each word is
+    Returns (text, layout); layout["words"] holds [word, left, top, width, height, line]
+    with positions as fractions of the page size, so they apply to the original
+    page image at any resolution. Deskewing is undone (each box keeps its size
+    and is moved to where its centre was on the unrotated page);
+    layout["exif_transposed"] says whether the page is the EXIF-rotated one.
+    """
+    image, timings = preprocess_image(image)
+    logger.debug("Preprocessed page", extra={"size": image.size, "mode": image.mode, "timings_ms": timings})
+    with stage_timer("ocr"):
+        data = pytesseract.image_to_data(
+            image,
+            lang=OCR_LANG,
+            config=f"--psm {OCR_PSM}",
+            timeout=TESSERACT_TIMEOUT,
+            output_type=pytesseract.Output.DICT
+        )
+    width, height = image.info.get("deskew", (0.0, image.size))[1]
+    lines = []
+    words = []
+    current_line = None
+    for i, word in enumerate(data["text"]):
+        word = word.strip()
+        if not word or float(data["conf"][i]) < 0:
+            continue
+        line_key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        if line_key != current_line:
+            # A new block or paragraph gets a blank line, as image_to_string does
+            if current_line is not None and line_key[:2] != current_line[:2]:
+                lines.append("")
+            lines.append(word)
+            current_line = line_key
+        else:
+            lines[-1] += " " + word
+        box_width, box_height = data["width"][i], data["height"][i]
+        x, y = _unrotate(data["left"][i] + box_width / 2, data["top"][i] + box_height / 2, image)
+        words.append([
+            word,
+            round((x - box_width / 2) / width, 5),
+            round((y - box_height / 2) / height, 5),
+            round(box_width / width, 5),
+            round(box_height / height, 5),
+            len(lines) - 1
+        ])
+    return "\n".join(lines), {"words": words, "exif_transposed": bool(image.info.get("exif_transposed"))}
+
+
+def extract_page_layout(file_bytes, index):
+    """
+    ocr_page_layout for one page of an upload, decoding only that page
+    Raises OCRError on failure
+    """
+    try:
+        return ocr_page_layout(load_page(file_bytes, index))
+    except Exception as e:
+        raise OCRError(ocr_error_message(e)) from None
+
+
+def extract_pages(file_bytes):
+    """
+    OCR every page of an upload within one call, returning page texts in page order
+    (the endpoints instead give each page its own OCR job, see split_upload)
+    """
+    return [ocr_page(page) for page in load_pages(file_bytes)]
+
+
+def split_pages(text):
+    """Split extract_text output back into per-page text"""
+    return text.split(PAGE_SEPARATOR)
 
 
 def extract_text(file_bytes):
     """
-    Extract text from image using Tesseract OCR
+    Extract text from an image, multi-frame TIFF or PDF using Tesseract OCR
+    Pages are joined with PAGE_SEPARATOR
     """
     try:
-        image = Image.open(io.BytesIO(file_bytes))
-        text = pytesseract.image_to_string(image)
-        return text
+        return PAGE_SEPARATOR.join(extract_pages(file_bytes))
     except Exception as e:
-        error_msg = str(e)
-        if "tesseract is not installed" in error_msg.lower() or "not in your path" in error_msg.lower():
-            return "ERROR: Tesseract OCR is not installed. Please install it from: https://github.com/UB-Mannheim/tesseract/wiki"
-        return f"ERROR: Could not extract text from image. {error_msg}"
+        return ocr_error_message(e)
+
+
+def ocr_error_message(error):
+    """User-facing "ERROR: ..." text for an exception raised during OCR"""
+    error_msg = str(error)
+    if "tesseract is not installed" in error_msg.lower() or "not in your path" in error_msg.lower():
+        return "ERROR: Tesseract OCR is not installed. Please install it from: https://github.com/UB-Mannheim/tesseract/wiki"
+    return f"ERROR: Could not extract text from image. {error_msg}"
 
 
 def extract_id_data(file_bytes):
@@ -59,208 +519,193 @@ def extract_id_data(file_bytes):
     Extract structured data from ID cards (Aadhaar, PAN, Voter ID, etc.)
     Returns a dictionary with detected fields
     """
-    text = extract_text(file_bytes)
-    
+    return parse_id_data(extract_text(file_bytes))
+
+
+# Single-pass ID card extraction
+# Each line is visited once; cheap substring tests decide which of these
+# precompiled patterns are worth running on it.
+_ID_NUMBERS = re.compile(
+    r"(?P<date>\b\d{2}[-/]\d{2}[-/]\d{4}\b)"
+    r"|(?P<date_ymd>\b\d{4}[-/]\d{2}[-/]\d{2}\b)"
+    r"|(?P<date_short>\b\d{2}[-/]\d{2}[-/]\d{2}\b)"
+    r"|(?P<aadhaar>\b\d{4}\s\d{4}\s\d{4}\b|\b\d{12}\b)"
+    r"|(?P<mobile_cc>\+91[\s-]?[6-9]\d{9}\b)"
+    r"|(?P<mobile>\b[6-9]\d{9}\b)"
+    r"|(?P<pan>\b[A-Z]{5}\d{4}[A-Z]\b)"
+)
+_EMAIL = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b")
+_DIGIT = re.compile(r"\d")
+_HAS_LETTER = re.compile(r"[A-Za-z]")
+_NON_DIGIT_OR_PLUS = re.compile(r"[^\d+]")
+_PAN_WORD = re.compile(r"\bpan\b")
+_DATE_KINDS = ("date", "date_short", "date_ymd")      # preference order, as before
+_ADDRESS_STOP_WORDS = ("phone", "mobile", "email", "pin", "signature")
+_HEADER_WORDS = ("government", "india", "card", "republic")
+# (document type, id number kind, keyword test on a lower-cased line) in priority order
+_DOCUMENT_TYPES = [
+    ("Aadhaar Card", "aadhaar", lambda low: "aadhaar" in low or "आधार" in low),
+    ("PAN Card", "pan", lambda low: "income tax" in low or "permanent account" in low or bool(_PAN_WORD.search(low))),
+    ("Voter ID", None, lambda low: "voter" in low or "election" in low),
+    ("Driving License", None, lambda low: "driving" in low or "license" in low),
+]
+
+
+def _contains_word(text, word):
+    """Whole-word substring test (like \\bword\\b) built on str.find"""
+    start = text.find(word)
+    while start != -1:
+        end = start + len(word)
+        if ((start == 0 or not (text[start - 1].isalnum() or text[start - 1] == "_"))
+                and (end == len(text) or not (text[end].isalnum() or text[end] == "_"))):
+            return True
+        start = text.find(word, start + 1)
+    return False
+
+
+def parse_id_data(text):
+    """
+    Build the structured ID card dictionary from already extracted OCR text
+    Lines are scanned once, stopping as soon as every field is settled; each
+    extracted field also gets a confidence score (0-1) in data["confidence"].
+    """
     if text.startswith("ERROR:"):
         return {"error": text}
     
-    # Initialize data dictionary
+    # Whole-text keyword tests are plain substring searches, far cheaper than any per-line work
+    low_text = text.lower()
+    document_rank = next(
+        (rank for rank, (_, _, test) in enumerate(_DOCUMENT_TYPES) if test(low_text)),
+        len(_DOCUMENT_TYPES)
+    )
+    id_kind = _DOCUMENT_TYPES[document_rank][1] if document_rank < len(_DOCUMENT_TYPES) else None
+    genders = {word.upper() for word in ("male", "female", "other") if _contains_word(low_text, word)}
+    
+    first = {}                  # first match of each value kind anywhere
+    labelled_date = None        # first date on a DOB/birth line
+    name = None
+    name_found = False
+    name_pending = False        # "Name" label seen, value expected on the next line
+    fallback_name = None
+    address_lines = []
+    address_state = "before"    # before -> capturing -> done
+    
+    for raw_line in text.split("\n"):
+        line = raw_line.strip()
+        low = raw_line.lower()
+        
+        values = {}
+        if _DIGIT.search(raw_line):
+            for match in _ID_NUMBERS.finditer(raw_line):
+                kind, value = match.lastgroup, match.group(0)
+                if kind == "mobile_cc" and not value[3].isdigit():
+                    # "+91 98765..." was always reported as the bare 10-digit number
+                    kind, value = "mobile", value[-10:]
+                values.setdefault(kind, value)
+                first.setdefault(kind, value)
+        if "email" not in first and "@" in raw_line:
+            match = _EMAIL.search(raw_line)
+            if match:
+                first["email"] = match.group(0)
+        
+        # Name: value after "Name:" or on the line below the label
+        if not name_found:
+            if name_pending:
+                name_pending = False
+                if len(line) > 2:
+                    name, name_found = clean_name(line), True
+            if not name_found and "name" in low:
+                after_colon = raw_line.split(":", 1)[1].strip() if ":" in raw_line else ""
+                if len(after_colon) > 2:
+                    name, name_found = clean_name(after_colon), True
+                else:
+                    name_pending = True
+            if (fallback_name is None and len(line) > 2 and _HAS_LETTER.search(line)
+                    and not any(word in low for word in _HEADER_WORDS)):
+                fallback_name = line
+        
+        # Date of birth: prefer a date on a labelled line
+        if labelled_date is None and ("dob" in low or "birth" in low):
+            labelled_date = next((values[kind] for kind in _DATE_KINDS if kind in values), None)
+        
+        # Address: from the "Address" label until the next field label, at most 4 lines
+        if address_state != "done":
+            if "address" in low:
+                address_state = "capturing"
+                if ":" in line:
+                    after_colon = line.split(":", 1)[1].strip()
+                    if after_colon:
+                        address_lines.append(after_colon)
+            elif address_state == "capturing":
+                if any(word in low for word in _ADDRESS_STOP_WORDS):
+                    address_state = "done"
+                else:
+                    if len(line) > 3:
+                        address_lines.append(line)
+                    if len(address_lines) >= 4:
+                        address_state = "done"
+        
+        if (name_found and labelled_date is not None and address_state == "done"
+                and "email" in first and "mobile" in first and (id_kind is None or id_kind in first)):
+            break
+    
+    name_labelled = name_found
+    if not name_found and fallback_name is not None:
+        name = clean_name(fallback_name)
+    
     data = {
         "raw_text": text,
-        "name": None,
-        "dob": None,
+        "name": name,
+        "dob": labelled_date or next((first[kind] for kind in _DATE_KINDS if kind in first), None),
         "id_number": None,
-        "address": None,
+        "address": ", ".join(address_lines) if address_lines else None,
         "phone": None,
-        "email": None,
+        "email": first.get("email"),
         "gender": None,
-        "document_type": None
+        "document_type": "ID Card"
     }
+    confidence = {"document_type": 0.3}
     
-    # Detect document type
-    text_upper = text.upper()
-    if "AADHAAR" in text_upper or "आधार" in text:
-        data["document_type"] = "Aadhaar Card"
-        data["id_number"] = extract_aadhaar_number(text)
-    elif "INCOME TAX" in text_upper or "PAN" in text_upper:
-        data["document_type"] = "PAN Card"
-        data["id_number"] = extract_pan_number(text)
-    elif "VOTER" in text_upper or "ELECTION" in text_upper:
-        data["document_type"] = "Voter ID"
-    elif "DRIVING" in text_upper or "LICENSE" in text_upper:
-        data["document_type"] = "Driving License"
-    else:
-        data["document_type"] = "ID Card"
-    
-    # Extract name (usually first line or after "Name:")
-    data["name"] = extract_name(text)
-    
-    # Extract date of birth
-    data["dob"] = extract_dob(text)
-    
-    # Extract address
-    data["address"] = extract_address(text)
+    if document_rank < len(_DOCUMENT_TYPES):
+        data["document_type"] = _DOCUMENT_TYPES[document_rank][0]
+        confidence["document_type"] = 0.9
+        if id_kind == "aadhaar" and "aadhaar" in first:
+            data["id_number"] = first["aadhaar"].replace(" ", "")
+            confidence["id_number"] = 0.99 if verhoeff_valid(data["id_number"]) else 0.6
+        elif id_kind == "pan" and "pan" in first:
+            data["id_number"] = first["pan"]
+            confidence["id_number"] = 0.95
     
-    # Extract phone
-    data["phone"] = extract_phone(text)
+    phone = first.get("mobile") or first.get("mobile_cc")
+    if phone:
+        data["phone"] = _NON_DIGIT_OR_PLUS.sub("", phone)
+        confidence["phone"] = 0.9
     
-    # Extract email
-    data["email"] = extract_email(text)
+    if "MALE" in genders and "FEMALE" not in genders:
+        data["gender"] = "Male"
+    elif "FEMALE" in genders:
+        data["gender"] = "Female"
+    elif "OTHER" in genders:
+        data["gender"] = "Other"
+    if data["gender"]:
+        confidence["gender"] = 0.9 if len(genders) == 1 else 0.6
     
-    # Extract gender
-    data["gender"] = extract_gender(text)
+    if data["name"]:
+        confidence["name"] = 0.9 if name_labelled else 0.4
+    if data["dob"]:
+        confidence["dob"] = 0.95 if labelled_date else 0.6
+    if data["address"]:
+        confidence["address"] = 0.8
+    if data["email"]:
+        confidence["email"] = 0.95
     
+    data["confidence"] = confidence
     return data
 
 
-def extract_aadhaar_number(text):
-    """Extract 12-digit Aadhaar number"""
-    # Pattern: 1234 5678 9012 or 123456789012
-    patterns = [
-        r'\b\d{4}\s\d{4}\s\d{4}\b',
-        r'\b\d{12}\b'
-    ]
-    for pattern in patterns:
-        match = re.search(pattern, text)
-        if match:
-            return match.group(0).replace(' ', '')
-    return None
-
-
-def extract_pan_number(text):
-    """Extract PAN number (Format: ABCDE1234F)"""
-    pattern = r'\b[A-Z]{5}\d{4}[A-Z]\b'
-    match = re.search(pattern, text)
-    return match.group(0) if match else None
-
-
-def extract_name(text):
-    """Extract name from ID card"""
-    lines = text.split('\n')
-    
-    # Look for "Name:" or similar labels
-    for i, line in enumerate(lines):
-        if re.search(r'name\s*:?', line, re.IGNORECASE):
-            # Next line or same line after colon
-            if ':' in line:
-                name = line.split(':', 1)[1].strip()
-                if name and len(name) > 2:
-                    return clean_name(name)
-            if i + 1 < len(lines):
-                name = lines[i + 1].strip()
-                if name and len(name) > 2:
-                    return clean_name(name)
-    
-    # If no label found, first non-empty line with alphabetic characters
-    for line in lines:
-        line = line.strip()
-        if len(line) > 2 and re.search(r'[A-Za-z]', line):
-            # Skip common headers
-            if not any(word in line.upper() for word in ['GOVERNMENT', 'INDIA', 'CARD', 'REPUBLIC']):
-                return clean_name(line)
-    
-    return None
-
-
 def clean_name(name):
     """Clean extracted name"""
     # Remove extra spaces, special characters
     name = re.sub(r'[^A-Za-z\s]', '', name)
     name = ' '.join(name.split())
     return name if len(name) > 2 else None
-
-
-def extract_dob(text):
-    """Extract date of birth"""
-    # Common date patterns
-    patterns = [
-        r'\b(\d{2}[-/]\d{2}[-/]\d{4})\b',  # DD-MM-YYYY or DD/MM/YYYY
-        r'\b(\d{2}[-/]\d{2}[-/]\d{2})\b',  # DD-MM-YY
-        r'\b(\d{4}[-/]\d{2}[-/]\d{2})\b',  # YYYY-MM-DD
-    ]
-    
-    # Look for DOB label
-    for line in text.split('\n'):
-        if re.search(r'(dob|birth|date of birth)', line, re.IGNORECASE):
-            for pattern in patterns:
-                match = re.search(pattern, line)
-                if match:
-                    return match.group(1)
-    
-    # Search entire text for first date
-    for pattern in patterns:
-        match = re.search(pattern, text)
-        if match:
-            return match.group(1)
-    
-    return None
-
-
-def extract_address(text):
-    """Extract address from ID card"""
-    lines = text.split('\n')
-    address_lines = []
-    capturing = False
-    
-    for i, line in enumerate(lines):
-        line = line.strip()
-        if re.search(r'address\s*:?', line, re.IGNORECASE):
-            capturing = True
-            # Check if address is on same line after colon
-            if ':' in line:
-                addr = line.split(':', 1)[1].strip()
-                if addr:
-                    address_lines.append(addr)
-            continue
-        
-        if capturing:
-            # Stop at next labeled field or document boundary
-            if re.search(r'(phone|mobile|email|pin|signature)', line, re.IGNORECASE):
-                break
-            if line and len(line) > 3:
-                address_lines.append(line)
-            if len(address_lines) >= 4:  # Max 4 lines of address
-                break
-    
-    if address_lines:
-        return ', '.join(address_lines)
-    
-    return None
-
-
-def extract_phone(text):
-    """Extract phone number"""
-    # Indian phone patterns
-    patterns = [
-        r'\b[6-9]\d{9}\b',  # 10-digit mobile
-        r'\+91[\s-]?[6-9]\d{9}\b',  # With country code
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, text)
-        if match:
-            phone = match.group(0)
-            # Clean up
-            phone = re.sub(r'[^\d+]', '', phone)
-            return phone
-    
-    return None
-
-
-def extract_email(text):
-    """Extract email address"""
-    pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    match = re.search(pattern, text)
-    return match.group(0) if match else None
-
-
-def extract_gender(text):
-    """Extract gender"""
-    text_upper = text.upper()
-    if re.search(r'\bMALE\b', text_upper) and not re.search(r'\bFEMALE\b', text_upper):
-        return "Male"
-    elif re.search(r'\bFEMALE\b', text_upper):
-        return "Female"
-    elif re.search(r'\bOTHER\b', text_upper):
-        return "Other"
-    return None
@@ -0,0 +1,142 @@
+import asyncio
+import io
+import json
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.metrics import POOL_IN_FLIGHT, record_stages, run_job, stage_timer
+from utils.pdf_generator import fill_pdf_form
+
+# Bulk PDF generation configuration
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 1)))
+# PDFs rendered or waiting to be written at once; bounds memory for any batch size
+PDF_BULK_MAX_INFLIGHT = int(os.getenv("PDF_BULK_MAX_INFLIGHT", str(PDF_WORKERS * 2)))
+PDF_BULK_MAX_FORMS = int(os.getenv("PDF_BULK_MAX_FORMS", "5000"))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Create the shared PDF rendering pool on first use
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+    return _executor
+
+
+def _discard_executor(broken):
+    """Drop a broken pool, unless another render has already replaced it"""
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pdf_executor():
+    """Stop the PDF rendering pool (called on app shutdown)"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def render_pdf_bytes(data):
+    """Render one filled form and return the PDF bytes (runs in a worker process)"""
+    with stage_timer("pdf_render"):
+        return fill_pdf_form(data, io.BytesIO()).getvalue()
+
+
+async def _render(index, data):
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    try:
+        with POOL_IN_FLIGHT.track(pool="pdf_bulk"):
+            pdf, timings, _ = await loop.run_in_executor(
+                executor, run_job, render_pdf_bytes, (data,), time.time(), True
+            )
+        record_stages(timings)
+        return index, pdf, None
+    except BrokenProcessPool:
+        # A worker died; later forms get a fresh pool
+        _discard_executor(executor)
+        return index, None, "PDF worker crashed"
+    except Exception as e:
+        return index, None, f"{type(e).__name__}: {e}"
+
+
+class _ZipStream:
+    """Write-only file object that hands ZipFile's output back in pieces"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+async def bulk_pdf_zip(forms):
+    """
+    Render forms across the PDF process pool and yield a ZIP archive as each PDF finishes
+
+    forms yields (index, data) pairs where data is a fill_pdf_form payload, or
+    (index, error message) for items that could not be parsed. PDFs are stored as
+    form_<index>.pdf in completion order; failures are listed in errors.json.
+    """
+    stream = _ZipStream()
+    pending = set()
+    errors = []
+
+    def write_result(task):
+        index, pdf, error = task.result()
+        if error is not None:
+            errors.append({"index": index, "error": error})
+        else:
+            # PDFs are already compressed, so they are stored as-is
+            archive.writestr(f"form_{index:04d}.pdf", pdf)
+
+    try:
+        with zipfile.ZipFile(stream, "w", zipfile.ZIP_STORED) as archive:
+            for index, data in forms:
+                if isinstance(data, str):
+                    errors.append({"index": index, "error": data})
+                    continue
+                pending.add(asyncio.ensure_future(_render(index, data)))
+                if len(pending) >= PDF_BULK_MAX_INFLIGHT:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        write_result(task)
+                    yield stream.drain()
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    write_result(task)
+                yield stream.drain()
+
+            if errors:
+                archive.writestr("errors.json", json.dumps(sorted(errors, key=lambda e: e["index"]), indent=2))
+        yield stream.drain()
+    finally:
+        # Client went away: do not leave renders queued in the pool
+        for task in pending:
+            task.cancel()
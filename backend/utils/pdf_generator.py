@@ -1,139 +1,224 @@
 from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
 from datetime import datetime
+import os
+import tempfile
 
-def fill_pdf_form(data):
+# Generated PDFs stay in memory up to this size, larger ones spill to a temporary file
+PDF_SPOOL_MAX_BYTES = int(os.getenv("PDF_SPOOL_MAX_BYTES", str(8 * 1024 * 1024)))
+PDF_CHUNK_SIZE = 64 * 1024
+
+PAGE_WIDTH, PAGE_HEIGHT = letter
+PAGE_TOP = PAGE_HEIGHT - 1*inch
+BOTTOM_MARGIN = 1.5*inch          # keeps wrapped text clear of the footer
+NEW_QUESTION_MIN_Y = 2*inch       # a question starting below this goes to the next page
+
+# (font name, font size) -> {word: width}; words repeat a lot across answers and forms
+_word_widths = {}
+_WORD_WIDTH_CACHE_SIZE = 50000
+
+
+def word_width(word, font_name, font_size):
+    """Width of one word in points, measured once per font and size"""
+    widths = _word_widths.get((font_name, font_size))
+    if widths is None:
+        widths = _word_widths.setdefault((font_name, font_size), {})
+    width = widths.get(word)
+    if width is None:
+        if len(widths) >= _WORD_WIDTH_CACHE_SIZE:
+            widths.clear()
+        width = widths[word] = pdfmetrics.stringWidth(word, font_name, font_size)
+    return width
+
+
+class PageLayout:
     """
-    Generate filled PDF form with dynamic questions and answers
+    Cursor over the pages of one canvas
+    Draws blocks of lines as single text objects and starts a new page (with
+    the footer) whenever a block reaches the bottom margin
+    """
+
+    def __init__(self, c, y):
+        self.c = c
+        self.y = y
+
+    def new_page(self):
+        self.c.doForm("footer")
+        self.c.showPage()
+        self.y = PAGE_TOP
+
+    def ensure_space(self, min_y):
+        if self.y < min_y:
+            self.new_page()
+
+    def skip(self, amount):
+        self.y -= amount
+
+    def draw_lines(self, lines, x, font_name, font_size, leading):
+        text = None
+        for line in lines:
+            if self.y < BOTTOM_MARGIN:
+                if text is not None:
+                    self.c.drawText(text)
+                    text = None
+                self.new_page()
+            if text is None:
+                text = self.c.beginText(x, self.y)
+                text.setFont(font_name, font_size, leading)
+            text.textLine(line)
+            self.y -= leading
+        if text is not None:
+            self.c.drawText(text)
+
+    def finish(self):
+        self.c.doForm("footer")
+        self.c.save()
+
+
+def draw_page_template(c):
+    """
+    Static page elements, rendered once per document as form XObjects:
+    the header is placed on the first page, the footer on every page
     """
-    file_path = "filled_form.pdf"
-    c = canvas.Canvas(file_path, pagesize=letter)
-    width, height = letter
-    
-    # Title
+    c.beginForm("header")
     c.setFont("Helvetica-Bold", 24)
-    c.drawString(1*inch, height - 1*inch, "Filled Government Form")
-    
-    # Horizontal line
-    c.line(1*inch, height - 1.2*inch, width - 1*inch, height - 1.2*inch)
-    
-    # Form fields - dynamic
-    c.setFont("Helvetica", 12)
-    y_position = height - 2*inch
-    
+    c.drawString(1*inch, PAGE_HEIGHT - 1*inch, "Filled Government Form")
+    c.line(1*inch, PAGE_HEIGHT - 1.2*inch, PAGE_WIDTH - 1*inch, PAGE_HEIGHT - 1.2*inch)
+    c.endForm()
+
+    c.beginForm("footer")
+    c.setFont("Helvetica-Oblique", 10)
+    c.drawString(1*inch, 1*inch, f"Generated by BharatVoice AI on {datetime.now().strftime('%d-%m-%Y %H:%M')}")
+    c.drawString(1*inch, 0.7*inch, "This is an AI-assisted form. Please verify all information.")
+    c.endForm()
+
+
+def fill_pdf_form(data, output=None):
+    """
+    Generate filled PDF form with dynamic questions and answers
+    Renders into output (a binary file object), by default a per-call spooled
+    temporary file, and returns it rewound to the start
+    """
+    if output is None:
+        output = tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_BYTES)
+    c = canvas.Canvas(output, pagesize=letter)
+    width = PAGE_WIDTH
+
+    draw_page_template(c)
+    c.doForm("header")
+    layout = PageLayout(c, PAGE_HEIGHT - 2*inch)
+
     # Get answers dict
     answers = data.get('answers', {})
-    
+
     # Display all question-answer pairs
     for q_id, answer_data in answers.items():
-        if y_position < 2*inch:
-            # Create new page if needed
-            c.showPage()
-            y_position = height - 1*inch
-        
+        layout.ensure_space(NEW_QUESTION_MIN_Y)
+
         question = answer_data.get('question', '')
         answer = answer_data.get('answer', '')
-        
-        c.setFont("Helvetica-Bold", 11)
-        # Wrap question text
+
         question_lines = wrap_text(c, question, width - 2*inch, "Helvetica-Bold", 11)
-        for line in question_lines:
-            c.drawString(1*inch, y_position, line)
-            y_position -= 0.3*inch
-        
-        c.setFont("Helvetica", 11)
-        # Wrap answer text
+        layout.draw_lines(question_lines, 1*inch, "Helvetica-Bold", 11, 0.3*inch)
+
         answer_lines = wrap_text(c, str(answer), width - 2*inch, "Helvetica", 11)
-        for line in answer_lines:
-            c.drawString(1.2*inch, y_position, line)
-            y_position -= 0.3*inch
-        
-        y_position -= 0.2*inch  # Extra space between questions
-    
+        layout.draw_lines(answer_lines, 1.2*inch, "Helvetica", 11, 0.3*inch)
+
+        layout.skip(0.2*inch)  # Extra space between questions
+
     # Attached documents section
     documents = data.get('documents', {})
     if documents:
-        y_position -= 0.5*inch
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(1*inch, y_position, "Attached Documents:")
-        y_position -= 0.4*inch
-        
+        layout.skip(0.5*inch)
+        layout.draw_lines(["Attached Documents:"], 1*inch, "Helvetica-Bold", 12, 0.4*inch)
+
         for doc_type, doc_info in documents.items():
-            c.setFont("Helvetica", 11)
-            c.drawString(1.2*inch, y_position, f"• {doc_type}: {doc_info.get('filename', 'N/A')}")
-            y_position -= 0.3*inch
-            
+            layout.draw_lines(
+                [f"• {doc_type}: {doc_info.get('filename', 'N/A')}"],
+                1.2*inch, "Helvetica", 11, 0.3*inch
+            )
+
             # Show extracted text if available
             if doc_info.get('extracted_text'):
-                c.setFont("Helvetica-Oblique", 9)
                 text_preview = doc_info['extracted_text'][:200] + "..."
                 preview_lines = wrap_text(c, text_preview, width - 2.5*inch, "Helvetica-Oblique", 9)
-                for line in preview_lines[:3]:  # Max 3 lines
-                    c.drawString(1.5*inch, y_position, line)
-                    y_position -= 0.25*inch
-                y_position -= 0.2*inch
-    
+                layout.draw_lines(preview_lines[:3], 1.5*inch, "Helvetica-Oblique", 9, 0.25*inch)  # Max 3 lines
+                layout.skip(0.2*inch)
+
     # User profile section
     user_profile = data.get('user_profile', {})
     if user_profile:
-        y_position -= 0.5*inch
-        if y_position < 2*inch:
-            c.showPage()
-            y_position = height - 1*inch
-        
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(1*inch, y_position, "User Profile:")
-        y_position -= 0.4*inch
-        
-        c.setFont("Helvetica", 10)
+        layout.skip(0.5*inch)
+        layout.ensure_space(NEW_QUESTION_MIN_Y)
+        layout.draw_lines(["User Profile:"], 1*inch, "Helvetica-Bold", 12, 0.4*inch)
+
         profile_fields = [
             ("Name", user_profile.get('name')),
             ("Email", user_profile.get('email')),
             ("Phone", user_profile.get('phone')),
         ]
-        
-        for label, value in profile_fields:
-            if value:
-                c.drawString(1.2*inch, y_position, f"{label}: {value}")
-                y_position -= 0.3*inch
-    
-    # Footer
-    c.setFont("Helvetica-Oblique", 10)
-    c.drawString(1*inch, 1*inch, f"Generated by BharatVoice AI on {datetime.now().strftime('%d-%m-%Y %H:%M')}")
-    c.drawString(1*inch, 0.7*inch, "This is an AI-assisted form. Please verify all information.")
-    
-    c.save()
-    return file_path
+        layout.draw_lines(
+            [f"{label}: {value}" for label, value in profile_fields if value],
+            1.2*inch, "Helvetica", 10, 0.3*inch
+        )
+
+    layout.finish()
+    output.seek(0)
+    return output
+
+
+def iter_pdf(output, chunk_size=PDF_CHUNK_SIZE):
+    """
+    Yield a rendered PDF in chunks and close it afterwards
+    """
+    try:
+        while True:
+            chunk = output.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        output.close()
 
 
 def wrap_text(canvas_obj, text, max_width, font_name, font_size):
     """
     Wrap text to fit within max_width
     Returns list of lines
+    Each word is measured once (cached per font) and line widths are summed
+    as words are added, instead of re-measuring the whole line every time.
     """
-    words = text.split()
+    space = word_width(" ", font_name, font_size)
     lines = []
-    current_line = ""
-    
-    for word in words:
-        test_line = current_line + " " + word if current_line else word
-        if canvas_obj.stringWidth(test_line, font_name, font_size) < max_width:
-            current_line = test_line
+    current_words = []
+    current_width = 0.0
+
+    for word in text.split():
+        width = word_width(word, font_name, font_size)
+        if not current_words:
+            current_words.append(word)
+            current_width = width
+        elif current_width + space + width < max_width:
+            current_words.append(word)
+            current_width += space + width
         else:
-            if current_line:
-                lines.append(current_line)
-            current_line = word
-    
-    if current_line:
-        lines.append(current_line)
-    
+            lines.append(" ".join(current_words))
+            current_words = [word]
+            current_width = width
+
+    if current_words:
+        lines.append(" ".join(current_words))
+
     return lines
 
 
-def generate_pdf(data):
+def generate_pdf(data, file_path="filled_form.pdf"):
     """
-    Legacy function for backward compatibility
+    Legacy function for backward compatibility: writes the PDF to file_path
+    and returns the path (new code should use fill_pdf_form)
     """
-    return fill_pdf_form(data)
-
+    with open(file_path, "wb") as f:
+        fill_pdf_form(data, f)
+    return file_path
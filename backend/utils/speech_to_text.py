@@ -1,31 +1,201 @@
+import asyncio
+import hashlib
 import os
-from io import BytesIO
 
-def speech_to_text(file_bytes):
-    """
-    Convert audio to text
-    Uses OpenAI Whisper as primary, with helpful error messages if unavailable
-    """
-    try:
-        # Try OpenAI Whisper first (works if user has credits)
-        from openai import OpenAI
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        audio = BytesIO(file_bytes)
-        audio.name = "input.wav"
-        
-        transcript = client.audio.transcriptions.create(
-            model="whisper-1",
-            file=audio
-        )
+import httpx
+
+from utils.audio_preprocess import normalize_audio, AUDIO_PREPROCESS
+from utils.metrics import POOL_IN_FLIGHT, stage_timer
+from utils.structured_log import get_logger
+from utils.uploads import as_stream
+
+# Speech-to-text configuration
+# STT_BACKEND: "openai" (Whisper API), "local" (faster-whisper on the CPU) or "stub"
+STT_BACKEND = os.getenv("STT_BACKEND", "openai").lower()
+# Backend to try when the primary one fails (network down, quota exhausted); empty for none
+STT_FALLBACK = os.getenv("STT_FALLBACK", "").lower()
+STT_TIMEOUT = float(os.getenv("STT_TIMEOUT", "60"))
+STT_OPENAI_MODEL = os.getenv("STT_OPENAI_MODEL", "whisper-1")
+# Local engine: faster-whisper (CTranslate2) with an int8-quantized model, loaded once
+STT_LOCAL_MODEL = os.getenv("STT_LOCAL_MODEL", "base")
+STT_LOCAL_COMPUTE_TYPE = os.getenv("STT_LOCAL_COMPUTE_TYPE", "int8")
+STT_LOCAL_THREADS = int(os.getenv("STT_LOCAL_THREADS", "4"))
+STT_LOCAL_WORKERS = int(os.getenv("STT_LOCAL_WORKERS", "1"))   # transcriptions run at once
+STT_LANGUAGE = os.getenv("STT_LANGUAGE") or None               # e.g. "hi"; None lets the engine detect it
+STT_STUB_TEXT = os.getenv("STT_STUB_TEXT")
+
+logger = get_logger("stt")
+
+
+class STTError(Exception):
+    """Raised when audio could not be transcribed; the message is safe to show to the user"""
+
+
+class STTBackend:
+    """Base class for speech-to-text engines"""
+
+    name = "base"
+    remote = False      # audio is uploaded, so smaller requests are worth more than uniform input
+
+    async def transcribe(self, audio_bytes, filename="input.wav", language=STT_LANGUAGE):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class OpenAISTTBackend(STTBackend):
+    """Whisper API through one AsyncOpenAI client and connection pool, reused across requests"""
+
+    name = "openai"
+    remote = True
+
+    def __init__(self, api_key=None, model=STT_OPENAI_MODEL):
+        from openai import AsyncOpenAI
+        self._http = httpx.AsyncClient(timeout=httpx.Timeout(STT_TIMEOUT, connect=5.0))
+        try:
+            self._client = AsyncOpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"), http_client=self._http)
+        except Exception as e:
+            # e.g. no API key configured; lets speech_to_text() move on to STT_FALLBACK
+            raise STTError(self._user_message(str(e))) from e
+        self.model = model
+
+    async def transcribe(self, audio_bytes, filename="input.wav", language=STT_LANGUAGE):
+        audio = as_stream(audio_bytes, filename)
+        kwargs = {"language": language} if language else {}
+        try:
+            transcript = await self._client.audio.transcriptions.create(model=self.model, file=audio, **kwargs)
+        except Exception as e:
+            raise STTError(self._user_message(str(e))) from e
         return transcript.text
-        
-    except Exception as e:
-        error_msg = str(e)
-        
+
+    @staticmethod
+    def _user_message(error_msg):
         # Provide helpful guidance based on error type
         if "insufficient_quota" in error_msg or "429" in error_msg:
-            return "⚠️ OpenAI API quota exceeded. Please use Gemini API instead (see GEMINI_SETUP.md) or type your name manually in the text field below."
-        elif "api_key" in error_msg.lower() or "auth" in error_msg.lower():
-            return "⚠️ Please configure AI_PROVIDER=gemini in .env file and add your free Gemini API key. See GEMINI_SETUP.md for 2-minute setup. Or type your name manually below."
-        else:
-            return f"⚠️ Voice recognition unavailable. Please type your name manually in the text field below. ({error_msg[:100]})"
+            return "⚠️ OpenAI API quota exceeded. Please type your answer manually, or set STT_BACKEND=local for offline recognition."
+        if "api_key" in error_msg.lower() or "auth" in error_msg.lower():
+            return "⚠️ OpenAI API key missing or invalid. Please type your answer manually, or set STT_BACKEND=local for offline recognition."
+        return f"⚠️ Voice recognition unavailable. Please type your answer manually. ({error_msg[:100]})"
+
+    async def close(self):
+        await self._http.aclose()
+
+
+class LocalWhisperBackend(STTBackend):
+    """
+    Offline recognition with faster-whisper on the CPU (optional dependency)
+    The model is loaded once; transcriptions run in worker threads
+    """
+
+    name = "local"
+
+    def __init__(self, model=STT_LOCAL_MODEL, compute_type=STT_LOCAL_COMPUTE_TYPE,
+                 threads=STT_LOCAL_THREADS, workers=STT_LOCAL_WORKERS):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            raise STTError("⚠️ Offline voice recognition is not installed (pip install faster-whisper).") from None
+        logger.info("Loading local speech model %r (%s)", model, compute_type)
+        self._model = WhisperModel(
+            model, device="cpu", compute_type=compute_type, cpu_threads=threads, num_workers=workers
+        )
+        self._slots = None
+        self.workers = workers
+
+    def _transcribe(self, audio_bytes, language):
+        segments, _ = self._model.transcribe(as_stream(audio_bytes), language=language, vad_filter=True)
+        # segments is a lazy generator; decoding happens while it is consumed
+        return " ".join(segment.text.strip() for segment in segments).strip()
+
+    async def transcribe(self, audio_bytes, filename="input.wav", language=STT_LANGUAGE):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        with POOL_IN_FLIGHT.track(pool="stt_local"):
+            async with self._slots:
+                try:
+                    return await asyncio.to_thread(self._transcribe, audio_bytes, language)
+                except Exception as e:
+                    raise STTError(f"⚠️ Could not recognise the recording. ({str(e)[:100]})") from e
+
+
+class StubSTTBackend(STTBackend):
+    """Deterministic transcripts for tests and load runs: STT_STUB_TEXT, or a digest of the audio"""
+
+    name = "stub"
+
+    def __init__(self, text=STT_STUB_TEXT):
+        self.text = text
+
+    async def transcribe(self, audio_bytes, filename="input.wav", language=STT_LANGUAGE):
+        if self.text is not None:
+            return self.text
+        return f"transcript {hashlib.sha1(audio_bytes).hexdigest()[:8]}"
+
+
+_BACKENDS = {
+    "openai": OpenAISTTBackend,
+    "local": LocalWhisperBackend,
+    "stub": StubSTTBackend,
+}
+_backends = {}
+
+
+def get_stt_backend(name=None):
+    """Shared backend instance for a name (default STT_BACKEND), created on first use"""
+    name = name or STT_BACKEND
+    if name not in _backends:
+        if name not in _BACKENDS:
+            raise STTError(f"Unknown STT_BACKEND '{name}' (use {', '.join(_BACKENDS)})")
+        _backends[name] = _BACKENDS[name]()
+    return _backends[name]
+
+
+def set_stt_backend(backend, name=None):
+    """Replace a shared backend (e.g. with a stub in tests)"""
+    _backends[name or STT_BACKEND] = backend
+
+
+async def close_stt_backends():
+    for backend in list(_backends.values()):
+        await backend.close()
+    _backends.clear()
+
+
+async def transcribe_recording(file_bytes, filename="input.wav"):
+    """
+    Normalize a recording (AUDIO_PREPROCESS) and convert it to text with the
+    configured backend, falling back to STT_FALLBACK when it fails
+    Returns (text, audio stats); raises STTError when no backend could transcribe it
+    """
+    fallback = STT_FALLBACK if STT_FALLBACK and STT_FALLBACK != STT_BACKEND else None
+    try:
+        backend = get_stt_backend()
+    except STTError as e:
+        # The primary backend cannot even be built (e.g. no OPENAI_API_KEY)
+        if fallback is None:
+            raise
+        logger.warning("%s speech-to-text is unavailable (%s), using %s", STT_BACKEND, e, fallback)
+        backend, fallback = get_stt_backend(fallback), None
+    stats = {"normalized": False, "original_bytes": len(file_bytes), "bytes": len(file_bytes)}
+    if AUDIO_PREPROCESS:
+        with stage_timer("audio_preprocess"):
+            file_bytes, filename, stats = await asyncio.to_thread(
+                normalize_audio, file_bytes, filename, backend.remote
+            )
+        if stats["normalized"]:
+            logger.debug("Audio normalized", extra={"audio": stats})
+    with stage_timer("stt"):
+        try:
+            return await backend.transcribe(file_bytes, filename), stats
+        except STTError as e:
+            if fallback is None:
+                raise
+            logger.warning("%s speech-to-text failed (%s), trying %s", STT_BACKEND, e, fallback)
+            return await get_stt_backend(fallback).transcribe(file_bytes, filename), stats
+
+
+async def speech_to_text(file_bytes, filename="input.wav"):
+    """Text of a recording (see transcribe_recording); raises STTError on failure"""
+    text, _ = await transcribe_recording(file_bytes, filename)
+    return text
@@ -0,0 +1,187 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import uuid
+
+# Logging configuration
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()            # "json" (one object per line) or "text"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))      # records waiting for the writer; newer ones are dropped
+# Document text and LLM responses can hold ID card details: they are only logged
+# for this fraction of calls (0 = never), at DEBUG level, cut to LOG_PAYLOAD_CHARS
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0"))
+LOG_PAYLOAD_CHARS = int(os.getenv("LOG_PAYLOAD_CHARS", "300"))
+
+REQUEST_ID_HEADER = b"x-request-id"
+_VALID_REQUEST_ID = re.compile(rb"^[A-Za-z0-9._-]{1,64}$")
+
+request_id = contextvars.ContextVar("request_id", default="-")
+
+# Attributes every LogRecord has; anything else came in through extra= and is logged as a field
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, request_id, message and extra fields"""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local development, extra fields appended as key=value"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s [%(request_id)s] %(name)s: %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = " ".join(f"{key}={value}" for key, value in record.__dict__.items() if key not in _RECORD_ATTRS)
+        return f"{line} {fields}" if fields else line
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the writer thread without blocking the caller
+    The request ID is captured here, in the caller's context; when the queue
+    is full the record is dropped and counted instead of waiting on stdout
+    """
+
+    dropped = 0
+
+    def prepare(self, record):
+        # Resolve everything that cannot cross to the writer thread (args, traceback, context)
+        record = copy.copy(record)
+        record.request_id = request_id.get()
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _QueueHandler.dropped += 1
+
+
+_exception_formatter = logging.Formatter()
+_logger = logging.getLogger("bharatvoice")
+_listener = None
+_lock = threading.Lock()
+
+
+def _start():
+    """Attach a fresh queue and writer thread (at import and again in forked workers)"""
+    global _listener
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JSONFormatter() if LOG_FORMAT == "json" else TextFormatter())
+    records = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    for handler in list(_logger.handlers):
+        _logger.removeHandler(handler)
+    _logger.addHandler(_QueueHandler(records))
+    _logger.setLevel(LOG_LEVEL)
+    _logger.propagate = False
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=False)
+    _listener.start()
+
+
+def flush_logs():
+    """Write out everything queued so far (called at exit)"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def get_logger(name):
+    """Logger under the shared "bharatvoice" hierarchy, e.g. get_logger("main")"""
+    return _logger.getChild(name)
+
+
+def log_payload(logger, message, text, level=logging.DEBUG):
+    """
+    Log document or LLM text only when sampled in (LOG_PAYLOAD_SAMPLE_RATE) and
+    truncated to LOG_PAYLOAD_CHARS, so the cost does not grow with the document
+    """
+    if not text or LOG_PAYLOAD_CHARS <= 0 or random.random() >= LOG_PAYLOAD_SAMPLE_RATE:
+        return
+    if logger.isEnabledFor(level):
+        logger.log(level, message, extra={"chars": len(text), "payload": text[:LOG_PAYLOAD_CHARS]})
+
+
+def with_request_id(func):
+    """Wrap func so it logs under the caller's request ID in another thread or process"""
+    return _RequestBound(func, request_id.get())
+
+
+class _RequestBound:
+    """Picklable (for process pools) callable that sets the request ID around a call"""
+
+    def __init__(self, func, value):
+        self.func, self.value = func, value
+
+    def __call__(self, *args):
+        token = request_id.set(self.value)
+        try:
+            return self.func(*args)
+        finally:
+            request_id.reset(token)
+
+
+class RequestIdMiddleware:
+    """
+    Give every request a correlation ID: the client's X-Request-ID when it is
+    sane, otherwise a new one. It is set for all logging in the request and
+    returned in the X-Request-ID response header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            return await self.app(scope, receive, send)
+
+        value = next((v for k, v in scope["headers"] if k == REQUEST_ID_HEADER), b"")
+        rid = value.decode("ascii") if _VALID_REQUEST_ID.match(value) else uuid.uuid4().hex[:16]
+        token = request_id.set(rid)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(REQUEST_ID_HEADER, rid.encode("ascii"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id.reset(token)
+
+
+_start()
+atexit.register(flush_logs)
+os.register_at_fork(after_in_child=_start)
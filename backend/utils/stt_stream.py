@@ -0,0 +1,178 @@
+import asyncio
+import math
+import os
+from collections import deque
+
+import numpy as np
+
+from utils.audio_preprocess import pcm_to_wav, STT_VAD_THRESHOLD_DB, STT_VAD_MARGIN_DB
+from utils.speech_to_text import get_stt_backend, speech_to_text, STTError
+
+# Streaming speech recognition configuration
+# Clients send 16-bit little-endian mono PCM at the sample rate they announce
+STT_STREAM_SAMPLE_RATE = int(os.getenv("STT_STREAM_SAMPLE_RATE", "16000"))
+# Audio waiting to be processed per connection; a client sending faster than this drains is cut off
+STT_STREAM_MAX_BUFFER_BYTES = int(os.getenv("STT_STREAM_MAX_BUFFER_BYTES", str(1024 * 1024)))
+# Longest utterance kept in memory before it is transcribed regardless of pauses
+STT_MAX_UTTERANCE_SECONDS = float(os.getenv("STT_MAX_UTTERANCE_SECONDS", "30"))
+# Seconds of new speech between partial transcripts (0 disables partials)
+STT_PARTIAL_INTERVAL = float(os.getenv("STT_PARTIAL_INTERVAL", "1.0"))
+# Partials transcribe only the latest audio of the utterance, so their cost does not grow with it
+STT_PARTIAL_WINDOW_SECONDS = float(os.getenv("STT_PARTIAL_WINDOW_SECONDS", "5"))
+# Partials against a paid remote backend (OpenAI) are off unless enabled here
+STT_PARTIAL_REMOTE = os.getenv("STT_PARTIAL_REMOTE", "false").lower() in ("1", "true", "yes")
+# Voice activity detection (levels in utils.audio_preprocess)
+STT_VAD_SILENCE_MS = int(os.getenv("STT_VAD_SILENCE_MS", "700"))         # pause that ends an utterance
+
+FRAME_MS = 30
+PREROLL_MS = 300          # audio kept from before speech starts, so first syllables are not clipped
+
+
+class EnergyVAD:
+    """Speech/silence decision per frame from its RMS level against an adaptive noise floor"""
+
+    def __init__(self, threshold_db=STT_VAD_THRESHOLD_DB, margin_db=STT_VAD_MARGIN_DB):
+        self.threshold_db = threshold_db
+        self.margin_db = margin_db
+        self.noise_db = None
+
+    @staticmethod
+    def level_db(frame):
+        samples = np.frombuffer(frame, dtype="<i2").astype(np.float32) / 32768.0
+        rms = math.sqrt(float(np.mean(samples * samples))) if samples.size else 0.0
+        return 20 * math.log10(rms + 1e-10)
+
+    def is_speech(self, frame):
+        level = self.level_db(frame)
+        if self.noise_db is None:
+            self.noise_db = level
+        speech = level > max(self.threshold_db, self.noise_db + self.margin_db)
+        if not speech:
+            # Follow the background level only while nobody is talking
+            self.noise_db = 0.95 * self.noise_db + 0.05 * level
+        return speech
+
+
+class StreamingRecognizer:
+    """
+    Splits a live PCM stream into utterances with the VAD and transcribes them
+
+    feed() and finish() return the events to send to the client:
+    {"type": "partial", "text"} while an utterance is still being spoken and
+    {"type": "final", "text", "segment"} once it ends. Memory is bounded by
+    STT_MAX_UTTERANCE_SECONDS of audio plus the pre-roll.
+
+    A partial covers the last STT_PARTIAL_WINDOW_SECONDS of the utterance and
+    runs as a single background task: frames keep flowing while it is
+    transcribed, and its event is returned by the next feed() after it is done.
+    """
+
+    def __init__(self, sample_rate=STT_STREAM_SAMPLE_RATE, transcribe=speech_to_text, partials=None):
+        self.sample_rate = sample_rate
+        self.transcribe = transcribe
+        if partials is None:
+            partials = STT_PARTIAL_INTERVAL > 0 and (STT_PARTIAL_REMOTE or not _backend_is_remote())
+        self.vad = EnergyVAD()
+        self.frame_bytes = int(sample_rate * FRAME_MS / 1000) * 2
+        self.silence_frames = max(1, STT_VAD_SILENCE_MS // FRAME_MS)
+        self.max_utterance_bytes = int(STT_MAX_UTTERANCE_SECONDS * sample_rate) * 2
+        self.partial_bytes = int(STT_PARTIAL_INTERVAL * sample_rate) * 2 if partials else 0
+        self.partial_window_bytes = int(STT_PARTIAL_WINDOW_SECONDS * sample_rate) * 2
+        self._partial_task = None
+        self._pending = bytearray()
+        self._preroll = deque(maxlen=max(1, PREROLL_MS // FRAME_MS))
+        self._utterance = bytearray()
+        self._in_speech = False
+        self._silent = 0
+        self._since_partial = 0
+        self._last_partial = ""
+        self.segments = []
+
+    async def feed(self, chunk):
+        self._pending += chunk
+        events = self._partial_events()
+        while len(self._pending) >= self.frame_bytes:
+            frame = bytes(self._pending[:self.frame_bytes])
+            del self._pending[:self.frame_bytes]
+            events.extend(await self._process_frame(frame))
+        return events
+
+    async def finish(self):
+        """Transcribe whatever is still buffered (the client stopped recording)"""
+        self._cancel_partial()
+        if self._in_speech:
+            self._utterance += self._pending
+            self._pending.clear()
+            return await self._finalize()
+        return []
+
+    @property
+    def transcript(self):
+        return " ".join(text for text in self.segments if text)
+
+    async def _process_frame(self, frame):
+        speech = self.vad.is_speech(frame)
+        if not self._in_speech:
+            self._preroll.append(frame)
+            if speech:
+                self._in_speech = True
+                self._utterance = bytearray(b"".join(self._preroll))
+                self._preroll.clear()
+                self._silent = 0
+                self._since_partial = 0
+            return []
+
+        self._utterance += frame
+        self._since_partial += len(frame)
+        self._silent = 0 if speech else self._silent + 1
+        if self._silent >= self.silence_frames or len(self._utterance) >= self.max_utterance_bytes:
+            return await self._finalize()
+        if self.partial_bytes and self._since_partial >= self.partial_bytes and speech and self._partial_task is None:
+            self._since_partial = 0
+            window = bytes(self._utterance[-self.partial_window_bytes:])
+            self._partial_task = asyncio.create_task(self._partial(window))
+        return []
+
+    async def _partial(self, pcm):
+        try:
+            return (await self.transcribe(pcm_to_wav(pcm, self.sample_rate), "partial.wav")).strip()
+        except STTError:
+            return ""    # a missed partial is harmless; the final transcript will follow
+
+    def _partial_events(self):
+        """Event of a finished partial task, if any (without waiting for one still running)"""
+        task = self._partial_task
+        if task is None or not task.done():
+            return []
+        self._partial_task = None
+        text = task.result() if not task.cancelled() else ""
+        if not text or text == self._last_partial:
+            return []
+        self._last_partial = text
+        return [{"type": "partial", "text": text}]
+
+    def _cancel_partial(self):
+        # The final transcript of the utterance supersedes a partial still in flight
+        if self._partial_task is not None:
+            self._partial_task.cancel()
+            self._partial_task = None
+
+    async def _finalize(self):
+        self._cancel_partial()
+        audio = pcm_to_wav(bytes(self._utterance), self.sample_rate)
+        self._utterance = bytearray()
+        self._in_speech = False
+        self._last_partial = ""
+        try:
+            text = (await self.transcribe(audio, "utterance.wav")).strip()
+        except STTError as e:
+            return [{"type": "error", "error": str(e)}]
+        self.segments.append(text)
+        return [{"type": "final", "text": text, "segment": len(self.segments)}]
+
+
+def _backend_is_remote():
+    try:
+        return get_stt_backend().remote
+    except STTError:
+        return True     # not usable (e.g. no API key): no partials either
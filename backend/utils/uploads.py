@@ -0,0 +1,169 @@
+import io
+import json
+import mmap
+import os
+
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+
+# Upload limits (whole request body, checked while it streams in)
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(20 * 1024 * 1024)))              # forms, documents, ID cards
+AUDIO_UPLOAD_MAX_BYTES = int(os.getenv("AUDIO_UPLOAD_MAX_BYTES", str(25 * 1024 * 1024)))  # the Whisper API's own limit
+BULK_UPLOAD_MAX_BYTES = int(os.getenv("BULK_UPLOAD_MAX_BYTES", str(64 * 1024 * 1024)))    # /generate-filled-forms-bulk
+REQUEST_MAX_BYTES = int(os.getenv("REQUEST_MAX_BYTES", str(1024 * 1024)))                 # every other endpoint
+# JSON-array bulk bodies are parsed whole; larger batches must be sent as NDJSON, read line by line
+BULK_JSON_MAX_BYTES = int(os.getenv("BULK_JSON_MAX_BYTES", str(8 * 1024 * 1024)))
+# Starlette keeps uploads up to this size in memory; larger ones are mapped from the spool file
+UPLOAD_IN_MEMORY_BYTES = 1024 * 1024
+# Largest page image decoded for OCR (width x height); bigger images are rejected before decoding
+UPLOAD_MAX_PIXELS = int(os.getenv("UPLOAD_MAX_PIXELS", str(60_000_000)))
+
+UPLOAD_LIMITS = {
+    "/scan-form": UPLOAD_MAX_BYTES,
+    "/scan-form-stream": UPLOAD_MAX_BYTES,
+    "/upload-document": UPLOAD_MAX_BYTES,
+    "/auto-fill-from-id": UPLOAD_MAX_BYTES,
+    "/speech-to-text": AUDIO_UPLOAD_MAX_BYTES,
+    "/generate-filled-forms-bulk": BULK_UPLOAD_MAX_BYTES,
+}
+
+
+def upload_limit(path):
+    return UPLOAD_LIMITS.get(path, REQUEST_MAX_BYTES)
+
+
+class UploadTooLarge(HTTPException):
+    """413 for a request body over its endpoint's limit (FastAPI passes HTTPExceptions through body parsing)"""
+
+    def __init__(self, limit):
+        super().__init__(status_code=413, detail=f"Upload is larger than the {limit // (1024 * 1024)} MB limit")
+
+
+class UploadLimitMiddleware:
+    """
+    Enforce per-endpoint body limits while the request streams in, so an
+    oversized upload is refused after at most `limit` bytes instead of after
+    it has been written to the spool in full
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        limit = upload_limit(scope["path"])
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit() and int(value) > limit:
+                body = json.dumps({"detail": UploadTooLarge(limit).detail}).encode("utf-8")
+                await send({
+                    "type": "http.response.start",
+                    "status": 413,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+                })
+                await send({"type": "http.response.body", "body": body})
+                return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise UploadTooLarge(limit)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+class BufferReader(io.RawIOBase):
+    """Read-only file object over bytes or an mmap (BytesIO would copy an mmap in full)"""
+
+    def __init__(self, data, name=None):
+        self._data = data
+        self._pos = 0
+        if name:
+            self.name = name
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        chunk = self._data[self._pos:self._pos + len(buffer)]
+        buffer[:len(chunk)] = chunk
+        self._pos += len(chunk)
+        return len(chunk)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._data)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+
+def as_stream(data, name=None):
+    """File object over upload data without copying it (BytesIO shares a bytes object's buffer)"""
+    if isinstance(data, bytes):
+        stream = io.BytesIO(data)
+        if name:
+            stream.name = name
+        return stream
+    return BufferReader(data, name)
+
+
+def read_upload(file: UploadFile, max_bytes=UPLOAD_MAX_BYTES):
+    """
+    Upload contents without another full copy: bytes for uploads Starlette
+    keeps in memory (up to UPLOAD_IN_MEMORY_BYTES), otherwise a read-only mmap
+    of the spool file, which the caller hands to release_upload when done
+    Raises UploadTooLarge (413) over max_bytes
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise UploadTooLarge(max_bytes)
+    spool = file.file
+    size = spool.seek(0, os.SEEK_END)
+    spool.seek(0)
+    if size <= UPLOAD_IN_MEMORY_BYTES:
+        return spool.read()
+    spool.flush()
+    return mmap.mmap(spool.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def release_upload(data):
+    """Unmap what read_upload returned for a large upload (bytes need nothing)"""
+    if isinstance(data, mmap.mmap):
+        try:
+            data.close()
+        except BufferError:
+            pass    # still in use by an abandoned OCR thread; unmapped once it lets go
+
+
+def check_image_pixels(data, max_pixels=UPLOAD_MAX_PIXELS):
+    """
+    Refuse decompression bombs from the image header alone, before any pixels
+    are decoded (PDF pages are checked when they are rasterized)
+    Raises HTTPException(413) when a page is larger than max_pixels
+    """
+    if data[:5] == b"%PDF-":
+        return
+    try:
+        with Image.open(as_stream(data)) as image:
+            width, height = image.size
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        width = height = None    # PIL's own check (MAX_IMAGE_PIXELS) fired first
+    except Exception:
+        return    # not an image PIL knows; OCR reports the error
+    if width is None or width * height > max_pixels:
+        size = f"{width}x{height} pixels" if width else "too large"
+        raise HTTPException(
+            status_code=413,
+            detail=f"Image is {size}; the limit is {max_pixels // 1_000_000} megapixels"
+        )
@@ -0,0 +1,202 @@
+import hashlib
+import hmac
+import json
+import os
+import queue
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# User store configuration
+# One SQLite file (WAL mode) shared by every uvicorn worker on the host
+USER_DB_PATH = os.getenv("USER_DB_PATH", "bharatvoice.sqlite3")
+USER_DB_POOL_SIZE = int(os.getenv("USER_DB_POOL_SIZE", "4"))
+# Hot profiles are served from memory; the TTL bounds how stale another worker's write can look
+USER_PROFILE_CACHE_SIZE = int(os.getenv("USER_PROFILE_CACHE_SIZE", "1024"))
+USER_PROFILE_CACHE_TTL = float(os.getenv("USER_PROFILE_CACHE_TTL", "30"))
+PASSWORD_HASH_ITERATIONS = int(os.getenv("PASSWORD_HASH_ITERATIONS", "200000"))
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS users ("
+    " email TEXT NOT NULL, password_hash TEXT NOT NULL, name TEXT NOT NULL,"
+    " created_at REAL NOT NULL)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS users_email ON users (email)",
+    "CREATE TABLE IF NOT EXISTS profiles ("
+    " email TEXT NOT NULL, data TEXT NOT NULL, updated_at REAL NOT NULL)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS profiles_email ON profiles (email)",
+]
+
+# Fixed SQL text, so each pooled connection prepares every statement once and reuses it
+_INSERT_USER = "INSERT INTO users (email, password_hash, name, created_at) VALUES (?, ?, ?, ?)"
+_SELECT_PASSWORD = "SELECT password_hash FROM users WHERE email = ?"
+_SELECT_PROFILE = "SELECT data FROM profiles WHERE email = ?"
+_UPSERT_PROFILE = (
+    "INSERT INTO profiles (email, data, updated_at) VALUES (?, ?, ?)"
+    " ON CONFLICT (email) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at"
+)
+
+
+def hash_password(password, iterations=PASSWORD_HASH_ITERATIONS):
+    """Salted PBKDF2-SHA256 hash in the form pbkdf2_sha256$iterations$salt$hash"""
+    salt = secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return f"pbkdf2_sha256${iterations}${salt.hex()}${digest.hex()}"
+
+
+def check_password(password, stored):
+    try:
+        _, iterations, salt, expected = stored.split("$")
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), bytes.fromhex(salt), int(iterations))
+    except ValueError:
+        return False
+    return hmac.compare_digest(digest.hex(), expected)
+
+
+class ProfileCache:
+    """Small LRU of profiles with a per-entry TTL"""
+
+    def __init__(self, max_entries=USER_PROFILE_CACHE_SIZE, ttl=USER_PROFILE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, email):
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(email)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, email, profile):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[email] = (time.monotonic() + self.ttl, profile)
+            self._entries.move_to_end(email)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class UserStore:
+    """
+    Users and profiles in SQLite (WAL mode: readers never block the writer),
+    accessed through a fixed pool of connections
+    The database is opened on first use (or by open() at startup), so importing
+    this module does not create a file.
+    """
+
+    def __init__(self, path=USER_DB_PATH, pool_size=USER_DB_POOL_SIZE):
+        self.path = path
+        self.pool_size = pool_size
+        self._pool = None
+        self._open_lock = threading.Lock()
+        self.profiles = ProfileCache()
+
+    def open(self):
+        """Connect the pool and create the tables, once"""
+        if self._pool is not None:
+            return
+        with self._open_lock:
+            if self._pool is not None:
+                return
+            pool = queue.Queue()
+            for _ in range(max(1, self.pool_size)):
+                pool.put(self._connect())
+            conn = pool.get()
+            with conn:
+                for statement in _SCHEMA:
+                    conn.execute(statement)
+            pool.put(conn)
+            self._pool = pool
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, cached_statements=64)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        """Borrow a pooled connection; commits on success, rolls back on error"""
+        self.open()
+        conn = self._pool.get()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._pool.put(conn)
+
+    def create_user(self, email, password, name, profile):
+        """Add a user with their initial profile; False if the email is already registered"""
+        password_hash = hash_password(password)
+        now = time.time()
+        try:
+            with self._connection() as conn:
+                conn.execute(_INSERT_USER, (email, password_hash, name, now))
+                conn.execute(_UPSERT_PROFILE, (email, json.dumps(profile), now))
+        except sqlite3.IntegrityError:
+            return False
+        self.profiles.put(email, profile)
+        return True
+
+    def verify_password(self, email, password):
+        """True/False for a registered email, None if there is no such user"""
+        with self._connection() as conn:
+            row = conn.execute(_SELECT_PASSWORD, (email,)).fetchone()
+        if row is None:
+            return None
+        return check_password(password, row[0])
+
+    def get_profile(self, email):
+        """Profile dict or None (read-through the profile cache)"""
+        profile = self.profiles.get(email)
+        if profile is not None:
+            return profile
+        with self._connection() as conn:
+            row = conn.execute(_SELECT_PROFILE, (email,)).fetchone()
+        if row is None:
+            return None
+        profile = json.loads(row[0])
+        self.profiles.put(email, profile)
+        return profile
+
+    def save_profile(self, email, profile):
+        with self._connection() as conn:
+            conn.execute(_UPSERT_PROFILE, (email, json.dumps(profile), time.time()))
+        self.profiles.put(email, profile)
+
+    def stats(self):
+        lookups = self.profiles.hits + self.profiles.misses
+        with self._connection() as conn:
+            users = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+        return {
+            "users": users,
+            "cached_profiles": len(self.profiles),
+            "profile_cache_hits": self.profiles.hits,
+            "profile_cache_misses": self.profiles.misses,
+            "profile_cache_hit_rate": round(self.profiles.hits / lookups, 3) if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._open_lock:
+            pool, self._pool = self._pool, None
+        while pool is not None:
+            try:
+                pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+user_store = UserStore()
@@ -0,0 +1,171 @@
+import re
+from datetime import date, datetime
+
+# Verhoeff checksum tables (used by Aadhaar numbers)
+_VERHOEFF_D = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9],
+    [1, 2, 3, 4, 0, 6, 7, 8, 9, 5],
+    [2, 3, 4, 0, 1, 7, 8, 9, 5, 6],
+    [3, 4, 0, 1, 2, 8, 9, 5, 6, 7],
+    [4, 0, 1, 2, 3, 9, 5, 6, 7, 8],
+    [5, 9, 8, 7, 6, 0, 4, 3, 2, 1],
+    [6, 5, 9, 8, 7, 1, 0, 4, 3, 2],
+    [7, 6, 5, 9, 8, 2, 1, 0, 4, 3],
+    [8, 7, 6, 5, 9, 3, 2, 1, 0, 4],
+    [9, 8, 7, 6, 5, 4, 3, 2, 1, 0],
+]
+_VERHOEFF_P = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9],
+    [1, 5, 7, 6, 2, 8, 3, 0, 9, 4],
+    [5, 8, 0, 3, 7, 9, 6, 1, 4, 2],
+    [8, 9, 1, 6, 0, 4, 3, 5, 2, 7],
+    [9, 4, 5, 3, 1, 2, 7, 6, 8, 0],
+    [4, 2, 8, 6, 5, 7, 3, 9, 0, 1],
+    [2, 7, 9, 3, 8, 0, 6, 4, 1, 5],
+    [7, 0, 4, 6, 9, 1, 3, 2, 5, 8],
+]
+
+_MOBILE = re.compile(r"^(?:\+?91|0)?([6-9]\d{9})$")
+_EMAIL = re.compile(r"^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$")
+_DATE = re.compile(r"^(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})$")
+_ISO_DATE = re.compile(r"^(\d{4})[/.-](\d{1,2})[/.-](\d{1,2})$")
+_PIN = re.compile(r"^[1-9]\d{5}$")
+_AADHAAR = re.compile(r"^[2-9]\d{11}$")
+_PAN = re.compile(r"^[A-Z]{5}\d{4}[A-Z]$")
+_SEPARATORS = re.compile(r"[\s()-]")
+_NUMERIC_ATTEMPT = re.compile(r"^[\d\s()+-]+$")
+_PAN_ATTEMPT = re.compile(r"^[A-Za-z0-9 ]{8,12}$")
+
+# Question wording -> kind of answer, checked in order (most specific first).
+# Identifiers only count when the question asks for the number itself
+# ("Aadhaar number", "PAN"), not when it merely mentions the card
+# ("Mobile number linked with Aadhaar", "Name as per PAN card")
+_QUESTION_KINDS = [
+    (re.compile(r"aadha+r\s*(?:card\s*)?(?:number|no\b|num\b)|\buid(?:ai)?\s*(?:number|no\b)|^\W*aadha+r(?:\s*card)?\W*$",
+                re.IGNORECASE), "aadhaar"),
+    (re.compile(r"\bpan\s*(?:card\s*)?(?:number|no\b|num\b)|permanent account number|^\W*pan(?:\s*card)?\W*$",
+                re.IGNORECASE), "pan"),
+    (re.compile(r"\bpin\s*-?\s*(code)?\b|postal code|zip", re.IGNORECASE), "pin"),
+    (re.compile(r"e-?mail", re.IGNORECASE), "email"),
+    (re.compile(r"mobile|phone|contact n", re.IGNORECASE), "phone"),
+    (re.compile(r"birth|\bdob\b|\bdate\b", re.IGNORECASE), "date"),
+]
+# An explicit field type wins over the question wording
+_FIELD_TYPE_KINDS = {"phone": "phone", "email": "email", "date": "date"}
+
+
+def verhoeff_valid(number):
+    """True if a digit string passes the Verhoeff checksum"""
+    check = 0
+    for position, digit in enumerate(reversed(number)):
+        check = _VERHOEFF_D[check][_VERHOEFF_P[position % 8][int(digit)]]
+    return check == 0
+
+
+def answer_kind(question, field_type=None):
+    """Which deterministic validator applies to a question, or None for free text"""
+    kind = _FIELD_TYPE_KINDS.get((field_type or "").lower())
+    if kind is not None:
+        return kind
+    for pattern, kind in _QUESTION_KINDS:
+        if pattern.search(question or ""):
+            return kind
+    return None
+
+
+def _check_phone(answer):
+    if _MOBILE.match(_SEPARATORS.sub("", answer)):
+        return True, ""
+    return False, "Please enter a 10-digit mobile number starting with 6, 7, 8 or 9 (optionally with +91)."
+
+
+def _check_email(answer):
+    if _EMAIL.match(answer):
+        return True, ""
+    return False, "Please enter a valid email address, for example name@example.com."
+
+
+def _check_date(answer, question):
+    match = _DATE.match(answer)
+    if match:
+        day, month, year = (int(part) for part in match.groups())
+    else:
+        match = _ISO_DATE.match(answer)
+        if not match:
+            return False, "Please enter the date as DD/MM/YYYY."
+        year, month, day = (int(part) for part in match.groups())
+    try:
+        value = datetime(year, month, day).date()
+    except ValueError:
+        return False, "This date does not exist. Please enter the date as DD/MM/YYYY."
+    if re.search(r"birth|\bdob\b", question or "", re.IGNORECASE):
+        today = date.today()
+        if value > today:
+            return False, "Date of birth cannot be in the future."
+        if today.year - value.year > 120:
+            return False, "Please check the year of birth."
+    return True, ""
+
+
+def _check_pin(answer):
+    if _PIN.match(_SEPARATORS.sub("", answer)):
+        return True, ""
+    return False, "Please enter a 6-digit PIN code."
+
+
+def _check_aadhaar(answer):
+    digits = _SEPARATORS.sub("", answer)
+    if not _AADHAAR.match(digits):
+        return False, "Aadhaar number must have 12 digits and cannot start with 0 or 1."
+    if not verhoeff_valid(digits):
+        return False, "This Aadhaar number looks mistyped. Please check the digits."
+    return True, ""
+
+
+def _check_pan(answer):
+    if _PAN.match(answer.replace(" ", "").upper()):
+        return True, ""
+    return False, "PAN must look like ABCDE1234F (5 letters, 4 digits, 1 letter)."
+
+
+def _looks_like(kind, answer):
+    """Is the answer an attempt at this format at all? (otherwise the LLM should judge it)"""
+    if kind in ("phone", "pin", "aadhaar"):
+        return bool(_NUMERIC_ATTEMPT.match(answer))
+    if kind == "email":
+        return "@" in answer
+    if kind == "date":
+        return not re.search(r"[A-Za-z]", answer)
+    if kind == "pan":
+        return bool(_PAN_ATTEMPT.match(answer))
+    return False
+
+
+def validate_locally(question, answer, field_type=None, required=True):
+    """
+    Validate an answer without the LLM when the answer format decides it
+    Returns (is_valid, suggestion), or None when only the LLM can judge (free text,
+    or an answer that is not even an attempt at the expected format, such as a
+    spoken date "15 August 1990" or an address under a "PIN code" label)
+    Empty answers are fine for optional fields (required=False).
+    """
+    answer = (answer or "").strip()
+    if not answer:
+        if not required:
+            return True, ""
+        return False, "This field is empty. Please provide an answer."
+
+    kind = answer_kind(question, field_type)
+    if kind is None or not _looks_like(kind, answer):
+        return None
+    if kind == "phone":
+        return _check_phone(answer)
+    if kind == "email":
+        return _check_email(answer)
+    if kind == "date":
+        return _check_date(answer, question)
+    if kind == "pin":
+        return _check_pin(answer)
+    if kind == "aadhaar":
+        return _check_aadhaar(answer)
+    return _check_pan(answer)
@@ -46,6 +46,7 @@ function FormUploadScreen({ setStep, formData, setFormData, user }) {
           ...formData,
           extractedText: response.data.extracted_text,
           questions: response.data.questions,
+          formId: response.data.form_id,
           answers: {},
           autoFilledFields: [],
         });
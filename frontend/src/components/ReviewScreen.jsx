@@ -15,7 +15,8 @@ function ReviewScreen({ formData, user, setStep }) {
       const data = {
         answers: formData.answers || {},
         documents: formData.documents || {},
-        user_profile: user || {}
+        user_profile: user || {},
+        form_id: formData.formId || null
       };
       
       console.log("Sending to backend:", data);
@@ -2,7 +2,7 @@ import sys
 import os
 
 # Add backend directory to path
-sys.path.insert(0, r'c:\project\BhartVoice\backend')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
 
 from utils.ocr_extractor import extract_text
 from PIL import Image, ImageDraw, ImageFont